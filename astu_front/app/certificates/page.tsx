@@ -31,7 +31,7 @@ export default function CertificatesPage() {
   useEffect(() => {
     const fetchCertificates = async () => {
       try {
-        const response = await fetch(`${API_BASE_URL}/students/`)
+        const response = await fetch(`${API_BASE_URL}/students/?expand=certificate_url`)
         if (!response.ok) {
           throw new Error(`Failed to fetch students: ${response.statusText}`)
         }
@@ -237,7 +237,7 @@ export default function CertificatesPage() {
               <div className="p-6">
                 <div className="text-center mb-6">
                   <Image
-                    src={`${API_BASE_URL}/students/${selectedCertificate.id}/certificate/`}
+                    src={`${API_BASE_URL}/students/${selectedCertificate.id}/certificate/?size=preview`}
                     alt={`${selectedCertificate.name}'s Certificate`}
                     width={800}
                     height={600}
@@ -195,7 +195,8 @@ export default function MemoryBoardPage() {
     async function fetchStudents() {
       try {
         setLoading(true)
-        const data = await getStudents()
+        // The list leaves these out unless asked for
+        const data = await getStudents({ expand: "last_words,certificate_url" })
         console.log("API Response:", data)
         setStudents(data.results || [])
       } catch (error) {
@@ -421,7 +422,7 @@ export default function MemoryBoardPage() {
               <div className="text-center">
                 <div className="relative inline-block">
                   <Image
-                    src={selectedStudent.certificate_url}
+                    src={`${selectedStudent.certificate_url}?size=preview`}
                     alt={`${selectedStudent.name}'s Certificate`}
                     width={1200}
                     height={800}
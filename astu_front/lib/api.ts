@@ -52,6 +52,7 @@ export async function getStudents(params?: {
   department?: number;
   search?: string;
   page?: number;
+  expand?: string;
 }) {
   const searchParams = new URLSearchParams();
 
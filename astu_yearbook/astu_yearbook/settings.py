@@ -49,9 +49,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yearbook.querycount.QueryCountMiddleware',  # X-Query-* headers, only when QUERY_COUNT_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files securely
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'yearbook.sessions.SessionRefreshMiddleware',  # Coarse sliding expiry, expired session sweep
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,6 +62,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'csp.middleware.CSPMiddleware',  # Content Security Policy middleware
     'yearbook.security.SecurityMiddleware',  # Custom security middleware
+    'yearbook.throttling.RateLimitHeadersMiddleware',  # X-RateLimit-* headers
 ]
 
 ROOT_URLCONF = 'astu_yearbook.urls'
@@ -171,6 +174,61 @@ MAX_UPLOAD_SIZE = config('MAX_UPLOAD_SIZE', default=5, cast=int) * 1024 * 1024
 FILE_UPLOAD_MAX_MEMORY_SIZE = MAX_UPLOAD_SIZE
 DATA_UPLOAD_MAX_MEMORY_SIZE = MAX_UPLOAD_SIZE
 
+# Certificates
+# Base URL of the public verification page printed on every certificate.
+# Changing it marks every stored certificate as stale.
+CERTIFICATE_VERIFY_BASE_URL = config('CERTIFICATE_VERIFY_BASE_URL', default='http://172.27.12.216:8000')
+
+# Caching
+# Redis is shared by every gunicorn worker; without REDIS_URL each process gets its own locmem cache
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                # Serve from the database instead of failing requests while Redis is down
+                'IGNORE_EXCEPTIONS': True,
+            },
+            'KEY_PREFIX': 'astu',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'astu-yearbook',
+        }
+    }
+
+# API response cache (yearbook/response_cache.py): per-worker LRU in front of the shared cache.
+# Off without Redis: the version tokens would be per process, and a write in one worker
+# (or a management command) would leave the others serving stale responses
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=bool(REDIS_URL), cast=bool)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=600, cast=int)
+RESPONSE_CACHE_L1_ENTRIES = 256
+
+# `?cursor=&total=approx` (yearbook/pagination.py): how long a filtered row count is reused
+APPROXIMATE_COUNT_TIMEOUT = config('APPROXIMATE_COUNT_TIMEOUT', default=300, cast=int)
+
+# Query counting (yearbook/querycount.py): X-Query-* headers and N+1 warnings, development only
+QUERY_COUNT_ENABLED = config('QUERY_COUNT_ENABLED', default=DEBUG, cast=bool)
+# A query shape executed this many times in one request is reported as an N+1
+QUERY_REPEAT_THRESHOLD = 5
+
+# Media delivery for certificate downloads
+# 'django' streams files through the app server; 'nginx' hands them off with
+# X-Accel-Redirect to the internal /protected-media/ location (see nginx/conf.d).
+MEDIA_DELIVERY = config('MEDIA_DELIVERY', default='django')
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = config('MEDIA_CACHE_MAX_AGE', default=3600, cast=int)
+
+# On-the-fly image resizing (/yearbook/media-transform/): disk cache budget, LRU evicted
+MEDIA_TRANSFORM_CACHE_BYTES = config('MEDIA_TRANSFORM_CACHE_MB', default=512, cast=int) * 1024 * 1024
+MEDIA_TRANSFORM_MAX_DIMENSION = 2400
+
 # Allowed file extensions for uploads
 ALLOWED_IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
 ALLOWED_DOCUMENT_EXTENSIONS = ['.pdf', '.doc', '.docx']
@@ -204,6 +262,12 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
 ]
+CORS_EXPOSE_HEADERS = [
+    'x-ratelimit-limit',
+    'x-ratelimit-remaining',
+    'x-ratelimit-reset',
+    'retry-after',
+]
 
 # REST Framework settings
 REST_FRAMEWORK = {
@@ -213,13 +277,22 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'yearbook.throttling.SlidingWindowThrottle',
     ],
-    'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/hour',  # Anonymous users
-        'user': '1000/hour'  # Authenticated users
-    }
+}
+
+# Rate limits (yearbook/throttling.py), counted in the shared cache with a sliding window.
+# '<router basename>-<action>' scopes override the anon/user defaults for that endpoint;
+# every request is counted against exactly one scope.
+THROTTLE_RATES = {
+    'anon': '100/hour',  # Anonymous users
+    'user': '1000/hour',  # Authenticated users
+    'student-list': '200/hour',
+    'student-create': '50/hour',
+    'student-autocomplete': '1200/hour',  # one request per keystroke
+    'memoryboard-list': '100/hour',
+    'memoryboard-create': '30/hour',
+    'verify_certificate': '20/minute',
 }
 
 # Add BrowsableAPIRenderer only in DEBUG mode
@@ -261,9 +334,26 @@ CSRF_TRUSTED_ORIGINS = config(
 )
 
 # Session Security
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Database-backed sessions
+# 'cached_db' reads sessions from the cache and writes through to the database,
+# 'cache' keeps them only in Redis, 'db' is the plain database backend.
+# Both cached stores need the shared Redis cache: with a per-process locmem cache
+# a session deleted on logout would stay valid in the other workers' caches
+SESSION_STORE = config('SESSION_STORE', default='cached_db' if REDIS_URL else 'db')
+if SESSION_STORE in ('cached_db', 'cache') and not REDIS_URL:
+    from django.core.exceptions import ImproperlyConfigured
+    raise ImproperlyConfigured(f"SESSION_STORE={SESSION_STORE} requires REDIS_URL, use SESSION_STORE=db without Redis")
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+}[SESSION_STORE]
 SESSION_COOKIE_AGE = config('SESSION_COOKIE_AGE', default=3600, cast=int)  # 1 hour default
-SESSION_SAVE_EVERY_REQUEST = config('SESSION_SAVE_EVERY_REQUEST', default=True, cast=bool)
+# Sessions are only written when they change; yearbook.sessions.SessionRefreshMiddleware
+# extends the expiry of active sessions at most once per SESSION_REFRESH_INTERVAL seconds
+SESSION_SAVE_EVERY_REQUEST = config('SESSION_SAVE_EVERY_REQUEST', default=False, cast=bool)
+SESSION_REFRESH_INTERVAL = config('SESSION_REFRESH_INTERVAL', default=300, cast=int)
+# Expired sessions are deleted by one worker at most once per interval (0 disables, use clearsessions)
+SESSION_SWEEP_INTERVAL = config('SESSION_SWEEP_INTERVAL', default=3600, cast=int)
 SESSION_EXPIRE_AT_BROWSER_CLOSE = config('SESSION_EXPIRE_AT_BROWSER_CLOSE', default=True, cast=bool)
 
 # Security Headers
@@ -325,6 +415,16 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': False,
         },
+        'yearbook.queries': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'yearbook': {
+            'handlers': ['file', 'console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
 
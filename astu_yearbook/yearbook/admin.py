@@ -7,11 +7,17 @@ from django.contrib.admin import AdminSite
 from django.http import HttpResponseRedirect
 from django.shortcuts import render
 from django.contrib import messages
+from django.core.exceptions import PermissionDenied
 from django.db import transaction
 from django.core.files.base import ContentFile
 import os
 from .models import *
-from .certificate_generator import CertificateGenerator
+from .certificate_service import get_certificate_service
+from .media_transform import transform_url
+from .response_cache import bump_versions
+from .student_import import OPTIONAL_COLUMNS, REQUIRED_COLUMNS, ImportFileError, StudentImporter
+from django import forms
+from django.urls import path
 
 # Custom Admin Site Configuration
 admin.site.site_header = "INSA Cyber Talent Yearbook Administration"
@@ -50,12 +56,19 @@ class DepartmentAdmin(admin.ModelAdmin):
     intro_message_preview.short_description = "Intro Message"
     
     def student_count(self, obj):
-        return obj.students.count()
+        return obj.student_count
     student_count.short_description = "Students"
+    student_count.admin_order_field = 'student_count'
+
+class StudentImportForm(forms.Form):
+    sheet = forms.FileField(help_text="CSV or XLSX file, one student per row")
+    photos = forms.FileField(help_text="ZIP archive with the photos named in the \"photo\" column")
+    dry_run = forms.BooleanField(required=False, help_text="Only validate the rows, import nothing")
 
 # Student Admin with comprehensive controls
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/yearbook/student/change_list.html'
     list_display = ('student_id', 'name', 'department', 'is_featured', 'photo_preview', 'quote_preview', 'has_certificate')
     list_filter = ('department', 'is_featured', 'created_at')
     search_fields = ('student_id', 'name', 'quote', 'last_words', 'highlight_tagline')
@@ -80,7 +93,7 @@ class StudentAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ('created_at', 'updated_at', 'has_certificate')
+    readonly_fields = ('created_at', 'updated_at', 'has_certificate', 'certificate_generated_at')
     
     actions = ['generate_certificates', 'mark_as_featured', 'mark_as_not_featured']
     
@@ -88,7 +101,7 @@ class StudentAdmin(admin.ModelAdmin):
         if obj.photo:
             return format_html(
                 '<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 5px;" />',
-                obj.photo.url
+                transform_url(obj.photo.name, width=120, height=120, fit='cover')
             )
         return "No photo"
     photo_preview.short_description = "Photo"
@@ -98,52 +111,95 @@ class StudentAdmin(admin.ModelAdmin):
     quote_preview.short_description = "Quote"
     
     def has_certificate(self, obj):
-        try:
-            generator = CertificateGenerator()
-            certificate_path = generator.get_certificate_url(obj.student_id, obj.name, obj.department.name, 2024)
-            if certificate_path:
-                return format_html('<span style="color: green;">✓ Generated</span>')
-            else:
-                return format_html('<span style="color: red;">✗ Not Generated</span>')
-        except:
-            return format_html('<span style="color: red;">✗ Error</span>')
+        if obj.has_certificate:
+            return format_html('<span style="color: green;">✓ Generated</span>')
+        return format_html('<span style="color: red;">✗ Not Generated</span>')
     has_certificate.short_description = "Certificate"
     
     def generate_certificates(self, request, queryset):
-        generator = CertificateGenerator()
-        generated = 0
-        failed = 0
-        
-        for student in queryset:
-            try:
-                certificate_path = generator.generate_certificate(
-                    student.student_id, 
-                    student.name, 
-                    student.department.name, 
-                    2024
-                )
-                if certificate_path:
-                    generated += 1
-                else:
-                    failed += 1
-            except Exception as e:
-                failed += 1
-        
-        if generated > 0:
-            messages.success(request, f'Successfully generated {generated} certificates.')
-        if failed > 0:
-            messages.error(request, f'Failed to generate {failed} certificates.')
+        queued = get_certificate_service().request_renders(queryset.values_list('pk', flat=True))
+        messages.success(request, f'Queued {queued} certificates for generation.')
     generate_certificates.short_description = "Generate certificates for selected students"
     
     def mark_as_featured(self, request, queryset):
         queryset.update(is_featured=True)
+        # update() sends no post_save, so the cached student responses are invalidated here
+        transaction.on_commit(lambda: bump_versions(['yearbook.Student']))
         messages.success(request, f'Marked {queryset.count()} students as featured.')
     mark_as_featured.short_description = "Mark as featured"
     
     def mark_as_not_featured(self, request, queryset):
         queryset.update(is_featured=False)
+        # update() sends no post_save, so the cached student responses are invalidated here
+        transaction.on_commit(lambda: bump_versions(['yearbook.Student']))
         messages.success(request, f'Marked {queryset.count()} students as not featured.')
     mark_as_not_featured.short_description = "Mark as not featured"
+    
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_students_view), name='yearbook_student_import'),
+        ]
+        return urls + super().get_urls()
+    
+    def import_students_view(self, request):
+        """Bulk import a cohort from a sheet and a ZIP of photos (see yearbook/student_import.py)"""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = StudentImportForm(request.POST or None, request.FILES or None)
+        result = None
+        if request.method == 'POST' and form.is_valid():
+            sheet = form.cleaned_data['sheet']
+            try:
+                result = StudentImporter(
+                    sheet,
+                    sheet.name,
+                    form.cleaned_data['photos'],
+                    dry_run=form.cleaned_data['dry_run'],
+                    # Keep the request short, derivatives are generated after the response
+                    background_derivatives=True,
+                ).run()
+            except ImportFileError as e:
+                form.add_error(None, str(e))
+            else:
+                verb = 'validated' if form.cleaned_data['dry_run'] else 'imported'
+                level = messages.WARNING if result.errors else messages.SUCCESS
+                messages.add_message(request, level, f'{len(result.created)} of {result.rows} students {verb}, {len(result.errors)} rows with errors.')
+                if result.failed_batch:
+                    first, last, error = result.failed_batch
+                    messages.error(request, f'The import stopped at lines {first}-{last} ({error}), the rows after them were not read.')
+                if not result.errors and not form.cleaned_data['dry_run']:
+                    return HttpResponseRedirect(reverse('admin:yearbook_student_changelist'))
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import students',
+            'form': form,
+            'result': result,
+            'required_columns': REQUIRED_COLUMNS,
+            'optional_columns': OPTIONAL_COLUMNS,
+        }
+        return render(request, 'admin/yearbook/student/import.html', context)
+
+# Certificate Job Admin
+@admin.register(CertificateJob)
+class CertificateJobAdmin(admin.ModelAdmin):
+    list_display = ('student', 'status', 'attempts', 'created_at', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('student__student_id', 'student__name')
+    readonly_fields = ('student', 'attempts', 'last_error', 'created_at', 'updated_at')
+    list_select_related = ('student__department',)
+    actions = ['retry_jobs']
+    
+    def has_add_permission(self, request):
+        # Jobs are created by saves and certificate actions
+        return False
+    
+    def retry_jobs(self, request, queryset):
+        student_ids = list(queryset.filter(status='FAILED').values_list('student_id', flat=True))
+        queryset.filter(status='FAILED').delete()
+        queued = get_certificate_service().request_renders(student_ids)
+        messages.success(request, f'Requeued {queued} certificates.')
+    retry_jobs.short_description = "Retry failed jobs"
 
 # Faculty Tribute Admin - HIDDEN FROM ADMIN
 # @admin.register(FacultyTribute)
@@ -166,7 +222,7 @@ class FacultyTributeAdmin(admin.ModelAdmin):
         if obj.photo:
             return format_html(
                 '<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 5px;" />',
-                obj.photo.url
+                transform_url(obj.photo.name, width=120, height=120, fit='cover')
             )
         return "No photo"
     photo_preview.short_description = "Photo"
@@ -200,7 +256,7 @@ class DirectorGeneralMessageAdmin(admin.ModelAdmin):
         if obj.photo:
             return format_html(
                 '<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 5px;" />',
-                obj.photo.url
+                transform_url(obj.photo.name, width=120, height=120, fit='cover')
             )
         return "No photo"
     photo_preview.short_description = "Photo"
@@ -233,7 +289,7 @@ class CyberTalentDirectorMessageAdmin(admin.ModelAdmin):
         if obj.photo:
             return format_html(
                 '<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 5px;" />',
-                obj.photo.url
+                transform_url(obj.photo.name, width=120, height=120, fit='cover')
             )
         return "No photo"
     photo_preview.short_description = "Photo"
@@ -273,9 +329,9 @@ class MemoryCategoryAdmin(admin.ModelAdmin):
     color_preview.short_description = "Color"
     
     def memory_count(self, obj):
-        count = obj.memories.count()
-        return format_html('<strong>{}</strong> memories', count)
+        return format_html('<strong>{}</strong> memories', obj.memory_count)
     memory_count.short_description = "Memories"
+    memory_count.admin_order_field = 'memory_count'
 
 
 # Memory Board Admin
@@ -314,7 +370,7 @@ class MemoryBoardAdmin(admin.ModelAdmin):
         if obj.photo:
             return format_html(
                 '<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 5px;" />',
-                obj.photo.url
+                transform_url(obj.photo.name, width=120, height=120, fit='cover')
             )
         return "No photo"
     photo_preview.short_description = "Photo"
@@ -341,7 +397,7 @@ class TraineeSuccessStoryAdmin(admin.ModelAdmin):
         if obj.photo:
             return format_html(
                 '<img src="{}" style="width: 50px; height: 50px; object-fit: cover; border-radius: 5px;" />',
-                obj.photo.url
+                transform_url(obj.photo.name, width=120, height=120, fit='cover')
             )
         return "No photo"
     photo_preview.short_description = "Photo"
@@ -420,7 +476,7 @@ class LeadershipAdmin(admin.ModelAdmin):
         if obj.photo:
             return format_html(
                 '<img src="{}" style="width: 60px; height: 60px; object-fit: cover; border-radius: 50%;" />',
-                obj.photo.url
+                transform_url(obj.photo.name, width=120, height=120, fit='cover')
             )
         return "No photo"
     photo_preview.short_description = "Photo"
@@ -434,65 +490,14 @@ class CertificateManagementAdmin(admin.ModelAdmin):
     actions = ['generate_all_certificates', 'regenerate_certificates']
     
     def generate_all_certificates(self, request, queryset):
-        generator = CertificateGenerator()
-        generated = 0
-        failed = 0
-        
-        students = Student.objects.all()
-        for student in students:
-            try:
-                certificate_path = generator.generate_certificate(
-                    student.student_id, 
-                    student.name, 
-                    student.department.name, 
-                    2024
-                )
-                if certificate_path:
-                    generated += 1
-                else:
-                    failed += 1
-            except Exception as e:
-                failed += 1
-        
-        if generated > 0:
-            messages.success(request, f'Successfully generated {generated} certificates.')
-        if failed > 0:
-            messages.error(request, f'Failed to generate {failed} certificates.')
+        queued = get_certificate_service().request_renders(Student.objects.values_list('pk', flat=True))
+        messages.success(request, f'Queued {queued} certificates for generation.')
     generate_all_certificates.short_description = "Generate certificates for ALL students"
     
     def regenerate_certificates(self, request, queryset):
-        generator = CertificateGenerator()
-        regenerated = 0
-        failed = 0
-        
-        for student in queryset:
-            try:
-                # Force regeneration by deleting existing certificate first
-                import os
-                from django.conf import settings
-                certificate_filename = f"{student.student_id}_{student.name.replace(' ', '_')}_certificate.png"
-                certificate_path = os.path.join(settings.MEDIA_ROOT, "certificates", "generated", certificate_filename)
-                
-                if os.path.exists(certificate_path):
-                    os.remove(certificate_path)
-                
-                certificate_path = generator.generate_certificate(
-                    student.student_id, 
-                    student.name, 
-                    student.department.name, 
-                    2024
-                )
-                if certificate_path:
-                    regenerated += 1
-                else:
-                    failed += 1
-            except Exception as e:
-                failed += 1
-        
-        if regenerated > 0:
-            messages.success(request, f'Successfully regenerated {regenerated} certificates.')
-        if failed > 0:
-            messages.error(request, f'Failed to regenerate {failed} certificates.')
+        # Certificates are stored by a hash of their inputs, so only stale ones are re-rendered
+        queued = get_certificate_service().request_renders(queryset.values_list('pk', flat=True))
+        messages.success(request, f'Queued {queued} certificates for regeneration.')
     regenerate_certificates.short_description = "Regenerate certificates for selected students"
 
 # Apply the certificate management to Student admin
@@ -0,0 +1,234 @@
+# yearbook/autocomplete.py
+"""
+Typo-tolerant student lookup by name or ID from an in-process trigram index.
+
+Each worker builds the index on its first lookup (one query) and then answers
+every keystroke from memory. Names are normalized before indexing: accents
+are stripped and a few transliteration variants common in Ethiopian names
+are folded together ("Alemayehou" -> "alemayehu", "Tigiest" -> "tigist"),
+and the remaining spelling differences are absorbed by trigram similarity.
+
+Saves and deletes in this process update the index directly (see
+signals.py). Changes made by other processes are picked up through the
+cache: when the Student version token differs from the one the index was
+synced at, the next lookup fetches only the rows updated since then and
+removes the students listed in the deletion log since its last sync.
+Department renames have a token of their own (the Department response
+token also changes on every student create and delete) and rebuild the
+index.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from .models import Student
+from .response_cache import bump_versions, get_versions
+
+DEPARTMENT_NAMES_LABEL = 'yearbook.Department.name'
+VERSION_LABELS = ('yearbook.Student', DEPARTMENT_NAMES_LABEL)
+# Deleted student pks, one key per deletion numbered by the sequence key
+DELETION_KEY = 'yearbook:autocomplete:deleted'
+DELETION_LOG_TIMEOUT = 24 * 3600
+# Past this many deletions a rebuild is cheaper than catching up
+MAX_DELETION_CATCH_UP = 1000
+MAX_CANDIDATES = 200
+# Below this only a letter or two happen to coincide
+MIN_SCORE = 0.35
+# Applied in order after lowercasing and stripping accents
+TRANSLITERATIONS = (('ou', 'u'), ('ph', 'f'), ('ie', 'i'), ('ee', 'i'), ('aa', 'a'), ('oo', 'u'))
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    for variant, canonical in TRANSLITERATIONS:
+        text = text.replace(variant, canonical)
+    return re.findall(r'[a-z0-9]+', text)
+
+
+def trigrams(token, partial=False):
+    """Trigrams of one word; a partial word (still being typed) is not padded at the end"""
+    padded = f'  {token}' if partial else f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def deletion_sequence():
+    """Number of the last logged deletion, None when the cache is unavailable"""
+    # Started at the current time in microseconds, so an evicted sequence restarts far from where it was
+    cache.add(DELETION_KEY, time.time_ns() // 1000, None)
+    return cache.get(DELETION_KEY)
+
+
+def record_deletion(pk):
+    """Add a deleted student to the log the indexes of other processes catch up from"""
+    deletion_sequence()
+    try:
+        sequence = cache.incr(DELETION_KEY)
+    except ValueError:
+        # Evicted in between, the indexes rebuild when they see the restarted sequence
+        return
+    cache.set(f'{DELETION_KEY}:{sequence}', pk, DELETION_LOG_TIMEOUT)
+
+
+def record_department_rename():
+    bump_versions([DEPARTMENT_NAMES_LABEL])
+
+
+class StudentNameIndex:
+    def __init__(self):
+        self.entries = {}
+        self.postings = {}
+        self.lock = threading.RLock()
+        self.versions = None
+        self.deletion_sequence = None
+        self.synced_at = None
+
+    def _index(self, pk, name, student_id, department_name):
+        self._remove(pk)
+        tokens = normalize(name) + normalize(student_id)
+        token_grams = [(token, trigrams(token)) for token in tokens]
+        self.entries[pk] = {
+            'id': pk,
+            'student_id': student_id,
+            'name': name,
+            'department_name': department_name,
+            'tokens': token_grams,
+        }
+        for _, grams in token_grams:
+            for gram in grams:
+                self.postings.setdefault(gram, set()).add(pk)
+
+    def _remove(self, pk):
+        entry = self.entries.pop(pk, None)
+        if entry is None:
+            return
+        for _, grams in entry['tokens']:
+            for gram in grams:
+                posting = self.postings.get(gram)
+                if posting is not None:
+                    posting.discard(pk)
+                    if not posting:
+                        del self.postings[gram]
+
+    @staticmethod
+    def _rows(queryset):
+        return queryset.values_list('pk', 'name', 'student_id', 'department__name')
+
+    def rebuild(self):
+        started = timezone.now()
+        rows = list(self._rows(Student.objects.all()))
+        with self.lock:
+            self.entries = {}
+            self.postings = {}
+            for row in rows:
+                self._index(*row)
+            self.synced_at = started
+
+    def deleted_since_sync(self, sequence):
+        """Pks deleted between the last sync and `sequence`, None when the log cannot tell"""
+        if sequence == self.deletion_sequence:
+            return []
+        if sequence is None or self.deletion_sequence is None:
+            return None
+        if not self.deletion_sequence < sequence <= self.deletion_sequence + MAX_DELETION_CATCH_UP:
+            return None
+        keys = [f'{DELETION_KEY}:{n}' for n in range(self.deletion_sequence + 1, sequence + 1)]
+        deleted = cache.get_many(keys)
+        # Expired, evicted, or the deleting process has not written its entry yet
+        if len(deleted) != len(keys):
+            return None
+        return list(deleted.values())
+
+    def sync(self):
+        """Bring the index up to date with writes of other processes, if there were any"""
+        versions = get_versions(VERSION_LABELS)
+        # Read before the rows: a deletion in between is then removed twice rather than missed
+        sequence = deletion_sequence()
+        if self.synced_at is None:
+            self.rebuild()
+        elif versions is None or versions == self.versions:
+            # Unchanged, or no shared cache to compare against: this process's signals keep it current
+            return
+        else:
+            deleted = self.deleted_since_sync(sequence)
+            if self.versions is None or versions[1] != self.versions[1] or deleted is None:
+                # A department was renamed (every entry may carry its name), or deletions went unlogged
+                self.rebuild()
+            else:
+                # Rows saved while the last sync ran may carry a slightly older updated_at
+                since = self.synced_at - timedelta(seconds=5)
+                started = timezone.now()
+                changed = list(self._rows(Student.objects.filter(updated_at__gte=since)))
+                with self.lock:
+                    for row in changed:
+                        self._index(*row)
+                    for pk in deleted:
+                        self._remove(pk)
+                    self.synced_at = started
+        self.versions = versions
+        self.deletion_sequence = sequence
+
+    def update(self, student):
+        """Reflect a save in this process immediately"""
+        with self.lock:
+            if self.synced_at is not None:
+                self._index(student.pk, student.name, student.student_id, student.department.name)
+
+    def remove(self, pk):
+        with self.lock:
+            self._remove(pk)
+
+    def search(self, query, limit=10):
+        tokens = normalize(query)
+        if not tokens:
+            return []
+        # The last word is usually still being typed
+        query_grams = [trigrams(token, partial=(i == len(tokens) - 1)) for i, token in enumerate(tokens)]
+        with self.lock:
+            hits = Counter()
+            for grams in query_grams:
+                for gram in grams:
+                    hits.update(self.postings.get(gram, ()))
+            scored = []
+            for pk, _ in hits.most_common(MAX_CANDIDATES):
+                entry = self.entries[pk]
+                score = sum(self._match(token, grams, entry['tokens']) for token, grams in zip(tokens, query_grams)) / len(tokens)
+                if score >= MIN_SCORE:
+                    scored.append((score, entry['name'], entry))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [
+            {key: entry[key] for key in ('id', 'student_id', 'name', 'department_name')} | {'score': round(score, 3)}
+            for score, _, entry in scored[:limit]
+        ]
+
+    @staticmethod
+    def _match(query_token, query_grams, name_tokens):
+        """Best similarity of one query word with any word of the name, prefixes score highest"""
+        best = 0.0
+        for token, grams in name_tokens:
+            shared = len(query_grams & grams)
+            if not shared:
+                continue
+            # Share of the typed trigrams found, plus how closely the word lengths agree
+            score = 0.7 * shared / len(query_grams) + 0.3 * shared / len(query_grams | grams)
+            if token.startswith(query_token):
+                score += 0.3
+            best = max(best, score)
+        return best
+
+
+_index = StudentNameIndex()
+
+
+def get_name_index():
+    return _index
+
+
+def autocomplete(query, limit=10):
+    _index.sync()
+    return _index.search(query, limit)
@@ -0,0 +1,72 @@
+# yearbook/certificate_export.py
+"""
+Streaming ZIP export of student certificates.
+
+The archive is produced incrementally: zipfile writes into a small buffer that
+is drained after every chunk, so memory stays bounded by one read chunk no
+matter how many students are exported. Missing or stale certificates are
+rendered on the fly through the CertificateService.
+"""
+
+import os
+import zipfile
+from .certificate_service import get_certificate_service
+from .security import sanitize_filename
+
+CHUNK_SIZE = 256 * 1024
+
+
+class _StreamBuffer:
+    """Write-only, unseekable file object whose contents are drained by the generator"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_certificate_zip(students, size='full', fmt='png'):
+    """
+    Yield a ZIP archive of the certificates of `students` (an iterable of Student)
+    in chunks. Students whose certificate cannot be rendered are listed in
+    `errors.txt` at the end of the archive.
+    """
+    service = get_certificate_service()
+    buffer = _StreamBuffer()
+    failures = []
+
+    # Certificates are already compressed images, storing them avoids burning CPU for nothing
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for student in students:
+            certificate_path = service.get_rendition_path(student, size, fmt)
+            full_path = service.absolute_path(certificate_path) if certificate_path else None
+            if full_path is None or not os.path.exists(full_path):
+                failures.append(f'{student.student_id}\t{student.name}')
+                continue
+
+            department = sanitize_filename(student.department.name if student.department_id else 'General')
+            extension = os.path.splitext(certificate_path)[1]
+            arcname = f'{department}/{sanitize_filename(f"{student.student_id}_certificate{extension}")}'
+            with open(full_path, 'rb') as source, archive.open(arcname, 'w', force_zip64=True) as target:
+                for block in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    target.write(block)
+                    yield buffer.drain()
+
+        if failures:
+            archive.writestr('errors.txt', 'Certificates that could not be generated:\n' + '\n'.join(failures) + '\n')
+    yield buffer.drain()
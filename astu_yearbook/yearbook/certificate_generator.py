@@ -1,7 +1,140 @@
+import hashlib
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
 from django.conf import settings
-import traceback
+
+
+# Layout of the certificate template
+FONT_PATH = "arial.ttf"
+NAME_FONT_SIZE = 150   # bigger for name
+LINK_FONT_SIZE = 50    # smaller for link
+NAME_Y = 1070          # Fixed position for name
+LINK_Y = 2100          # Fixed position for verification link
+
+# Bump when the drawing code changes so every stored certificate becomes stale
+RENDER_VERSION = 1
+
+# Renditions written next to every certificate, keyed by (size, format).
+# Values are (width in pixels or None for the full template, PIL format, save options).
+# The full-size PNG is the certificate itself; everything else is derived from it.
+CERTIFICATE_RENDITIONS = {
+    ('thumbnail', 'webp'): (480, 'WEBP', {'quality': 80, 'method': 4}),
+    ('thumbnail', 'jpeg'): (480, 'JPEG', {'quality': 80, 'optimize': True}),
+    ('preview', 'jpeg'): (1400, 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    ('preview', 'webp'): (1400, 'WEBP', {'quality': 85, 'method': 4}),
+    ('full', 'png'): (None, 'PNG', {}),
+    ('full', 'pdf'): (None, 'PDF', {'resolution': 300.0}),
+}
+# Format used when a size is requested without one
+DEFAULT_RENDITION_FORMATS = {'thumbnail': 'webp', 'preview': 'jpeg', 'full': 'png'}
+# Renditions produced eagerly at render time; the others are derived on first request
+EAGER_RENDITIONS = (('thumbnail', 'webp'), ('preview', 'jpeg'), ('full', 'pdf'))
+RENDITION_CONTENT_TYPES = {
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'pdf': 'application/pdf',
+}
+
+
+class CertificateRenderer:
+    """
+    Draws certificates on top of a template that is decoded only once per process.
+
+    The template image and the fonts are loaded on first use and kept in memory;
+    every certificate is drawn on a copy of the cached base image, so rendering a
+    batch only pays for the copy, the text drawing and the PNG encoding.
+    """
+    _lock = threading.Lock()
+    _templates = {}
+    _fonts = {}
+    _fingerprints = {}
+
+    def __init__(self, template_path):
+        self.template_path = template_path
+
+    @classmethod
+    def clear_cache(cls):
+        """Drop every cached template and font (used by benchmarks and tests)"""
+        with cls._lock:
+            cls._templates.clear()
+            cls._fonts.clear()
+            cls._fingerprints.clear()
+
+    def get_template(self):
+        """Return the decoded template image, loading it on first use"""
+        template = self._templates.get(self.template_path)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(self.template_path)
+                if template is None:
+                    with Image.open(self.template_path) as img:
+                        img.load()
+                        template = img.copy()
+                    self._templates[self.template_path] = template
+        return template
+
+    def get_font(self, size):
+        """Return the certificate font at the given size, loading it on first use"""
+        font = self._fonts.get(size)
+        if font is None:
+            with self._lock:
+                font = self._fonts.get(size)
+                if font is None:
+                    try:
+                        font = ImageFont.truetype(FONT_PATH, size)
+                    except OSError:
+                        # Fallback to default font if arial.ttf is not found
+                        font = ImageFont.load_default()
+                    self._fonts[size] = font
+        return font
+
+    def fingerprint(self):
+        """
+        Digest of everything except the student that affects the rendered image:
+        the template bytes, the fonts, the layout and the render version
+        """
+        fingerprint = self._fingerprints.get(self.template_path)
+        if fingerprint is None:
+            digest = hashlib.sha256()
+            with open(self.template_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            for size in (NAME_FONT_SIZE, LINK_FONT_SIZE):
+                font = self.get_font(size)
+                name = font.getname() if hasattr(font, 'getname') else 'default'
+                digest.update(f"{name}:{size}".encode())
+            digest.update(f"{NAME_Y}:{LINK_Y}:{RENDER_VERSION}".encode())
+            fingerprint = digest.hexdigest()
+            with self._lock:
+                self._fingerprints[self.template_path] = fingerprint
+        return fingerprint
+
+    def render(self, student_name, verification_link):
+        """
+        Draw the student name and the verification link on a fresh copy of the template
+        """
+        img = self.get_template().copy()
+        draw = ImageDraw.Draw(img)
+        font_name = self.get_font(NAME_FONT_SIZE)
+        font_link = self.get_font(LINK_FONT_SIZE)
+
+        # Add student name (centered horizontally, fixed vertical position)
+        name_bbox = draw.textbbox((0, 0), student_name, font=font_name)
+        name_width = name_bbox[2] - name_bbox[0]
+        name_x = (img.width - name_width) // 2
+        draw.text((name_x, NAME_Y), student_name, fill="black", font=font_name)
+
+        # Add verification link (centered horizontally, fixed vertical position)
+        link_bbox = draw.textbbox((0, 0), verification_link, font=font_link)
+        link_width = link_bbox[2] - link_bbox[0]
+        link_x = (img.width - link_width) // 2
+        draw.text((link_x, LINK_Y), verification_link, fill="blue", font=font_link)
+
+        return img
+
 
 class CertificateGenerator:
     def __init__(self):
@@ -9,72 +142,149 @@ class CertificateGenerator:
         self.template_path = os.path.join(settings.MEDIA_ROOT, 'certificates', 'insa_summercamp_certeficate.png')
         self.output_dir = os.path.join(settings.MEDIA_ROOT, 'certificates', 'generated')
         os.makedirs(self.output_dir, exist_ok=True)
-    
-    def generate_certificate(self, student_id, student_name, department, graduation_year=2024):
+        self.renderer = CertificateRenderer(self.template_path)
+
+    def verification_link(self, student_id):
+        """Public verification page printed on the certificate"""
+        base_url = getattr(settings, 'CERTIFICATE_VERIFY_BASE_URL', 'http://172.27.12.216:8000')
+        return f"{base_url.rstrip('/')}/yearbook/verify/{student_id}/"
+
+    def certificate_key(self, student_id, student_name, verification_link=None):
         """
-        Generate a certificate for a student using the exact logic from the working FastAPI app
+        Content address of a certificate: a hash of the template, fonts, name, ID and verification link.
+        A stored certificate is stale as soon as any of those inputs change.
         """
-        try:
-            # Check if template exists
-            if not os.path.exists(self.template_path):
-                print(f"Template image not found at: {self.template_path}")
-                return None
-
-            # Load the certificate template
-            img = Image.open(self.template_path)
-            draw = ImageDraw.Draw(img)
-            
-            # Fonts - Use the same logic as the working certificate verification app
-            try:
-                font_path = "arial.ttf"
-                font_name = ImageFont.truetype(font_path, 150)  # bigger for name
-                font_link = ImageFont.truetype(font_path, 50)    # smaller for link
-            except OSError:
-                # Fallback to default font if arial.ttf is not found
-                font_name = ImageFont.load_default()
-                font_link = ImageFont.load_default()
-            
-            # Add student name (centered horizontally, fixed vertical position)
-            name_text = student_name
-            name_bbox = draw.textbbox((0, 0), name_text, font=font_name)
-            name_width = name_bbox[2] - name_bbox[0]
-            name_x = (img.width - name_width) // 2
-            name_y = 1070  # Fixed position for name
-            draw.text((name_x, name_y), name_text, fill="black", font=font_name)
-            
-            # Add verification link (centered horizontally, fixed vertical position)
-            # Use local verification URL that actually works
-            verification_link = f"http://localhost:8085/yearbook/verify/{student_id}/"
-            link_bbox = draw.textbbox((0, 0), verification_link, font=font_link)
-            link_width = link_bbox[2] - link_bbox[0]
-            link_x = (img.width - link_width) // 2
-            link_y = 2100  # Fixed position for verification link
-            draw.text((link_x, link_y), verification_link, fill="blue", font=font_link)
-            
-            # Save certificate
-            filename = f"{student_id}_{student_name.replace(' ', '_')}_certificate.png"
-            output_path = os.path.join(self.output_dir, filename)
-            img.save(output_path)
-            
-            # Return relative path for URL generation
-            relative_path = f"certificates/generated/{filename}"
-            return relative_path
-            
-        except Exception as e:
-            print(f"Error generating certificate: {e}")
-            traceback.print_exc()
-            return None
-    
-    def get_certificate_url(self, student_id, student_name, department, graduation_year=2024):
+        if verification_link is None:
+            verification_link = self.verification_link(student_id)
+        digest = hashlib.sha256(self.renderer.fingerprint().encode())
+        for part in (student_id, student_name, verification_link):
+            digest.update(b'\0' + part.encode())
+        return digest.hexdigest()
+
+    def certificate_path(self, student_id, certificate_key):
+        """Path, relative to MEDIA_ROOT, of the certificate stored under this key"""
+        return f"certificates/generated/{student_id}_{certificate_key[:16]}.png"
+
+    def rendition_path(self, student_id, certificate_key, size='full', fmt='png'):
+        """Path, relative to MEDIA_ROOT, of one rendition of the certificate stored under this key"""
+        if (size, fmt) == ('full', 'png'):
+            return self.certificate_path(student_id, certificate_key)
+        extension = 'jpg' if fmt == 'jpeg' else fmt
+        return f"certificates/generated/{student_id}_{certificate_key[:16]}_{size}.{extension}"
+
+    def save_rendition(self, img, student_id, certificate_key, size, fmt):
+        """
+        Encode `img` (the full-size certificate) as one rendition, writing atomically.
+        Returns the rendition path relative to MEDIA_ROOT.
+        """
+        width, pil_format, options = CERTIFICATE_RENDITIONS[(size, fmt)]
+        relative_path = self.rendition_path(student_id, certificate_key, size, fmt)
+        output_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+        if width is not None and img.width > width:
+            height = round(img.height * width / img.width)
+            img = img.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        if pil_format in ('JPEG', 'PDF') and img.mode != 'RGB':
+            img = img.convert('RGB')
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        img.save(tmp_path, format=pil_format, **options)
+        os.replace(tmp_path, output_path)
+        return relative_path
+
+    def rendition(self, student_id, certificate_key, size='full', fmt='png'):
+        """
+        Return the path of a rendition of an existing certificate, deriving it from the
+        full-size PNG if it has not been produced yet (e.g. certificates rendered before
+        the rendition was added)
+        """
+        relative_path = self.rendition_path(student_id, certificate_key, size, fmt)
+        if not os.path.exists(os.path.join(settings.MEDIA_ROOT, relative_path)):
+            source = os.path.join(settings.MEDIA_ROOT, self.certificate_path(student_id, certificate_key))
+            with Image.open(source) as img:
+                img.load()
+                self.save_rendition(img, student_id, certificate_key, size, fmt)
+        return relative_path
+
+    def is_current(self, student_id, student_name, certificate_key, verification_link=None):
+        """
+        Return True if the certificate stored under `certificate_key` is up to date and on disk
+        """
+        if not certificate_key or not os.path.exists(self.template_path):
+            return False
+        if certificate_key != self.certificate_key(student_id, student_name, verification_link):
+            return False
+        return os.path.exists(os.path.join(settings.MEDIA_ROOT, self.certificate_path(student_id, certificate_key)))
+
+    def render_certificate(self, student_id, student_name, verification_link=None):
         """
-        Get or generate certificate URL for a student
+        Render and save a certificate, raising on failure (used by bulk generation for error reports).
+        Returns a (certificate_path, certificate_key) tuple.
         """
-        filename = f"{student_id}_{student_name.replace(' ', '_')}_certificate.png"
-        file_path = os.path.join(self.output_dir, filename)
-        
-        # Check if certificate already exists
-        if os.path.exists(file_path):
-            return f"certificates/generated/{filename}"
-        
-        # Generate new certificate
-        return self.generate_certificate(student_id, student_name, department, graduation_year)
\ No newline at end of file
+        # Check if template exists
+        if not os.path.exists(self.template_path):
+            raise FileNotFoundError(f"Template image not found at: {self.template_path}")
+
+        if verification_link is None:
+            verification_link = self.verification_link(student_id)
+        certificate_key = self.certificate_key(student_id, student_name, verification_link)
+        relative_path = self.certificate_path(student_id, certificate_key)
+        output_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+
+        # Identical inputs always produce the same file, reuse it if present
+        if not os.path.exists(output_path):
+            img = self.renderer.render(student_name, verification_link)
+            # Lighter renditions first, the PNG last: once it exists the certificate counts as current
+            for size, fmt in EAGER_RENDITIONS:
+                self.save_rendition(img, student_id, certificate_key, size, fmt)
+            # Write under a temporary name so readers never see a partial file
+            tmp_path = f"{output_path}.{os.getpid()}.tmp"
+            img.save(tmp_path, format='PNG')
+            os.replace(tmp_path, output_path)
+
+        return relative_path, certificate_key
+
+
+# Bulk generation
+#
+# Certificates are rendered in worker processes so that a whole cohort scales
+# with CPU cores. Workers only receive plain dicts (no model instances or DB
+# access), and each worker keeps its own cached template and fonts.
+
+_worker_generator = None
+
+
+def _init_certificate_worker():
+    """Load the template and fonts once when a worker process starts"""
+    global _worker_generator
+    _worker_generator = CertificateGenerator()
+    if os.path.exists(_worker_generator.template_path):
+        _worker_generator.renderer.get_template()
+
+
+def certificate_payload(student):
+    """Picklable description of a student for render_student_certificate"""
+    return {
+        'pk': student.pk,
+        'student_id': student.student_id,
+        'name': student.name,
+        'department': student.department.name if student.department_id else "General",
+    }
+
+
+def render_student_certificate(payload):
+    """
+    Render one certificate from a payload dict; an existing file for the same inputs is reused.
+    Returns (certificate_path, certificate_key, error).
+    """
+    global _worker_generator
+    if _worker_generator is None:
+        _worker_generator = CertificateGenerator()
+    try:
+        certificate_path, certificate_key = _worker_generator.render_certificate(payload['student_id'], payload['name'])
+        return certificate_path, certificate_key, None
+    except Exception as e:
+        return None, None, f"{type(e).__name__}: {e}"
+
+
+def certificate_worker_pool(workers=None):
+    """Process pool whose workers have the certificate template pre-loaded"""
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_certificate_worker)
@@ -0,0 +1,94 @@
+# yearbook/certificate_queue.py
+"""
+Database-backed queue for certificate rendering.
+
+Saving a student only records a CertificateJob; the PNG is rendered later by
+`manage.py run_certificate_worker`, so admin and API saves never block on
+image work. A partial unique constraint keeps at most one pending job per
+student, which collapses repeated saves into a single render.
+"""
+
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import CertificateJob
+
+
+def enqueue_certificates(student_ids):
+    """
+    Queue a certificate render for each student ID; students that already
+    have a pending job are skipped. Returns the number of IDs submitted.
+    """
+    student_ids = list(student_ids)
+    CertificateJob.objects.bulk_create(
+        [CertificateJob(student_id=student_id) for student_id in student_ids],
+        ignore_conflicts=True,
+        batch_size=500,
+    )
+    return len(student_ids)
+
+
+def enqueue_certificate(student):
+    """Queue a certificate render for one student"""
+    return enqueue_certificates([student.pk])
+
+
+def claim_jobs(limit):
+    """
+    Mark up to `limit` pending jobs as running and return them.
+
+    Each job is claimed with a conditional UPDATE, so concurrent workers never
+    process the same job even on databases without SELECT ... FOR UPDATE.
+    """
+    candidates = CertificateJob.objects.filter(status='PENDING').values_list('pk', flat=True)[:limit]
+    claimed = []
+    for job_id in list(candidates):
+        updated = CertificateJob.objects.filter(pk=job_id, status='PENDING').update(
+            status='RUNNING',
+            attempts=F('attempts') + 1,
+            updated_at=timezone.now(),
+        )
+        if updated:
+            claimed.append(job_id)
+    return list(CertificateJob.objects.filter(pk__in=claimed).select_related('student__department'))
+
+
+def complete_job(job, certificate_path, certificate_key):
+    """The render succeeded: store the certificate on the student and drop the job"""
+    job.student.record_certificate(certificate_path, certificate_key)
+    job.delete()
+
+
+def fail_job(job, error, max_attempts):
+    """Record a failed render and retry it until `max_attempts` is reached"""
+    job.last_error = error or ''
+    if job.attempts < max_attempts:
+        job.status = 'PENDING'
+        try:
+            with transaction.atomic():
+                job.save(update_fields=['status', 'last_error', 'updated_at'])
+        except IntegrityError:
+            # A newer request for this student is already pending
+            job.delete()
+    else:
+        job.status = 'FAILED'
+        job.save(update_fields=['status', 'last_error', 'updated_at'])
+
+
+def requeue_stale_jobs(older_than):
+    """
+    Put jobs left RUNNING by a crashed worker back in the queue.
+    Returns the number of jobs requeued.
+    """
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    requeued = 0
+    for job in CertificateJob.objects.filter(status='RUNNING', updated_at__lt=cutoff):
+        job.status = 'PENDING'
+        try:
+            with transaction.atomic():
+                job.save(update_fields=['status', 'updated_at'])
+            requeued += 1
+        except IntegrityError:
+            job.delete()
+    return requeued
@@ -0,0 +1,96 @@
+# yearbook/certificate_service.py
+"""
+Single entry point for student certificates.
+
+Views, the admin, signals and management commands all go through this module,
+so every code path renders with the same verification link, stores files under
+the same content key and performs the same cache lookup.
+"""
+
+import os
+import traceback
+from django.conf import settings
+from .certificate_generator import CertificateGenerator
+from .certificate_queue import enqueue_certificate, enqueue_certificates
+
+
+class CertificateService:
+    def __init__(self):
+        self.generator = CertificateGenerator()
+
+    def is_current(self, student):
+        """
+        The certificate cache lookup: True if the stored certificate matches the
+        student's current rendering inputs and is on disk
+        """
+        return self.generator.is_current(student.student_id, student.name, student.certificate_key)
+
+    def render(self, student):
+        """Render (or reuse) the certificate for the current inputs and record it on the student"""
+        certificate_path, certificate_key = self.generator.render_certificate(student.student_id, student.name)
+        if certificate_key != student.certificate_key or certificate_path != student.certificate_path:
+            student.record_certificate(certificate_path, certificate_key)
+        return certificate_path
+
+    def request_renders(self, student_ids):
+        """
+        Queue certificate renders for `run_certificate_worker`; students whose
+        certificate is still current are skipped by the worker without drawing.
+        """
+        return enqueue_certificates(student_ids)
+
+    def get_certificate_path(self, student, render=True):
+        """
+        Return the certificate path relative to MEDIA_ROOT, rendering it when
+        missing or stale. With render=False a stale certificate is queued for
+        the worker instead and None is returned.
+        """
+        if not student.student_id:
+            return None
+        try:
+            if self.is_current(student):
+                return student.certificate_path
+            if not render:
+                enqueue_certificate(student)
+                return None
+            return self.render(student)
+        except Exception as e:
+            print(f"Error generating certificate: {e}")
+            traceback.print_exc()
+            return None
+
+    def get_rendition_path(self, student, size='full', fmt='png'):
+        """
+        Return the path of one certificate rendition (see CERTIFICATE_RENDITIONS),
+        rendering the certificate first when it is missing or stale
+        """
+        certificate_path = self.get_certificate_path(student)
+        if not certificate_path or (size, fmt) == ('full', 'png'):
+            return certificate_path
+        try:
+            return self.generator.rendition(student.student_id, student.certificate_key, size, fmt)
+        except Exception as e:
+            print(f"Error generating certificate rendition: {e}")
+            traceback.print_exc()
+            return None
+
+    def absolute_path(self, certificate_path):
+        """
+        Resolve a stored certificate path inside MEDIA_ROOT; returns None if it escapes MEDIA_ROOT
+        """
+        media_root = os.path.abspath(settings.MEDIA_ROOT)
+        full_path = os.path.abspath(os.path.join(media_root, certificate_path))
+        if not full_path.startswith(media_root + os.sep):
+            return None
+        return full_path
+
+
+_service = None
+
+
+def get_certificate_service():
+    """Process-wide CertificateService instance"""
+    global _service
+    if _service is None:
+        _service = CertificateService()
+    return _service
@@ -0,0 +1,137 @@
+# yearbook/conditional.py
+"""
+Conditional GET (ETag / Last-Modified) for the REST API.
+
+Validators are computed before anything is serialized: one aggregate query
+returns the row count and the newest updated_at (or created_at) of the
+filtered queryset, and they are combined with the URL, the query parameters
+and the response cache version tokens (which change on deletes and when a
+related model changes; Last-Modified also accounts for the time they were
+issued). Requests carrying a matching If-None-Match / If-Modified-Since get
+a 304 without running the list query or the serializers.
+
+The validators are cached under the same versioned key as the response, so
+a revalidation of an unchanged resource does not touch the database.
+Without version tokens in a shared cache (no Redis and the response cache
+off, or the cache unavailable) no validators are sent: a delete, a change
+to a related model or a write made by another worker could not be detected.
+"""
+
+import hashlib
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from .response_cache import get_versions, tiered_get, tiered_set, token_timestamp
+
+
+class ConditionalGetMixin:
+    """
+    Answer conditional `list` and `retrieve` requests with 304 Not Modified.
+
+    Combine with CachedResponseMixin (listed after this mixin) so the version
+    tokens of `cache_models` are part of the validators.
+    """
+    last_modified_field = None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def get_last_modified_field(self, model):
+        if self.last_modified_field:
+            return self.last_modified_field
+        field_names = {field.name for field in model._meta.fields}
+        for name in ('updated_at', 'created_at'):
+            if name in field_names:
+                return name
+        return None
+
+    def get_validator_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            try:
+                queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            except (ValueError, TypeError, ValidationError):
+                # e.g. /students/abc/, a 404 like get_object() would give
+                raise Http404
+        if queryset.query.is_sliced:
+            # e.g. "latest message only" querysets, the slice depends on the ordering
+            return queryset
+        # Ordering and related loading only slow the aggregate down
+        return queryset.order_by().prefetch_related(None)
+
+    def compute_validators(self, request, versions):
+        """(etag, last_modified timestamp or None) for the current filters, from one aggregate query"""
+        queryset = self.get_validator_queryset()
+        field = self.get_last_modified_field(queryset.model)
+        aggregates = {'count': Count('pk'), 'max_pk': Max('pk')}
+        if field:
+            aggregates['last_modified'] = Max(field)
+        result = queryset.aggregate(**aggregates)
+
+        last_modified = result.get('last_modified')
+        last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+        # Deletes and changes to related models leave max(updated_at) alone but bump a version
+        changed_ts = int(max(token_timestamp(token) for token in versions))
+        last_modified_ts = max(last_modified_ts or 0, changed_ts)
+        raw = '|'.join(str(part) for part in (
+            request.build_absolute_uri(request.path),
+            sorted(request.query_params.lists()),
+            request.accepted_renderer.format,
+            result['count'],
+            result['max_pk'],
+            last_modified.isoformat() if last_modified else '',
+            *versions,
+        ))
+        return f'W/"{hashlib.sha1(raw.encode()).hexdigest()}"', last_modified_ts
+
+    def get_validators(self, request):
+        """(etag, last_modified timestamp or None), None when there are no version tokens to build them from"""
+        if not hasattr(self, 'get_cache_models'):
+            return None
+        response_cache = getattr(settings, 'RESPONSE_CACHE_ENABLED', True)
+        # Tokens in a per-process cache never see the writes of other workers
+        if not response_cache and not getattr(settings, 'REDIS_URL', ''):
+            return None
+        cache_key = None
+        if response_cache:
+            cache_key = self.get_cache_key(request)
+            versions = request._response_cache_versions
+        else:
+            versions = get_versions(self.get_cache_models())
+        if versions is None:
+            return None
+        if cache_key is None:
+            return self.compute_validators(request, versions)
+        # The key embeds the version tokens, so cached validators stay in step with the response
+        validators, _ = tiered_get(f'{cache_key}:validators')
+        if validators is None:
+            validators = self.compute_validators(request, versions)
+            timeout = self.cache_timeout or getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 600)
+            tiered_set(f'{cache_key}:validators', validators, timeout)
+        return validators
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        validators = self.get_validators(request)
+        if validators is None:
+            return handler(request, *args, **kwargs)
+        etag, last_modified_ts = validators
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified_ts)
+        if not_modified is not None:
+            response = not_modified
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified_ts is not None:
+            response['Last-Modified'] = http_date(last_modified_ts)
+        # Browsers keep the response but revalidate it on every use
+        patch_cache_control(response, no_cache=True)
+        return response
@@ -0,0 +1,123 @@
+# yearbook/counters.py
+"""
+Denormalized row counts (Department.student_count, MemoryCategory.memory_count).
+
+The counters are adjusted with a single `UPDATE ... SET n = n + 1` from the
+save/delete signals of the counted model, inside the transaction that changes
+the row, so concurrent writers never lose an increment and a rolled back save
+leaves the counter alone. Paths that bypass model signals (bulk_create,
+QuerySet.update, raw SQL, loaddata) must call recount() afterwards; the
+`manage.py recount` command does the same as a repair job.
+"""
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from .response_cache import bump_versions
+
+# (counted model, foreign key, model holding the counter, counter field)
+COUNTERS = (
+    ('yearbook.Student', 'department', 'yearbook.Department', 'student_count'),
+    ('yearbook.MemoryBoard', 'category', 'yearbook.MemoryCategory', 'memory_count'),
+)
+
+
+def counters_for(model):
+    label = model._meta.label
+    return [counter for counter in COUNTERS if counter[0] == label]
+
+
+def adjust(parent_label, counter_field, pk, delta):
+    """Atomically add `delta` to the counter of one row; a no-op for a missing row"""
+    if pk is None or not delta:
+        return
+    apps.get_model(parent_label).objects.filter(pk=pk).update(
+        **{counter_field: Greatest(F(counter_field) + delta, Value(0))}
+    )
+
+
+def remember_counted_keys(sender, instance, raw=False, update_fields=None, **kwargs):
+    """pre_save: record the foreign keys the row is counted under before it changes"""
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    attnames = [
+        sender._meta.get_field(fk).attname
+        for _, fk, _, _ in counters_for(sender)
+        if update_fields is None or fk in update_fields or sender._meta.get_field(fk).attname in update_fields
+    ]
+    if not attnames:
+        return
+    previous = sender._base_manager.filter(pk=instance.pk).values(*attnames).first()
+    if previous:
+        instance._counted_keys = previous
+
+
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    """post_save: count new rows and move rows whose foreign key changed"""
+    if raw:
+        return
+    previous = getattr(instance, '_counted_keys', None) or {}
+    instance._counted_keys = None
+    changed = set()
+    for _, fk, parent_label, counter_field in counters_for(sender):
+        attname = sender._meta.get_field(fk).attname
+        current = getattr(instance, attname)
+        if created:
+            adjust(parent_label, counter_field, current, 1)
+            changed.add(parent_label)
+        elif attname in previous and previous[attname] != current:
+            adjust(parent_label, counter_field, previous[attname], -1)
+            adjust(parent_label, counter_field, current, 1)
+            changed.add(parent_label)
+    _invalidate(changed)
+
+
+def update_counters_on_delete(sender, instance, **kwargs):
+    """post_delete: uncount deleted rows (a no-op when the parent is being deleted too)"""
+    changed = set()
+    for _, fk, parent_label, counter_field in counters_for(sender):
+        pk = getattr(instance, sender._meta.get_field(fk).attname)
+        if pk is not None:
+            adjust(parent_label, counter_field, pk, -1)
+            changed.add(parent_label)
+    _invalidate(changed)
+
+
+def _invalidate(labels):
+    # QuerySet.update() sends no signals, the counter's own model needs its response cache bumped
+    if labels:
+        transaction.on_commit(lambda: bump_versions(sorted(labels)))
+
+
+def recount(labels=None):
+    """
+    Recompute counters from the counted rows and fix the ones that drifted.
+    Returns {counter model label: number of rows corrected}.
+    """
+    corrected = {}
+    for child_label, fk, parent_label, counter_field in COUNTERS:
+        if labels and parent_label not in labels:
+            continue
+        parent = apps.get_model(parent_label)
+        actual = (
+            apps.get_model(child_label)._base_manager
+            .filter(**{fk: OuterRef('pk')})
+            .order_by()
+            .values(fk)
+            .annotate(n=Count('pk'))
+            .values('n')
+        )
+        drifted = list(
+            parent._base_manager
+            .annotate(actual=Coalesce(Subquery(actual, output_field=IntegerField()), Value(0)))
+            .exclude(**{counter_field: F('actual')})
+            .only('pk')
+        )
+        for row in drifted:
+            setattr(row, counter_field, row.actual)
+        if drifted:
+            parent._base_manager.bulk_update(drifted, [counter_field])
+            bump_versions([parent_label])
+        corrected[parent_label] = len(drifted)
+    return corrected
@@ -0,0 +1,55 @@
+# yearbook/delivery.py
+"""
+Delivery of files stored under MEDIA_ROOT.
+
+With MEDIA_DELIVERY = 'nginx' Django only answers with an X-Accel-Redirect
+header and nginx streams the file from its internal /protected-media/
+location, so large downloads never tie up a gunicorn worker. Every response
+carries validators (ETag / Last-Modified) and conditional requests are
+answered with 304 before the file is opened.
+"""
+
+import os
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from .security import sanitize_filename
+
+
+def file_response(request, relative_path, content_type, filename, etag=None,
+                  last_modified=None, max_age=None, disposition='inline'):
+    """
+    Serve `relative_path` (relative to MEDIA_ROOT) with HTTP caching headers.
+
+    `etag` should be a strong validator that changes whenever the file content
+    changes (e.g. a content hash); `last_modified` is a datetime.
+    """
+    full_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+    if etag is None or last_modified is None:
+        stat = os.stat(full_path)
+        if etag is None:
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        last_modified_ts = int(stat.st_mtime) if last_modified is None else int(last_modified.timestamp())
+    else:
+        last_modified_ts = int(last_modified.timestamp())
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified_ts)
+    if not_modified is None:
+        if getattr(settings, 'MEDIA_DELIVERY', 'django') == 'nginx':
+            response = HttpResponse(content_type=content_type)
+            prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{relative_path}"
+        else:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        safe_filename = sanitize_filename(filename)
+        response['Content-Disposition'] = f'{disposition}; filename="{safe_filename}"'
+    else:
+        response = not_modified
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified_ts)
+    if max_age is None:
+        max_age = getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
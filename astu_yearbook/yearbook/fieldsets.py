@@ -0,0 +1,140 @@
+# yearbook/fieldsets.py
+"""
+Sparse fieldsets and field expansion for the read endpoints.
+
+    ?fields=id,name,photo_url   only these fields
+    ?omit=last_words,my_story   every field but these
+    ?expand=profile_images      include fields the serializer lists in
+                                Meta.expandable_fields, which are left out
+                                by default (naming them in ?fields= works too)
+
+DynamicFieldsMixin drops the fields from the serializer before they are
+built. SparseFieldsetMixin makes the `list` and `retrieve` querysets match
+(including the default response, which still leaves out expandable fields
+and columns no field reads):
+columns only the dropped fields read are deferred, and select_related /
+prefetch_related lookups no remaining field goes through are removed.
+
+Which model attributes a field reads is taken from its `source`; a
+SerializerMethodField has none, so serializers declare those in
+Meta.method_field_sources, e.g. {'photo_url': ['photo']}. An undeclared
+method field is assumed to read nothing beyond the primary key.
+"""
+
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def query_param_names(request, name):
+    """Comma-separated names from every occurrence of a query parameter"""
+    return {
+        item.strip()
+        for value in request.query_params.getlist(name)
+        for item in value.split(',')
+        if item.strip()
+    }
+
+
+class DynamicFieldsMixin:
+    """ModelSerializer mixin applying ?fields= / ?omit= / ?expand= to the top-level serializer"""
+
+    def get_field_names(self, declared_fields, info):
+        names = super().get_field_names(declared_fields, info)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS or not self.is_top_level():
+            return names
+        only = query_param_names(request, 'fields')
+        omit = query_param_names(request, 'omit')
+        expand = query_param_names(request, 'expand')
+        expandable = set(getattr(self.Meta, 'expandable_fields', ()))
+        return [
+            name for name in names
+            if (name not in expandable or name in expand or name in only)
+            and (not only or name in only)
+            and name not in omit
+        ]
+
+    def is_top_level(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_field_sources(self):
+        """{field name: model attribute paths it reads}, e.g. {'department_name': ['department__name']}"""
+        method_sources = getattr(self.Meta, 'method_field_sources', {})
+        sources = {}
+        for name, field in self.fields.items():
+            if field.source == '*':
+                sources[name] = list(method_sources.get(name, ()))
+            else:
+                sources[name] = ['__'.join(field.source_attrs)]
+        return sources
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset mixin trimming the `list` / `retrieve` queryset to the fields the
+    serializer outputs for this request; pair with a DynamicFieldsMixin serializer.
+    `list_serializer_class`, when set, is the compact representation used by `list`.
+    """
+    sparse_actions = ('list', 'retrieve')
+    list_serializer_class = None
+
+    def get_serializer_class(self):
+        # The browsable API builds its create form on the list action with a POST request
+        if getattr(self, 'action', None) == 'list' and self.request.method in SAFE_METHODS and self.list_serializer_class is not None:
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+    # After filtering, so the select_related / prefetch_related of a viewset's get_queryset are seen
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if getattr(self, 'action', None) not in self.sparse_actions:
+            return queryset
+        serializer = self.get_serializer()
+        if not isinstance(serializer, DynamicFieldsMixin):
+            return queryset
+        paths = [path for sources in serializer.get_field_sources().values() for path in sources]
+        # Pagination reads the ordering columns of the rows
+        ordering = getattr(self, 'cursor_ordering', None) or queryset.query.order_by or queryset.model._meta.ordering
+        return trim_queryset(queryset, paths + [term.lstrip('-') for term in ordering if isinstance(term, str)])
+
+
+def trim_queryset(queryset, paths):
+    """Defer the columns and drop the joins and prefetches none of `paths` (model attribute lookups) reads"""
+    columns = {path.split('__')[0] for path in paths}
+    # A bare foreign key name only needs its id column, not the join
+    joined = {path.split('__')[0] for path in paths if '__' in path}
+
+    # Only the first step of a lookup can be judged from the serializer's sources
+    prefetches = queryset._prefetch_related_lookups
+    kept_prefetches = [
+        lookup for lookup in prefetches
+        if (lookup if isinstance(lookup, str) else lookup.prefetch_through).split('__')[0] in columns
+    ]
+    if len(kept_prefetches) != len(prefetches):
+        queryset = queryset.prefetch_related(None).prefetch_related(*kept_prefetches)
+
+    select_related = queryset.query.select_related
+    kept_joins = []
+    if isinstance(select_related, dict):
+        kept_joins = [name for name in select_related if name in joined]
+        if len(kept_joins) != len(select_related):
+            queryset = queryset.select_related(None)
+            if kept_joins:
+                queryset = queryset.select_related(*kept_joins)
+
+    model = queryset.model
+    deferred = [
+        field.name for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in columns
+    ]
+    for join in kept_joins:
+        read = {path.split('__')[1] for path in paths if path.startswith(f'{join}__')}
+        deferred += [
+            f'{join}__{field.name}'
+            for field in model._meta.get_field(join).related_model._meta.concrete_fields
+            if not field.primary_key and field.name not in read
+        ]
+    return queryset.defer(*deferred) if deferred else queryset
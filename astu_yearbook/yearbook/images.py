@@ -0,0 +1,150 @@
+# yearbook/images.py
+"""
+Responsive derivatives of uploaded images.
+
+Every image registered in IMAGE_FIELDS gets resized WebP (and AVIF when Pillow
+supports it) variants at fixed widths, stored under MEDIA_ROOT/derivatives/
+with names derived from the full stored name of the original. Because the
+names are deterministic, serializers can build srcset maps without touching
+the disk.
+
+Derivatives are generated after an upload is committed (see signals.py) and
+for existing images by `manage.py generate_image_derivatives`. They are
+deleted once no row refers to their original any more, after the image is
+replaced or its row deleted.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps, features
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_DIR = 'derivatives'
+DERIVATIVE_WIDTHS = (320, 640, 1024, 1600)
+DERIVATIVE_FORMATS = ('avif', 'webp') if features.check('avif') else ('webp',)
+DERIVATIVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 4},
+    'avif': {'quality': 60, 'speed': 8},
+}
+
+# Image fields that get derivatives, as (app_label.ModelName, field names)
+IMAGE_FIELDS = {
+    'yearbook.Student': ('photo',),
+    'yearbook.MemoryBoard': ('photo',),
+    'yearbook.Department': ('cover_image', 'group_photo'),
+    'yearbook.Leadership': ('photo',),
+    'yearbook.TraineeSuccessStory': ('photo',),
+    'yearbook.ProfileImage': ('image',),
+}
+
+
+def derivative_name(name, width, fmt):
+    """Storage name of one derivative of the image stored as `name`"""
+    # The extension stays in: a.jpg and a.png must not share derivatives
+    return f"{DERIVATIVE_DIR}/{name}_{width}w.{fmt}"
+
+
+def derivative_names(name):
+    """Every derivative name of the image stored as `name`, as {format: {width: name}}"""
+    return {
+        fmt: {width: derivative_name(name, width, fmt) for width in DERIVATIVE_WIDTHS}
+        for fmt in DERIVATIVE_FORMATS
+    }
+
+
+def generate_derivatives(name, force=False):
+    """
+    Write the derivatives of the image stored as `name` (relative to MEDIA_ROOT).
+
+    Originals narrower than a target width are re-encoded at their own size
+    rather than upscaled, so every name in derivative_names() always exists.
+    Returns the number of files written.
+    """
+    source_path = os.path.join(settings.MEDIA_ROOT, name)
+    pending = [
+        (width, fmt, os.path.join(settings.MEDIA_ROOT, derivative))
+        for fmt, widths in derivative_names(name).items()
+        for width, derivative in widths.items()
+        if force or not os.path.exists(os.path.join(settings.MEDIA_ROOT, derivative))
+    ]
+    if not pending:
+        return 0
+
+    with Image.open(source_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        resized = {}
+        for width, fmt, output_path in pending:
+            if width not in resized:
+                if img.width > width:
+                    height = round(img.height * width / img.width)
+                    resized[width] = img.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+                else:
+                    resized[width] = img
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            # Write under a temporary name so readers never see a partial file
+            tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            resized[width].save(tmp_path, format=fmt.upper(), **DERIVATIVE_OPTIONS[fmt])
+            os.replace(tmp_path, output_path)
+    return len(pending)
+
+
+def delete_derivatives(name):
+    """Delete every derivative of the image stored as `name`; returns the number of files deleted"""
+    deleted = 0
+    # Every format, including AVIF derivatives written by a build that supported it
+    for fmt in DERIVATIVE_OPTIONS:
+        for width in DERIVATIVE_WIDTHS:
+            try:
+                os.remove(os.path.join(settings.MEDIA_ROOT, derivative_name(name, width, fmt)))
+                deleted += 1
+            except FileNotFoundError:
+                pass
+    return deleted
+
+
+def image_in_use(name):
+    """True if a row of any model in IMAGE_FIELDS stores `name`, e.g. a shared default image"""
+    for label, fields in IMAGE_FIELDS.items():
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{field: name})
+        if apps.get_model(label)._base_manager.filter(condition).exists():
+            return True
+    return False
+
+
+def release_derivatives(names):
+    """Delete the derivatives of the images in `names` that no row refers to any more"""
+    for name in names:
+        if not image_in_use(name):
+            delete_derivatives(name)
+
+
+def _generate_quietly(name):
+    try:
+        generate_derivatives(name)
+    except Exception:
+        logger.exception('Generating image derivatives for %s failed', name)
+
+
+_executor = None
+
+
+def schedule_derivatives(names):
+    """
+    Generate derivatives in a background thread so the upload request does not
+    wait for the encoders (Pillow releases the GIL while resizing and encoding)
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-derivatives')
+    for name in names:
+        _executor.submit(_generate_quietly, name)
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import time
+from django.core.management.base import BaseCommand, CommandError
+from yearbook.certificate_generator import CertificateGenerator, CertificateRenderer
+
+# Template shipped with the app, used when MEDIA_ROOT has no template yet
+BUNDLED_TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'insa_summercamp_certeficate.png')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark certificate rendering with and without the cached template/fonts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=20, help='Certificates to render per run')
+        parser.add_argument('--template', help='Template image to render on (defaults to the configured template)')
+        parser.add_argument('--no-save', action='store_true', help='Skip PNG encoding to measure drawing only')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        template_path = options['template'] or CertificateGenerator().template_path
+        if not os.path.exists(template_path):
+            template_path = BUNDLED_TEMPLATE
+        if not os.path.exists(template_path):
+            raise CommandError(f'Template image not found at: {template_path}')
+
+        output_dir = tempfile.mkdtemp(prefix='certificate-benchmark-')
+        try:
+            uncached = self.run(template_path, output_dir, count, options['no_save'], cached=False)
+            cached = self.run(template_path, output_dir, count, options['no_save'], cached=True)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+        self.stdout.write(f'Template: {template_path}')
+        self.stdout.write(f'Before (template and fonts reloaded per certificate): {uncached:.2f} certificates/second')
+        self.stdout.write(f'After (template and fonts cached per process):        {cached:.2f} certificates/second')
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {cached / uncached:.2f}x'))
+
+    def run(self, template_path, output_dir, count, no_save, cached):
+        """Render `count` certificates and return the throughput in certificates/second"""
+        renderer = CertificateRenderer(template_path)
+        CertificateRenderer.clear_cache()
+        start = time.perf_counter()
+        for i in range(count):
+            if not cached:
+                CertificateRenderer.clear_cache()
+            student_id = f"INSA{i:03d}"
+            img = renderer.render(f"Benchmark Student {i}", f"http://localhost:8085/yearbook/verify/{student_id}/")
+            if not no_save:
+                img.save(os.path.join(output_dir, f"{student_id}_certificate.png"))
+        return count / (time.perf_counter() - start)
@@ -0,0 +1,160 @@
+import random
+import re
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from yearbook.models import Department, Leadership, MemoryBoard, MemoryCategory, Student, TraineeSuccessStory
+from yearbook.pagination import keyset_filter
+
+# Models whose Meta.indexes serve the API lists; dropped for the comparison run
+INDEXED_MODELS = [Student, MemoryBoard, TraineeSuccessStory, MemoryCategory, Leadership]
+PAGE = 20
+
+
+def summarize_plan(plan):
+    """Indexes used, full table scans and sorts of an EXPLAIN output, in one line"""
+    used = re.findall(r'USING (?:COVERING )?INDEX (\w+)|Index (?:Only )?Scan (?:Backward )?using (\w+)|Bitmap Index Scan on (\w+)', plan)
+    parts = [next(name for name in names if name) for names in used]
+    parts += [f'FULL SCAN {table}' for table in re.findall(r'\bSCAN (\w+)\s*$', plan, re.MULTILINE)]
+    parts += [f'FULL SCAN {table}' for table in re.findall(r'Seq Scan on (\w+)', plan)]
+    if 'TEMP B-TREE FOR ORDER BY' in plan or re.search(r'^\s*(?:->\s*)?Sort\b', plan, re.MULTILINE):
+        parts.append('sort')
+    return ', '.join(dict.fromkeys(parts)) or plan.splitlines()[0]
+
+
+class Command(BaseCommand):
+    help = 'Seed large tables and report the query plan and latency of the common API list queries, with and without the indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=20000)
+        parser.add_argument('--memories', type=int, default=20000)
+        parser.add_argument('--trainees', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--plans', action='store_true', help='Print the full EXPLAIN output of each query')
+
+    def handle(self, *args, **options):
+        if min(options['students'], options['memories'], options['trainees'], options['repeat']) < 1:
+            raise CommandError('Row counts and --repeat must be at least 1')
+        self.options = options
+
+        self.stdout.write(f'Database: {connection.vendor}, median of {options["repeat"]} runs of a {PAGE}-row page\n')
+        # Seeded rows and dropped indexes never persist, the whole benchmark is rolled back
+        with transaction.atomic():
+            queries = self.seed(random.Random(42))
+            with_indexes = self.run(queries)
+            self.drop_indexes()
+            without_indexes = self.run(queries)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'\n{"query":34} {"indexed ms":>10} {"no index ms":>11}  plan')
+        for (label, ms, plan), (_, bare_ms, _) in zip(with_indexes, without_indexes):
+            self.stdout.write(f'{label:34} {ms:>10.2f} {bare_ms:>11.2f}  {summarize_plan(plan)}')
+            if options['plans']:
+                self.stdout.write(f'    {plan}'.replace('\n', '\n    '))
+        self.stdout.write(self.style.SUCCESS('\nBenchmark complete'))
+
+    def seed(self, rng):
+        options = self.options
+        now = timezone.now()
+        departments = Department.objects.bulk_create(
+            Department(name=f'Benchmark department {i}', intro_message='-') for i in range(10)
+        )
+        categories = MemoryCategory.objects.bulk_create(
+            MemoryCategory(name=f'Benchmark category {i}', order=i, is_active=i % 4 != 0) for i in range(20)
+        )
+        Leadership.objects.bulk_create(
+            Leadership(name=f'Leader {i}', position='-', message='-', order=i % 10, is_active=i % 3 != 0) for i in range(200)
+        )
+        Student.objects.bulk_create(
+            (
+                Student(
+                    student_id=f'BENCH{i:07d}',
+                    name=f'Student {rng.randrange(10 ** 6):06d}',
+                    department=rng.choice(departments),
+                    photo='students/default.jpg',
+                    quote='-', last_words='-', highlight_tagline='-', description='-',
+                    is_featured=rng.random() < 0.05,
+                )
+                for i in range(options['students'])
+            ),
+            batch_size=1000,
+        )
+        memory_types = [choice for choice, _ in MemoryBoard.MEMORY_TYPES]
+        memories = MemoryBoard.objects.bulk_create(
+            (
+                MemoryBoard(
+                    title=f'Memory {i}', photo='memories/default.jpg', caption='-',
+                    department=rng.choice(departments), category=rng.choice(categories),
+                    memory_type=rng.choice(memory_types),
+                )
+                for i in range(options['memories'])
+            ),
+            batch_size=1000,
+        )
+        # auto_now_add gives every row of a batch the same timestamp, spread them over a year
+        for memory in memories:
+            memory.created_at = now - timedelta(minutes=rng.randrange(525600))
+        MemoryBoard.objects.bulk_update(memories, ['created_at'], batch_size=500)
+        TraineeSuccessStory.objects.bulk_create(
+            (
+                TraineeSuccessStory(
+                    name=f'Trainee {i}', photo='trainees/default.jpg', bio='-', achievement='-',
+                    department=rng.choice(departments), graduation_year=rng.randint(2015, 2025), current_position='-',
+                )
+                for i in range(options['trainees'])
+            ),
+            batch_size=1000,
+        )
+        self.analyze()
+
+        department, category = departments[3], categories[5]
+        students = Student.objects.select_related('department')
+        memory_list = MemoryBoard.objects.select_related('department', 'category')
+        middle_student = Student.objects.order_by('name', 'id')[options['students'] // 2]
+        middle_memory = MemoryBoard.objects.order_by('-created_at', 'id')[options['memories'] // 2]
+        # Mirrors the list querysets of the viewsets in yearbook/views.py
+        return [
+            ('students', students.all()),
+            ('students ?department=', students.filter(department=department)),
+            ('students ?is_featured=true', students.filter(is_featured=True)),
+            ('students ?department=&is_featured=', students.filter(department=department, is_featured=True)),
+            ('students cursor, middle page', students.filter(
+                keyset_filter(('name', 'id'), [middle_student.name, middle_student.pk])).order_by('name', 'id')),
+            ('memories', memory_list.all()),
+            ('memories ?department=', memory_list.filter(department=department)),
+            ('memories ?category=', memory_list.filter(category=category)),
+            ('memories ?memory_type=', memory_list.filter(memory_type='PARTY')),
+            ('memories cursor, middle page', memory_list.filter(
+                keyset_filter(('-created_at', 'id'), [middle_memory.created_at, middle_memory.pk])).order_by('-created_at', 'id')),
+            ('trainees', TraineeSuccessStory.objects.select_related('department')),
+            ('trainees ?department=', TraineeSuccessStory.objects.select_related('department').filter(department=department)),
+            ('memory categories', MemoryCategory.objects.filter(is_active=True)),
+            ('leadership', Leadership.objects.filter(is_active=True)),
+        ]
+
+    def analyze(self):
+        # Fresh planner statistics, otherwise the seeded tables look empty
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+        self.analyze()
+
+    def run(self, queries):
+        results = []
+        for label, queryset in queries:
+            page = queryset[:PAGE]
+            timings = []
+            for _ in range(self.options['repeat']):
+                start = time.perf_counter()
+                list(page.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            results.append((label, statistics.median(timings), page.explain()))
+        return results
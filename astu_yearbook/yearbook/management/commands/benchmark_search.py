@@ -0,0 +1,81 @@
+import random
+import statistics
+import time
+from functools import reduce
+from operator import or_
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from yearbook.models import Department, Student
+from yearbook.search import full_text_search
+
+SYLLABLES = ['a', 'be', 'le', 'ma', 'ye', 'hu', 'te', 'sho', 'me', 'ke', 'bede', 'se', 'fa', 'ye', 'da', 'wit', 'ra', 'hel', 'ha', 'nan', 'zel', 'ke']
+# A realistic vocabulary size keeps each word in a small share of the rows, as in real quotes
+WORDS = sorted({''.join(random.Random(i).choices(SYLLABLES, k=3)) for i in range(5000)})
+QUERIES = ['alem', 'tesh', WORDS[100], f'{WORDS[200]} {WORDS[300]}', WORDS[-1][:3], 'zzzz']
+SEARCH_FIELDS = ['name', 'quote', 'last_words']
+
+
+def random_name(rng):
+    return ' '.join(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).capitalize() for _ in range(2))
+
+
+def random_text(rng, words):
+    return ' '.join(rng.choices(WORDS, k=words))
+
+
+class Command(BaseCommand):
+    help = 'Compare icontains scans with the full-text index as the students table grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000', help='Comma-separated student counts')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError('--sizes must be comma-separated integers')
+        rng = random.Random(42)
+
+        self.stdout.write(f'Database: {connection.vendor}, {options["repeat"]} runs per query, median of page-sized results\n')
+        self.stdout.write(f'{"rows":>8}  {"icontains ms":>12}  {"full-text ms":>12}')
+        # Seeded rows never persist, the whole benchmark is rolled back
+        with transaction.atomic():
+            department = Department.objects.create(name='Search benchmark', intro_message='-')
+            seeded = 0
+            for size in sizes:
+                batch = [
+                    Student(
+                        student_id=f'BENCH{i:07d}',
+                        name=random_name(rng),
+                        department=department,
+                        photo='students/default.jpg',
+                        quote=random_text(rng, 12),
+                        last_words=random_text(rng, 40),
+                        highlight_tagline=random_text(rng, 3),
+                        description='-',
+                    )
+                    for i in range(seeded, size)
+                ]
+                Student.objects.bulk_create(batch, batch_size=1000)
+                seeded = size
+
+                scan = self.time_queries(options['repeat'], lambda q: Student.objects.filter(
+                    reduce(or_, (Q(**{f'{field}__icontains': term}) for term in q.split() for field in SEARCH_FIELDS))
+                ))
+                indexed = self.time_queries(options['repeat'], lambda q: full_text_search(Student.objects.all(), q).order_by('-search_rank'))
+                self.stdout.write(f'{size:>8}  {scan:>12.2f}  {indexed:>12.2f}')
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('\nBenchmark complete'))
+
+    @staticmethod
+    def time_queries(repeat, build):
+        timings = []
+        for query in QUERIES:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(build(query)[:20])
+                timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
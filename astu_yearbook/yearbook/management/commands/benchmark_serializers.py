@@ -0,0 +1,93 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from yearbook.models import Department, Leadership, MemoryBoard, MemoryCategory, ProfileImage, Student, TraineeSuccessStory
+from yearbook.urls import router
+
+PARAGRAPH = 'The program pushed every one of us further than we thought we could go. ' * 8
+
+
+class Command(BaseCommand):
+    help = 'Payload size and serialization time of one list page per endpoint, list representation vs full representation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200, help='Rows seeded per resource')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed serializations per page')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['repeat'] < 1:
+            raise CommandError('--rows and --repeat must be at least 1')
+        self.repeat = options['repeat']
+
+        self.stdout.write(f'Median of {self.repeat} serializations of the default page of each list endpoint\n')
+        self.stdout.write(f'{"endpoint":24} {"rows":>5} {"list KB":>8} {"list ms":>8} {"full KB":>8} {"full ms":>8}  (full: detail serializer, expanded)')
+        # Seeded rows never persist, the whole benchmark is rolled back
+        with transaction.atomic():
+            self.seed(options['rows'])
+            for prefix, viewset, basename in router.registry:
+                self.stdout.write(self.measure(prefix, viewset))
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('\nBenchmark complete'))
+
+    def seed(self, rows):
+        department = Department.objects.create(name='Serializer benchmark', intro_message=PARAGRAPH)
+        category = MemoryCategory.objects.create(name='Serializer benchmark', description=PARAGRAPH)
+        students = Student.objects.bulk_create(
+            Student(
+                student_id=f'BENCH{i:07d}', name=f'Student {i}', department=department, photo=f'students/bench_{i}.jpg',
+                quote=PARAGRAPH[:200], last_words=PARAGRAPH, highlight_tagline='Security engineer',
+                description=PARAGRAPH * 2, my_story=PARAGRAPH * 4,
+            )
+            for i in range(rows)
+        )
+        trainees = TraineeSuccessStory.objects.bulk_create(
+            TraineeSuccessStory(
+                name=f'Trainee {i}', photo=f'trainees/bench_{i}.jpg', bio=PARAGRAPH * 2, achievement=PARAGRAPH[:300],
+                department=department, current_position='Analyst', my_story=PARAGRAPH * 4,
+                project_showcase=PARAGRAPH * 2, skills_acquired='Forensics, Malware analysis, Networking',
+            )
+            for i in range(rows)
+        )
+        ProfileImage.objects.bulk_create(
+            [ProfileImage(image=f'profile_images/bench_s{s.pk}.jpg', student=s) for s in students]
+            + [ProfileImage(image=f'profile_images/bench_t{t.pk}.jpg', trainee=t) for t in trainees]
+        )
+        MemoryBoard.objects.bulk_create(
+            MemoryBoard(
+                title=f'Memory {i}', photo=f'memories/bench_{i}.jpg', caption=PARAGRAPH[:400], department=department,
+                category=category, author_name='Classmate', author_program='Cyber Talent', author_year='2024',
+            )
+            for i in range(rows)
+        )
+        Leadership.objects.bulk_create(
+            Leadership(name=f'Leader {i}', position='Director', photo=f'leadership/bench_{i}.jpg', message=PARAGRAPH * 6, order=i)
+            for i in range(min(rows, 20))
+        )
+
+    def page(self, viewset, action, params):
+        """Rows of the first list page as the viewset loads them for `action`'s serializer"""
+        request = RequestFactory().get('/yearbook/api/', params, HTTP_HOST='localhost')
+        view = viewset(action_map={'get': action}, args=(), kwargs={}, format_kwarg=None)
+        view.request = view.initialize_request(request)
+        serializer_class = view.get_serializer_class()
+        queryset = view.filter_queryset(view.get_queryset())
+        page_size = view.paginator.page_size if view.paginator else None
+        rows = list(queryset[:page_size] if page_size else queryset)
+        return rows, serializer_class, view.get_serializer_context()
+
+    def measure(self, prefix, viewset):
+        results = []
+        # 'retrieve' loads the rows for the full serializer, which every list used before
+        for action, params in (('list', {}), ('retrieve', {'expand': 'profile_images'})):
+            rows, serializer_class, context = self.page(viewset, action, params)
+            timings = []
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                data = serializer_class(rows, many=True, context=dict(context)).data
+                timings.append((time.perf_counter() - start) * 1000)
+            results.append((len(JSONRenderer().render(data)) / 1024, statistics.median(timings)))
+        (list_kb, list_ms), (full_kb, full_ms) = results
+        return f'{prefix:24} {len(rows):>5} {list_kb:>8.1f} {list_ms:>8.2f} {full_kb:>8.1f} {full_ms:>8.2f}'
@@ -0,0 +1,64 @@
+import time
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+SCENARIOS = [
+    ('db, save every request', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'SESSION_SAVE_EVERY_REQUEST': True,
+    }),
+    ('db, coarse refresh', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'SESSION_SAVE_EVERY_REQUEST': False,
+    }),
+    ('cached_db, coarse refresh', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'SESSION_SAVE_EVERY_REQUEST': False,
+    }),
+]
+# A private cache: clearing the default one would flush the shared Redis (sessions, version tokens, throttles)
+BENCHMARK_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'session-benchmark'}}
+
+
+class Command(BaseCommand):
+    help = 'Count django_session reads and writes for an authenticated user under each session configuration'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+        parser.add_argument('--path', default='/yearbook/api/health/', help='URL requested by the logged-in user')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+
+        self.stdout.write(f'{options["requests"]} requests to {options["path"]} per scenario\n')
+        for name, overrides in SCENARIOS:
+            # Everything runs in a transaction that is rolled back, the benchmark user never persists
+            with override_settings(CACHES=BENCHMARK_CACHES, **overrides), transaction.atomic():
+                reads, writes, elapsed = self.run_scenario(options['requests'], options['path'])
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f'{name:28} session writes: {writes:5}  session reads: {reads:5}  {elapsed * 1000:8.1f} ms'
+            )
+        self.stdout.write(self.style.SUCCESS('\nBenchmark complete'))
+
+    def run_scenario(self, count, path):
+        cache.clear()
+        user = User.objects.create_user(username='session-benchmark', password=None, is_staff=True)
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(count):
+                client.get(path)
+            elapsed = time.perf_counter() - start
+
+        session_queries = [q['sql'].lstrip().upper() for q in queries if 'django_session' in q['sql']]
+        reads = sum(1 for sql in session_queries if sql.startswith('SELECT'))
+        writes = len(session_queries) - reads
+        return reads, writes, elapsed
@@ -0,0 +1,55 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from yearbook.certificate_generator import CERTIFICATE_RENDITIONS
+from yearbook.models import Student
+
+
+class Command(BaseCommand):
+    help = 'Delete generated certificate files that no student references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='List orphaned files without deleting them')
+        parser.add_argument('--grace-period', type=int, default=3600,
+                            help='Keep files younger than this many seconds (renders still being recorded)')
+
+    def handle(self, *args, **options):
+        output_dir = os.path.join(settings.MEDIA_ROOT, 'certificates', 'generated')
+        if not os.path.isdir(output_dir):
+            self.stdout.write('No generated certificates found')
+            return
+
+        # Renditions share the stem of the certificate they were derived from
+        referenced = {
+            os.path.splitext(os.path.basename(path))[0]
+            for path in Student.objects.exclude(certificate_path='').values_list('certificate_path', flat=True)
+        }
+        rendition_suffixes = tuple({f'_{size}' for size, _ in CERTIFICATE_RENDITIONS})
+        cutoff = time.time() - options['grace_period']
+
+        removed = 0
+        freed = 0
+        for entry in os.scandir(output_dir):
+            if not entry.is_file() or self.certificate_stem(entry.name, rendition_suffixes) in referenced:
+                continue
+            stat = entry.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            if options['dry_run']:
+                self.stdout.write(f'Would delete {entry.name}')
+            else:
+                os.remove(entry.path)
+            removed += 1
+            freed += stat.st_size
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {removed} orphaned certificates ({freed / (1024 * 1024):.1f} MB)'))
+
+    @staticmethod
+    def certificate_stem(filename, rendition_suffixes):
+        stem = filename.split('.', 1)[0]
+        for suffix in rendition_suffixes:
+            if stem.endswith(suffix):
+                return stem[:-len(suffix)]
+        return stem
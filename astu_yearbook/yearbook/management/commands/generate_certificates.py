@@ -1,98 +1,132 @@
-from django.core.management.base import BaseCommand
-from yearbook.certificate_generator import CertificateGenerator
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from yearbook.models import Student
+from yearbook.certificate_generator import certificate_worker_pool, render_student_certificate
+from yearbook.certificate_service import get_certificate_service
+
+DEFAULT_PROGRESS_FILE = os.path.join(settings.MEDIA_ROOT, 'certificates', 'generate_progress.json')
+
 
 class Command(BaseCommand):
-    help = 'Generate certificates for all students'
+    help = 'Generate certificates for all students in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes (default: CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='Students read from the database and dispatched per chunk')
+        parser.add_argument('--only-missing', action='store_true',
+                            help='Only render students whose certificate is missing or stale')
+        parser.add_argument('--department', type=int, help='Only generate certificates for this department ID')
+        parser.add_argument('--resume', action='store_true',
+                            help='Skip students completed by a previous interrupted run')
+        parser.add_argument('--progress-file', default=DEFAULT_PROGRESS_FILE,
+                            help='Where completed student IDs are recorded for --resume')
+        parser.add_argument('--report', help='Write a JSON report of failed students to this path')
 
     def handle(self, *args, **options):
-        generator = CertificateGenerator()
-        
-        # Student data from mock data
-        students_data = [
-            {
-                "student_id": "INSA001",
-                "name": "Alemayehu Kebede",
-                "department": "Cyber Security"
-            },
-            {
-                "student_id": "INSA002", 
-                "name": "Sara Teshome",
-                "department": "Development"
-            },
-            {
-                "student_id": "INSA003",
-                "name": "Michael Abebe", 
-                "department": "Embedded Systems"
-            },
-            {
-                "student_id": "INSA004",
-                "name": "Hanan Mohammed",
-                "department": "Artificial Intelligence"
-            },
-            {
-                "student_id": "INSA005",
-                "name": "Dawit Assefa",
-                "department": "Aerospace"
-            },
-            {
-                "student_id": "INSA006",
-                "name": "Rahel Belete",
-                "department": "Cyber Security"
-            },
-            {
-                "student_id": "INSA007",
-                "name": "Samuel Teshome",
-                "department": "Development"
-            },
-            {
-                "student_id": "INSA008",
-                "name": "Meron Zeleke",
-                "department": "Embedded Systems"
-            }
-        ]
-        
-        generated_count = 0
-        failed_count = 0
-        
-        for student in students_data:
-            try:
-                certificate_path = generator.generate_certificate(
-                    student["student_id"],
-                    student["name"],
-                    student["department"],
-                    2024
-                )
-                
-                if certificate_path:
-                    self.stdout.write(
-                        self.style.SUCCESS(f'✓ Generated certificate for {student["name"]} ({student["student_id"]})')
-                    )
-                    generated_count += 1
-                else:
-                    self.stdout.write(
-                        self.style.ERROR(f'✗ Failed to generate certificate for {student["name"]} ({student["student_id"]})')
-                    )
-                    failed_count += 1
-                    
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'✗ Error generating certificate for {student["name"]}: {str(e)}')
-                )
-                failed_count += 1
-        
-        self.stdout.write(
-            self.style.SUCCESS(f'\nCertificate generation complete!')
-        )
-        self.stdout.write(f'Generated: {generated_count}')
-        self.stdout.write(f'Failed: {failed_count}')
+        workers = options['workers']
+        chunk_size = options['chunk_size']
+        if workers < 1 or chunk_size < 1:
+            raise CommandError('--workers and --chunk-size must be at least 1')
 
+        progress_file = options['progress_file']
+        completed = self.load_progress(progress_file) if options['resume'] else set()
+        generator = get_certificate_service().generator
 
+        students = Student.objects.order_by('pk')
+        if options['department']:
+            students = students.filter(department_id=options['department'])
+        students = students.values_list('pk', 'student_id', 'name', 'department__name', 'certificate_key')
 
+        generated_count = 0
+        skipped_count = 0
+        failures = []
 
+        with certificate_worker_pool(workers) as pool:
+            for chunk in self.chunked(students.iterator(chunk_size=chunk_size), chunk_size):
+                payloads = []
+                for pk, student_id, name, department, certificate_key in chunk:
+                    if student_id in completed or (
+                        options['only_missing'] and generator.is_current(student_id, name, certificate_key)
+                    ):
+                        skipped_count += 1
+                        continue
+                    payloads.append({'pk': pk, 'student_id': student_id, 'name': name, 'department': department})
 
+                results = pool.map(render_student_certificate, payloads,
+                                   chunksize=max(1, len(payloads) // (workers * 4)))
+                rendered = []
+                for payload, (certificate_path, certificate_key, error) in zip(payloads, results):
+                    if certificate_path:
+                        generated_count += 1
+                        completed.add(payload['student_id'])
+                        rendered.append((payload['pk'], certificate_path, certificate_key))
+                    else:
+                        failures.append({**payload, 'error': error})
+                        self.stdout.write(
+                            self.style.ERROR(f'✗ Failed to generate certificate for {payload["name"]} ({payload["student_id"]}): {error}')
+                        )
 
+                self.record_certificates(rendered)
+                self.save_progress(progress_file, completed)
+                self.stdout.write(f'Progress: {generated_count} generated, {skipped_count} skipped, {len(failures)} failed')
 
+        if not failures and os.path.exists(progress_file):
+            # Everything succeeded, the next run starts from scratch
+            os.remove(progress_file)
 
+        if options['report']:
+            with open(options['report'], 'w') as report:
+                json.dump(failures, report, indent=2)
+            self.stdout.write(f'Failure report written to {options["report"]}')
 
+        self.stdout.write(
+            self.style.SUCCESS(f'\nCertificate generation complete!')
+        )
+        self.stdout.write(f'Generated: {generated_count}')
+        self.stdout.write(f'Skipped: {skipped_count}')
+        self.stdout.write(f'Failed: {len(failures)}')
+
+    @staticmethod
+    def chunked(iterable, size):
+        chunk = []
+        for item in iterable:
+            chunk.append(item)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def record_certificates(rendered):
+        # Store the certificate status on the students rendered in this chunk
+        generated_at = timezone.now()
+        with transaction.atomic():
+            for pk, certificate_path, certificate_key in rendered:
+                Student.objects.filter(pk=pk).update(
+                    certificate_path=certificate_path,
+                    certificate_key=certificate_key,
+                    certificate_generated_at=generated_at,
+                )
 
+    @staticmethod
+    def load_progress(progress_file):
+        if not os.path.exists(progress_file):
+            return set()
+        with open(progress_file) as f:
+            return set(json.load(f).get('completed', []))
 
+    @staticmethod
+    def save_progress(progress_file, completed):
+        # Write to a temporary file first so an interrupted run never leaves a truncated file
+        os.makedirs(os.path.dirname(progress_file), exist_ok=True)
+        tmp_file = f'{progress_file}.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'completed': sorted(completed)}, f)
+        os.replace(tmp_file, progress_file)
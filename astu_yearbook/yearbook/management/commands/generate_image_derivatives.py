@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from yearbook.images import IMAGE_FIELDS, generate_derivatives
+
+
+def _generate(args):
+    name, force = args
+    try:
+        return name, generate_derivatives(name, force=force), None
+    except Exception as e:
+        return name, 0, f"{type(e).__name__}: {e}"
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive WebP/AVIF derivatives for uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', choices=sorted(IMAGE_FIELDS),
+                            help='Only process this model (repeatable)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes (default: CPU count)')
+        parser.add_argument('--force', action='store_true', help='Regenerate derivatives that already exist')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        names = set()
+        for label in options['model'] or IMAGE_FIELDS:
+            model = apps.get_model(label)
+            for field in IMAGE_FIELDS[label]:
+                names.update(
+                    model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                    .values_list(field, flat=True)
+                )
+
+        generated = 0
+        missing = 0
+        failed = 0
+        work = []
+        for name in sorted(names):
+            if not os.path.exists(os.path.join(settings.MEDIA_ROOT, name)):
+                missing += 1
+                self.stdout.write(self.style.WARNING(f'! Original not found: {name}'))
+                continue
+            work.append((name, options['force']))
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for name, written, error in pool.map(_generate, work):
+                if error:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'✗ Failed to generate derivatives for {name}: {error}'))
+                elif written:
+                    generated += written
+                    self.stdout.write(self.style.SUCCESS(f'✓ {name} ({written} files)'))
+
+        self.stdout.write(self.style.SUCCESS(f'\nImage derivatives complete!'))
+        self.stdout.write(f'Images: {len(names)}')
+        self.stdout.write(f'Files generated: {generated}')
+        self.stdout.write(f'Missing originals: {missing}')
+        self.stdout.write(f'Failed: {failed}')
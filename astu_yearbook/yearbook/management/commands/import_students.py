@@ -0,0 +1,51 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from yearbook.student_import import ImportFileError, StudentImporter
+
+
+class Command(BaseCommand):
+    help = 'Import students from a CSV/XLSX sheet and a ZIP archive of their photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sheet', help='CSV or XLSX file, one student per row')
+        parser.add_argument('photos', help='ZIP archive with the photos named in the "photo" column')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk insert')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Threads validating and storing photos (default: CPU count)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without importing anything')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be at least 1')
+        for path in (options['sheet'], options['photos']):
+            if not os.path.isfile(path):
+                raise CommandError(f'File not found: {path}')
+
+        start = time.perf_counter()
+        try:
+            with open(options['sheet'], 'rb') as sheet:
+                result = StudentImporter(
+                    sheet,
+                    options['sheet'],
+                    options['photos'],
+                    batch_size=options['batch_size'],
+                    workers=options['workers'],
+                    dry_run=options['dry_run'],
+                ).run()
+        except ImportFileError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        for line, message in result.errors:
+            self.stdout.write(self.style.ERROR(f'✗ Line {line}: {message}'))
+
+        verb = 'Valid' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(f'\n{verb} {len(result.created)} of {result.rows} rows in {elapsed:.1f}s'))
+        if result.errors:
+            self.stdout.write(f'Rows with errors: {len(result.errors)}')
+        if result.failed_batch:
+            first, last, error = result.failed_batch
+            self.stdout.write(self.style.ERROR(f'The import stopped at lines {first}-{last} ({error}), the rows after them were not read'))
+        if result.created and not options['dry_run']:
+            self.stdout.write('Certificates were queued, run `manage.py run_certificate_worker` to render them')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from yearbook.counters import COUNTERS, recount
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored student and memory counters and fix the ones that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', dest='models',
+                            help='Counter model label to repair, e.g. yearbook.Department (default: all)')
+
+    def handle(self, *args, **options):
+        known = {counter[2] for counter in COUNTERS}
+        unknown = set(options['models'] or ()) - known
+        if unknown:
+            raise CommandError(f'No counters on {", ".join(sorted(unknown))} (choose from {", ".join(sorted(known))})')
+
+        corrected = recount(options['models'])
+        for label, count in corrected.items():
+            self.stdout.write(f'{label}: {count} counter(s) corrected')
+        self.stdout.write(self.style.SUCCESS('Counters are up to date'))
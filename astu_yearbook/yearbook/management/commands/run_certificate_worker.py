@@ -0,0 +1,62 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from yearbook.certificate_generator import (
+    certificate_payload,
+    certificate_worker_pool,
+    render_student_certificate,
+)
+from yearbook.certificate_queue import claim_jobs, complete_job, fail_job, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = 'Consume the certificate job queue and render queued certificates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--batch-size', type=int, default=50, help='Jobs claimed per batch')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Render in a process pool with this many workers (1 renders in-process)')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--max-attempts', type=int, default=3, help='Attempts before a job is marked failed')
+        parser.add_argument('--stale-after', type=int, default=1800,
+                            help='Requeue jobs left running for this many seconds by a crashed worker')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be at least 1')
+
+        requeued = requeue_stale_jobs(options['stale_after'])
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale jobs')
+
+        pool = certificate_worker_pool(options['workers']) if options['workers'] > 1 else None
+        self.stdout.write(self.style.SUCCESS('Certificate worker started'))
+        try:
+            while True:
+                jobs = claim_jobs(options['batch_size'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+                self.process(jobs, pool, options['max_attempts'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping certificate worker')
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def process(self, jobs, pool, max_attempts):
+        payloads = [certificate_payload(job.student) for job in jobs]
+        if pool is not None:
+            results = pool.map(render_student_certificate, payloads)
+        else:
+            results = map(render_student_certificate, payloads)
+
+        for job, payload, (certificate_path, certificate_key, error) in zip(jobs, payloads, results):
+            if certificate_path:
+                complete_job(job, certificate_path, certificate_key)
+                self.stdout.write(self.style.SUCCESS(f'✓ Generated certificate for {payload["name"]} ({payload["student_id"]})'))
+            else:
+                fail_job(job, error, max_attempts)
+                self.stdout.write(self.style.ERROR(f'✗ Failed to generate certificate for {payload["name"]} ({payload["student_id"]}): {error}'))
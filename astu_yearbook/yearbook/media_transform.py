@@ -0,0 +1,295 @@
+# yearbook/media_transform.py
+"""
+On-the-fly resizing of files under MEDIA_ROOT.
+
+`transform_url()` builds a signed /yearbook/media-transform/ URL for an image
+and a set of parameters (width, height, fit, format). The view renders the
+variant on first request and keeps it in a disk cache bounded by
+MEDIA_TRANSFORM_CACHE_BYTES; the least recently used variants are evicted
+first. Concurrent requests for the same variant render it only once: threads
+wait on an in-process lock and processes on a lock file.
+"""
+
+import hashlib
+import os
+import threading
+from urllib.parse import urlencode
+from PIL import Image, ImageOps, features
+from django.conf import settings
+from django.core import signing
+from django.http import Http404
+from django.urls import reverse
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: single-flight within a process only
+    fcntl = None
+
+CACHE_DIR = 'cache/transforms'
+FITS = ('contain', 'cover', 'fill')
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 85, 'optimize': True}),
+    'png': ('PNG', 'image/png', {'optimize': True}),
+}
+# Only offered when this Pillow build can encode it, as for the derivatives (images.py)
+if features.check('avif'):
+    FORMATS['avif'] = ('AVIF', 'image/avif', {'quality': 60, 'speed': 8})
+# Once over budget, evict down to this fraction so eviction does not run on every write
+LOW_WATERMARK = 0.9
+# Lock files are shared between variants by hash prefix, which keeps their number bounded
+LOCK_BUCKETS = 256
+
+_signer = signing.Signer(salt='yearbook.media-transform')
+
+
+class TransformError(Exception):
+    """Invalid transform parameters or source"""
+
+
+def _canonical(name, width, height, fit, fmt):
+    return f"{name}|{width or ''}|{height or ''}|{fit}|{fmt}"
+
+
+def transform_url(name, width=None, height=None, fit='contain', fmt='webp'):
+    """Signed URL of `name` (relative to MEDIA_ROOT) resized with the given parameters"""
+    params = {'path': name, 'fit': fit, 'fmt': fmt}
+    if width:
+        params['w'] = width
+    if height:
+        params['h'] = height
+    params['sig'] = _signer.signature(_canonical(name, width, height, fit, fmt))
+    return f"{reverse('media_transform')}?{urlencode(params)}"
+
+
+def parse_transform(query_params):
+    """
+    Validate the query parameters of a transform request.
+    Returns (name, width, height, fit, fmt); raises TransformError or signing.BadSignature.
+    """
+    name = query_params.get('path', '')
+    fit = query_params.get('fit', 'contain')
+    fmt = query_params.get('fmt', 'webp')
+    try:
+        width = int(query_params['w']) if query_params.get('w') else None
+        height = int(query_params['h']) if query_params.get('h') else None
+    except ValueError:
+        raise TransformError('w and h must be integers')
+
+    expected = _signer.signature(_canonical(name, width, height, fit, fmt))
+    if not signing.constant_time_compare(expected, query_params.get('sig', '')):
+        raise signing.BadSignature('Invalid transform signature')
+
+    max_dimension = getattr(settings, 'MEDIA_TRANSFORM_MAX_DIMENSION', 2400)
+    if not width and not height:
+        raise TransformError('w or h is required')
+    if any(d is not None and not 0 < d <= max_dimension for d in (width, height)):
+        raise TransformError(f'w and h must be between 1 and {max_dimension}')
+    if fit not in FITS:
+        raise TransformError(f'fit must be one of {", ".join(FITS)}')
+    if fmt not in FORMATS:
+        raise TransformError(f'fmt must be one of {", ".join(FORMATS)}')
+    return name, width, height, fit, fmt
+
+
+class TransformCache:
+    """Disk cache of rendered variants under MEDIA_ROOT/cache/transforms"""
+
+    def __init__(self, max_bytes=None):
+        self.root = os.path.join(settings.MEDIA_ROOT, CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else getattr(
+            settings, 'MEDIA_TRANSFORM_CACHE_BYTES', 512 * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._size = None
+
+    def source_path(self, name):
+        """Absolute path of a source image; None if it escapes MEDIA_ROOT or is a cached variant"""
+        media_root = os.path.abspath(settings.MEDIA_ROOT)
+        full_path = os.path.abspath(os.path.join(media_root, name))
+        if not full_path.startswith(media_root + os.sep) or full_path.startswith(os.path.abspath(self.root) + os.sep):
+            return None
+        return full_path
+
+    def get(self, name, width, height, fit, fmt):
+        """
+        Return the path (relative to MEDIA_ROOT) of the cached variant, rendering it if needed
+        """
+        source = self.source_path(name)
+        if source is None or not os.path.isfile(source):
+            raise Http404('Image not found')
+
+        # The source's mtime and size are part of the key, so replacing an upload invalidates its variants
+        stat = os.stat(source)
+        key = hashlib.sha256(
+            f"{_canonical(name, width, height, fit, fmt)}|{stat.st_mtime_ns}|{stat.st_size}".encode()
+        ).hexdigest()
+        relative_path = f"{CACHE_DIR}/{key[:2]}/{key}.{fmt}"
+        output_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+
+        if self._touch(output_path):
+            return relative_path
+
+        with self._key_lock(key):
+            with self._file_lock(key):
+                # Another thread or process may have rendered it while we waited
+                if not self._touch(output_path):
+                    size = self._render(source, output_path, width, height, fit, fmt)
+                    self._added(size)
+        return relative_path
+
+    def _touch(self, path):
+        """Mark a cached variant as recently used; False if it is not cached"""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = _RefCountedLock(self, key)
+            lock.users += 1
+        return lock
+
+    def _release_key_lock(self, key, lock):
+        with self._lock:
+            lock.users -= 1
+            if lock.users == 0:
+                del self._key_locks[key]
+
+    def _file_lock(self, key):
+        return _FileLock(os.path.join(self.root, 'locks', f"{int(key[:4], 16) % LOCK_BUCKETS}.lock"))
+
+    def _render(self, source, output_path, width, height, fit, fmt):
+        pil_format, _, options = FORMATS[fmt]
+        with Image.open(source) as img:
+            img = ImageOps.exif_transpose(img)
+            if width and height:
+                if fit == 'cover':
+                    img = ImageOps.fit(img, (width, height), Image.LANCZOS)
+                elif fit == 'fill':
+                    img = img.resize((width, height), Image.LANCZOS)
+                else:
+                    img = ImageOps.contain(img, (width, height), Image.LANCZOS)
+            else:
+                # One dimension given: scale proportionally, never upscale
+                scale = min(1.0, (width or img.width) / img.width, (height or img.height) / img.height)
+                if scale < 1.0:
+                    img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))),
+                                     Image.LANCZOS, reducing_gap=3.0)
+            if pil_format == 'JPEG' and img.mode != 'RGB':
+                img = img.convert('RGB')
+            elif img.mode not in ('RGB', 'RGBA', 'L'):
+                img = img.convert('RGBA')
+
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            # Write under a temporary name so readers never see a partial file
+            tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            img.save(tmp_path, format=pil_format, **options)
+            os.replace(tmp_path, output_path)
+        return os.path.getsize(output_path)
+
+    def _added(self, size):
+        with self._lock:
+            if self._size is None:
+                self._size = self.usage()
+            else:
+                self._size += size
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def _variants(self):
+        for bucket in os.scandir(self.root):
+            if not bucket.is_dir() or bucket.name == 'locks':
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    yield entry
+
+    def usage(self):
+        """Bytes currently used by cached variants"""
+        if not os.path.isdir(self.root):
+            return 0
+        return sum(entry.stat().st_size for entry in self._variants())
+
+    def evict(self, target=None):
+        """
+        Delete least recently used variants until the cache is below `target` bytes
+        (default: LOW_WATERMARK of the budget). Returns (files removed, bytes freed).
+        """
+        if target is None:
+            target = int(self.max_bytes * LOW_WATERMARK)
+        if not os.path.isdir(self.root):
+            return 0, 0
+        entries = sorted(
+            ((stat.st_mtime, stat.st_size, entry.path) for entry in self._variants() for stat in [entry.stat()])
+        )
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        freed = 0
+        for _, size, path in entries:
+            if total - freed <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            removed += 1
+            freed += size
+        with self._lock:
+            self._size = total - freed
+        return removed, freed
+
+
+class _RefCountedLock:
+    """Per-variant in-process lock, dropped from the table once no thread holds it"""
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.users = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        self.lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.lock.release()
+        self.cache._release_key_lock(self.key, self)
+
+
+class _FileLock:
+    """Exclusive lock on a file, shared by every process rendering into the same cache"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = open(self.path, 'a')
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+
+
+_cache = None
+
+
+def get_transform_cache():
+    """Process-wide TransformCache instance"""
+    global _cache
+    if _cache is None:
+        _cache = TransformCache()
+    return _cache
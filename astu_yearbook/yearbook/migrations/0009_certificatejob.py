@@ -0,0 +1,33 @@
+# Generated by Django 5.2.2 on 2026-10-17 02:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('yearbook', '0008_leadership'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CertificateJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='certificate_jobs', to='yearbook.student')),
+            ],
+            options={
+                'verbose_name': 'Certificate Job',
+                'verbose_name_plural': 'Certificate Jobs',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='yearbook_ce_status_fa2f55_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'PENDING')), fields=('student',), name='unique_pending_certificate_job')],
+            },
+        ),
+    ]
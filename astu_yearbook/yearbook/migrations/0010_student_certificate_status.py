@@ -0,0 +1,40 @@
+# Generated by Django 5.2.2 on 2026-10-17 02:20
+
+import os
+from datetime import datetime, timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_certificate_status(apps, schema_editor):
+    """Record certificates that were already rendered before the status was stored in the database"""
+    Student = apps.get_model('yearbook', 'Student')
+    for student in Student.objects.exclude(student_id='').only('pk', 'student_id', 'name'):
+        relative_path = f"certificates/generated/{student.student_id}_{student.name.replace(' ', '_')}_certificate.png"
+        full_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+        if os.path.exists(full_path):
+            Student.objects.filter(pk=student.pk).update(
+                certificate_path=relative_path,
+                certificate_generated_at=datetime.fromtimestamp(os.path.getmtime(full_path), tz=timezone.utc),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('yearbook', '0009_certificatejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='certificate_generated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='certificate_path',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Generated certificate, relative to MEDIA_ROOT (empty until rendered)', max_length=255),
+        ),
+        migrations.RunPython(backfill_certificate_status, migrations.RunPython.noop),
+    ]
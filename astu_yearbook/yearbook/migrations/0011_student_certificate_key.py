@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-17 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('yearbook', '0010_student_certificate_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='certificate_key',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Hash of the rendering inputs of the stored certificate', max_length=64),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.2 on 2026-10-17 02:36
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    """Store the current counts, one UPDATE per counter"""
+    Department = apps.get_model('yearbook', 'Department')
+    Student = apps.get_model('yearbook', 'Student')
+    MemoryCategory = apps.get_model('yearbook', 'MemoryCategory')
+    MemoryBoard = apps.get_model('yearbook', 'MemoryBoard')
+    for parent, child, fk, field in (
+        (Department, Student, 'department', 'student_count'),
+        (MemoryCategory, MemoryBoard, 'category', 'memory_count'),
+    ):
+        counts = child.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk).annotate(n=Count('pk')).values('n')
+        parent.objects.update(**{field: Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('yearbook', '0012_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='student_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Maintained by yearbook/counters.py, repair with manage.py recount'),
+        ),
+        migrations.AddField(
+            model_name='memorycategory',
+            name='memory_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Maintained by yearbook/counters.py, repair with manage.py recount'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.2 on 2026-10-17 02:40
+
+import re
+from django.db import migrations, models
+
+
+def seed_student_id_sequence(apps, schema_editor):
+    """Continue after the highest INSA### ID in use, the last full scan of the students table"""
+    Student = apps.get_model('yearbook', 'Student')
+    IdSequence = apps.get_model('yearbook', 'IdSequence')
+    highest = 0
+    for student_id in Student.objects.filter(student_id__startswith='INSA').values_list('student_id', flat=True):
+        match = re.fullmatch(r'INSA(\d+)', student_id)
+        if match:
+            highest = max(highest, int(match.group(1)))
+    IdSequence.objects.create(name='student_id', next_value=highest + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('yearbook', '0013_counter_caches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('next_value', models.PositiveBigIntegerField(default=1)),
+            ],
+            options={
+                'verbose_name': 'ID Sequence',
+                'verbose_name_plural': 'ID Sequences',
+            },
+        ),
+        migrations.RunPython(seed_student_id_sequence, migrations.RunPython.noop),
+    ]
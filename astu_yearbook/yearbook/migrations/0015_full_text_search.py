@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from yearbook.search import install_search_indexes
+    install_search_indexes(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from yearbook.search import uninstall_search_indexes
+    uninstall_search_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text index outside the model state: a generated tsvector column with a
+    GIN index on PostgreSQL, FTS5 tables kept in sync by triggers on SQLite
+    (see yearbook/search.py). Other databases keep using SearchFilter.
+    """
+
+    dependencies = [
+        ('yearbook', '0014_id_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
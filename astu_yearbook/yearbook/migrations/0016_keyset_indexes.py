@@ -0,0 +1,25 @@
+# Generated by Django 5.2.2 on 2026-10-17 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('yearbook', '0015_full_text_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='memoryboard',
+            index=models.Index(fields=['-created_at', 'id'], name='yearbook_me_created_330491_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['name', 'id'], name='yearbook_st_name_f24cdb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traineesuccessstory',
+            index=models.Index(fields=['-graduation_year', 'id'], name='yearbook_tr_graduat_fe3e4e_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.2 on 2026-10-17 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('yearbook', '0016_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leadership',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', 'name'], name='leadership_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memoryboard',
+            index=models.Index(fields=['department', '-created_at', 'id'], name='yearbook_me_departm_cb50be_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memoryboard',
+            index=models.Index(fields=['category', '-created_at', 'id'], name='yearbook_me_categor_ce788c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memoryboard',
+            index=models.Index(fields=['memory_type', '-created_at', 'id'], name='yearbook_me_memory__f3be86_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memorycategory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', 'name'], name='memorycategory_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['department', 'name', 'id'], name='yearbook_st_departm_e4dc30_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(condition=models.Q(('is_featured', True)), fields=['name', 'id'], name='student_featured_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traineesuccessstory',
+            index=models.Index(fields=['department', '-graduation_year', 'id'], name='yearbook_tr_departm_dba660_idx'),
+        ),
+    ]
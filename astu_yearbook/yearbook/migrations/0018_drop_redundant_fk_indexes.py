@@ -0,0 +1,34 @@
+# Generated by Django 5.2.2 on 2026-10-17 03:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('yearbook', '0017_api_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='memoryboard',
+            name='category',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Select the category for this memory', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='memories', to='yearbook.memorycategory'),
+        ),
+        migrations.AlterField(
+            model_name='memoryboard',
+            name='department',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='memories', to='yearbook.department'),
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='department',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='students', to='yearbook.department'),
+        ),
+        migrations.AlterField(
+            model_name='traineesuccessstory',
+            name='department',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='trainees', to='yearbook.department'),
+        ),
+    ]
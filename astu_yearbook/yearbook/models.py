@@ -1,5 +1,8 @@
 # yearbook/models.py
-from django.db import models
+import re
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 
 class Department(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -7,6 +10,8 @@ class Department(models.Model):
     group_photo = models.ImageField(upload_to='departments/', blank=True, null=True)
     intro_message = models.TextField()
     theme_color = models.CharField(max_length=7, default='#3498db')  
+    updated_at = models.DateTimeField(auto_now=True)
+    student_count = models.PositiveIntegerField(default=0, editable=False, help_text="Maintained by yearbook/counters.py, repair with manage.py recount")
 
     class Meta:
         ordering = ['name']
@@ -16,13 +21,63 @@ class Department(models.Model):
     def __str__(self):
         return self.name
 
+STUDENT_ID_SEQUENCE = 'student_id'
+STUDENT_ID_PATTERN = re.compile(r'INSA(\d+)')
+
+
+class IdSequence(models.Model):
+    """
+    Named counter handing out unique numbers (e.g. the INSA### student IDs).
+    Allocation is one UPDATE of a single row, which holds the row lock until
+    the surrounding transaction ends, so concurrent allocations never overlap.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.PositiveBigIntegerField(default=1)
+
+    class Meta:
+        verbose_name = "ID Sequence"
+        verbose_name_plural = "ID Sequences"
+
+    def __str__(self):
+        return f"{self.name} (next: {self.next_value})"
+
+    @classmethod
+    def allocate(cls, name, count=1, initial=None):
+        """
+        Reserve `count` consecutive numbers and return them as a range.
+        `initial` is called to compute the first value when the sequence does not exist yet.
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        with transaction.atomic():
+            if not cls.objects.filter(name=name).update(next_value=F('next_value') + count):
+                first = initial() if initial else 1
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(name=name, next_value=first + count)
+                    return range(first, first + count)
+                except IntegrityError:
+                    # Another process created it first, allocate from its row
+                    cls.objects.filter(name=name).update(next_value=F('next_value') + count)
+            # Reads our own update, the row stays locked until the transaction commits
+            end = cls.objects.filter(name=name).values_list('next_value', flat=True).get()
+        return range(end - count, end)
+
+    @classmethod
+    def advance_past(cls, name, value):
+        """Make sure `value` is never handed out (e.g. after an ID was entered by hand)"""
+        cls.objects.filter(name=name).update(next_value=Greatest(F('next_value'), value + 1))
+
+
 class Student(models.Model):
     student_id = models.CharField(max_length=20, unique=True, blank=True, default="", help_text="Auto-generated ID (e.g., INSA009) - Leave blank for automatic generation")
     name = models.CharField(max_length=100)
     department = models.ForeignKey(
         Department, 
         on_delete=models.CASCADE,
-        related_name='students'
+        related_name='students',
+        # The (department, name, id) index below leads with this column
+        db_index=False
     )
     photo = models.ImageField(upload_to='students/')
     quote = models.CharField(max_length=200)
@@ -33,109 +88,150 @@ class Student(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     my_story = models.TextField(blank=True, null=True)
+    certificate_path = models.CharField(max_length=255, blank=True, default="", editable=False, help_text="Generated certificate, relative to MEDIA_ROOT (empty until rendered)")
+    certificate_generated_at = models.DateTimeField(blank=True, null=True, editable=False)
+    certificate_key = models.CharField(max_length=64, blank=True, default="", editable=False, help_text="Hash of the rendering inputs of the stored certificate")
 
     class Meta:
         ordering = ['name']
         verbose_name = "Student"
         verbose_name_plural = "Students"
+        indexes = [
+            # Keyset pagination order (yearbook/pagination.py)
+            models.Index(fields=['name', 'id']),
+            # ?department= and ?is_featured=true lists, already in name order
+            models.Index(fields=['department', 'name', 'id']),
+            models.Index(fields=['name', 'id'], condition=models.Q(is_featured=True), name='student_featured_name_idx'),
+        ]
         
     def __str__(self):
         return f"{self.name} ({self.department.name})"
     
+    # Fields drawn on the certificate; changing any of them requires a re-render
+    CERTIFICATE_FIELDS = ('student_id', 'name')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._certificate_snapshot = instance._get_certificate_snapshot()
+        return instance
+    
+    def _get_certificate_snapshot(self):
+        return tuple(self.__dict__.get(field) for field in self.CERTIFICATE_FIELDS)
+    
+    def certificate_fields_changed(self):
+        """
+        Return True if a field drawn on the certificate changed since the instance was loaded or last saved
+        """
+        snapshot = getattr(self, '_certificate_snapshot', None)
+        return snapshot is None or snapshot != self._get_certificate_snapshot()
+    
+    @property
+    def has_certificate(self):
+        """Certificate status read from the database, no filesystem access"""
+        return bool(self.certificate_path)
+    
+    def record_certificate(self, certificate_path, certificate_key):
+        """
+        Store the path and content key of a freshly rendered certificate without re-saving the whole row
+        """
+        from django.utils import timezone
+        self.certificate_path = certificate_path
+        self.certificate_key = certificate_key
+        self.certificate_generated_at = timezone.now()
+        Student.objects.filter(pk=self.pk).update(
+            certificate_path=self.certificate_path,
+            certificate_key=self.certificate_key,
+            certificate_generated_at=self.certificate_generated_at,
+        )
+    
     def save(self, *args, **kwargs):
         """
         Override save to auto-generate student_id if not provided
         """
         if not self.student_id or self.student_id == "STU001" or self.student_id == "":
-            # Find the highest INSA number by looking at all existing IDs
-            existing_students = Student.objects.filter(student_id__startswith='INSA').exclude(pk=self.pk)
-            
-            max_number = 0
-            for student in existing_students:
-                try:
-                    # Extract the number from student ID (e.g., INSA008 -> 8)
-                    number = int(student.student_id.replace('INSA', ''))
-                    if number > max_number:
-                        max_number = number
-                except (ValueError, AttributeError):
-                    continue
-            
-            # Generate new student_id by incrementing the highest number found
-            new_number = max_number + 1
-            self.student_id = f"INSA{new_number:03d}"
+            self.student_id = Student.allocate_student_ids()[0]
+        elif self._state.adding or self.certificate_fields_changed():
+            # A hand-entered or edited INSA ID must not be handed out again later
+            match = STUDENT_ID_PATTERN.fullmatch(self.student_id)
+            if match:
+                IdSequence.advance_past(STUDENT_ID_SEQUENCE, int(match.group(1)))
+        
+        if self.pk and self.certificate_path and self.certificate_fields_changed():
+            # The stored certificate shows the old name/ID until it is re-rendered
+            self.certificate_path = ""
+            self.certificate_key = ""
+            self.certificate_generated_at = None
         
         super().save(*args, **kwargs)
     
+    @classmethod
+    def allocate_student_ids(cls, count=1):
+        """Reserve `count` new INSA### IDs, e.g. a whole block for a bulk import"""
+        numbers = IdSequence.allocate(STUDENT_ID_SEQUENCE, count, initial=cls._first_free_student_number)
+        return [f"INSA{number:03d}" for number in numbers]
+    
+    @classmethod
+    def _first_free_student_number(cls):
+        # Only runs once, when the sequence row is created
+        highest = 0
+        for student_id in cls.objects.filter(student_id__startswith='INSA').values_list('student_id', flat=True):
+            match = STUDENT_ID_PATTERN.fullmatch(student_id)
+            if match:
+                highest = max(highest, int(match.group(1)))
+        return highest + 1
+    
+    def save_base(self, *args, **kwargs):
+        super().save_base(*args, **kwargs)
+        # post_save receivers have seen the change, remember the saved values
+        self._certificate_snapshot = self._get_certificate_snapshot()
+    
     def get_certificate_url(self):
         """
-        Generate and return certificate URL for this student using the exact logic from the working FastAPI app
+        Return the certificate path (relative to MEDIA_ROOT), rendering it if missing or stale
         """
-        from PIL import Image, ImageDraw, ImageFont
-        from django.conf import settings
-        import os
-        import traceback
-        
-        try:
-            # Use the certificate template from the media/certificates folder
-            template_path = os.path.join(settings.MEDIA_ROOT, 'certificates', 'insa_summercamp_certeficate.png')
-            output_dir = os.path.join(settings.MEDIA_ROOT, 'certificates', 'generated')
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Check if template exists
-            if not os.path.exists(template_path):
-                print(f"Template image not found at: {template_path}")
-                return None
+        from .certificate_service import get_certificate_service
+        return get_certificate_service().get_certificate_path(self)
 
-            # Prefer using the explicit student_id field for filenames; fall back to numeric id
-            sid = self.student_id if self.student_id else f"STU{self.id:03d}"
-            filename = f"{sid}_{self.name.replace(' ', '_')}_certificate.png"
-            file_path = os.path.join(output_dir, filename)
-            
-            # Check if certificate already exists
-            if os.path.exists(file_path):
-                return f"certificates/generated/{filename}"
-            
-            # Load the certificate template
-            img = Image.open(template_path)
-            draw = ImageDraw.Draw(img)
-            
-            # Fonts - Use the same logic as the working certificate verification app
-            try:
-                font_path = "arial.ttf"
-                font_name = ImageFont.truetype(font_path, 150)  # bigger for name
-                font_link = ImageFont.truetype(font_path, 50)    # smaller for link
-            except OSError:
-                # Fallback to default font if arial.ttf is not found
-                font_name = ImageFont.load_default()
-                font_link = ImageFont.load_default()
-            
-            # Add student name (centered horizontally, fixed vertical position)
-            name_text = self.name
-            name_bbox = draw.textbbox((0, 0), name_text, font=font_name)
-            name_width = name_bbox[2] - name_bbox[0]
-            name_x = (img.width - name_width) // 2
-            name_y = 1070  # Fixed position for name
-            draw.text((name_x, name_y), name_text, fill="black", font=font_name)
-            
-            # Add verification link (centered horizontally, fixed vertical position)
-            # Use the actual server URL for verification
-            verification_link = f"http://172.27.12.216:8000/yearbook/verify/{sid}/"
-            link_bbox = draw.textbbox((0, 0), verification_link, font=font_link)
-            link_width = link_bbox[2] - link_bbox[0]
-            link_x = (img.width - link_width) // 2
-            link_y = 2100  # Fixed position for verification link
-            draw.text((link_x, link_y), verification_link, fill="blue", font=font_link)
-            
-            # Save certificate
-            img.save(file_path)
-            
-            # Return relative path for URL generation
-            return f"certificates/generated/{filename}"
-            
-        except Exception as e:
-            print(f"Error generating certificate: {e}")
-            traceback.print_exc()
-            return None
+class CertificateJob(models.Model):
+    """
+    Queued certificate render, consumed by `manage.py run_certificate_worker`
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    student = models.ForeignKey(
+        Student,
+        on_delete=models.CASCADE,
+        related_name='certificate_jobs'
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Certificate Job"
+        verbose_name_plural = "Certificate Jobs"
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        constraints = [
+            # At most one pending job per student: repeated requests collapse into one render
+            models.UniqueConstraint(
+                fields=['student'],
+                condition=models.Q(status='PENDING'),
+                name='unique_pending_certificate_job',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Certificate for {self.student_id} ({self.get_status_display()})"
 
 class FacultyTribute(models.Model):
     name = models.CharField(max_length=100)
@@ -195,19 +291,19 @@ class MemoryCategory(models.Model):
     is_active = models.BooleanField(default=True, help_text="Show this category on the frontend")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    memory_count = models.PositiveIntegerField(default=0, editable=False, help_text="Maintained by yearbook/counters.py, repair with manage.py recount")
     
     class Meta:
         verbose_name = "Memory Category"
         verbose_name_plural = "Memory Categories"
         ordering = ['order', 'name']
+        indexes = [
+            # The API lists active categories only
+            models.Index(fields=['order', 'name'], condition=models.Q(is_active=True), name='memorycategory_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.icon} {self.name}"
-    
-    def memory_count(self):
-        """Return the number of memories in this category"""
-        return self.memories.count()
-    memory_count.short_description = "Memories"
 
 
 class MemoryBoard(models.Model):
@@ -227,7 +323,9 @@ class MemoryBoard(models.Model):
         on_delete=models.SET_NULL, 
         null=True, 
         blank=True,
-        related_name='memories'
+        related_name='memories',
+        # The (department, -created_at, id) index below leads with this column
+        db_index=False
     )
     category = models.ForeignKey(
         MemoryCategory,
@@ -235,7 +333,9 @@ class MemoryBoard(models.Model):
         null=True,
         blank=True,
         related_name='memories',
-        help_text="Select the category for this memory"
+        help_text="Select the category for this memory",
+        # The (category, -created_at, id) index below leads with this column
+        db_index=False
     )
     memory_type = models.CharField(
         max_length=10, 
@@ -244,6 +344,7 @@ class MemoryBoard(models.Model):
         help_text="Legacy category field (deprecated, use 'category' instead)"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     author_name = models.CharField(max_length=100, blank=True, null=True)
     author_program = models.CharField(max_length=100, blank=True, null=True)
     author_year = models.CharField(max_length=20, blank=True, null=True)
@@ -252,6 +353,13 @@ class MemoryBoard(models.Model):
         ordering = ['-created_at']
         verbose_name = "Memory Board Entry"
         verbose_name_plural = "Memory Board Entries"
+        indexes = [
+            models.Index(fields=['-created_at', 'id']),
+            # ?department=, ?category= and ?memory_type= lists, already newest first
+            models.Index(fields=['department', '-created_at', 'id']),
+            models.Index(fields=['category', '-created_at', 'id']),
+            models.Index(fields=['memory_type', '-created_at', 'id']),
+        ]
         
     def __str__(self):
         return f"{self.title} ({self.get_memory_type_display()})"
@@ -264,11 +372,14 @@ class TraineeSuccessStory(models.Model):
     department = models.ForeignKey(
         Department, 
         on_delete=models.CASCADE,
-        related_name='trainees'
+        related_name='trainees',
+        # The (department, -graduation_year, id) index below leads with this column
+        db_index=False
     )
     graduation_year = models.PositiveIntegerField(default=2024)
     current_position = models.CharField(max_length=150)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     my_story = models.TextField(blank=True, null=True)
     project_showcase = models.TextField(blank=True, null=True, help_text="Key projects completed during training")
     skills_acquired = models.TextField(blank=True, null=True, help_text="Technical skills gained")
@@ -277,6 +388,10 @@ class TraineeSuccessStory(models.Model):
         ordering = ['-graduation_year']
         verbose_name = "Trainee Success Story"
         verbose_name_plural = "Trainee Success Stories"
+        indexes = [
+            models.Index(fields=['-graduation_year', 'id']),
+            models.Index(fields=['department', '-graduation_year', 'id']),
+        ]
         
     def __str__(self):
         return f"{self.name} ({self.department.name}, {self.graduation_year})"
@@ -329,6 +444,10 @@ class Leadership(models.Model):
         ordering = ['order', 'name']
         verbose_name = "Leadership Message"
         verbose_name_plural = "Leadership Messages"
+        indexes = [
+            # The API lists active leaders only
+            models.Index(fields=['order', 'name'], condition=models.Q(is_active=True), name='leadership_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.position}"
@@ -1,12 +1,165 @@
 # yearbook/pagination.py
+"""
+Page number pagination with opt-in keyset (cursor) pagination.
+
+Without a `cursor` parameter the endpoints behave as they always have
+(`?page=`, `count`/`next`/`previous`/`results`). A viewset that declares
+`cursor_ordering`, a unique ordering such as ('name', 'id'), additionally
+serves `?cursor=` (empty for the first page): each page is read with a
+`WHERE (name, id) > (last seen)` condition on that ordering instead of an
+OFFSET, and no COUNT(*) is run, so page 1000 costs the same as page 1.
+Follow the `next`/`previous` links, the cursor itself is opaque.
+
+`?total=approx` adds an `approximate_count` to cursor pages: the table
+statistics for an unfiltered PostgreSQL table, otherwise an exact count
+cached for APPROXIMATE_COUNT_TIMEOUT seconds.
+"""
+
+import base64
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_KEY_PREFIX = 'yearbook:count:'
+
+
+def _json_value(value):
+    # Full precision: DjangoJSONEncoder drops the microseconds the keyset compares on
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values, reverse=False):
+    payload = json.dumps({'v': values, 'r': reverse}, default=_json_value, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(values, reverse) of a cursor, None for the first page"""
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return list(payload['v']), bool(payload.get('r'))
+    except (ValueError, TypeError, KeyError):
+        raise NotFound('Invalid cursor')
+
+
+def keyset_filter(ordering, values, reverse=False):
+    """
+    Rows strictly after `values` in `ordering` (before them with reverse=True),
+    e.g. ('-created_at', 'id') -> created_at < x OR (created_at = x AND id > y)
+    """
+    condition = Q()
+    for i, term in enumerate(ordering):
+        field = term.lstrip('-')
+        descending = term.startswith('-') != reverse
+        equal = {f.lstrip('-'): v for f, v in zip(ordering[:i], values[:i])}
+        condition |= Q(**equal, **{f'{field}__{"lt" if descending else "gt"}': values[i]})
+    # Redundant, but a plain range on the leading column lets the index seek to the position
+    first = ordering[0]
+    descending = first.startswith('-') != reverse
+    return Q(**{f'{first.lstrip("-")}__{"lte" if descending else "gte"}': values[0]}) & condition
+
+
+def reversed_ordering(ordering):
+    return [term[1:] if term.startswith('-') else f'-{term}' for term in ordering]
 
-class SmallResultsPagination(PageNumberPagination):
+
+def approximate_count(queryset):
+    """Row count of `queryset`, allowed to be slightly stale"""
+    query = queryset.query
+    if connection.vendor == 'postgresql' and not query.where:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        # -1 until the table has been analyzed
+        if row and row[0] >= 0:
+            return row[0]
+    key = COUNT_KEY_PREFIX + hashlib.sha256(str(query).encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, getattr(settings, 'APPROXIMATE_COUNT_TIMEOUT', 300))
+    return count
+
+
+class KeysetPaginationMixin:
+    cursor_query_param = 'cursor'
+    total_query_param = 'total'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = getattr(view, 'cursor_ordering', None)
+        if not self.ordering or self.cursor_query_param not in request.query_params:
+            self.ordering = None
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = decode_cursor(request.query_params[self.cursor_query_param])
+        if position is not None and len(position[0]) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+        reverse = position is not None and position[1]
+
+        self.total = None
+        if request.query_params.get(self.total_query_param) == 'approx':
+            self.total = approximate_count(queryset.order_by())
+
+        # The keyset ordering replaces any other one, e.g. search relevance
+        ordering = reversed_ordering(self.ordering) if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            try:
+                queryset = queryset.filter(keyset_filter(self.ordering, position[0], reverse))
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound('Invalid cursor')
+        rows = list(queryset[:page_size + 1])
+        more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # Coming back from a later page there is always a next one, and vice versa
+        self.next_position = self.row_values(rows[-1]) if rows and (reverse or more) else None
+        self.previous_position = self.row_values(rows[0]) if rows and position is not None and (more or not reverse) else None
+        return rows
+
+    def row_values(self, row):
+        return [getattr(row, term.lstrip('-')) for term in self.ordering]
+
+    def cursor_link(self, values, reverse):
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(values, reverse))
+
+    def get_paginated_response(self, data):
+        if self.ordering is None:
+            return super().get_paginated_response(data)
+        body = {
+            'next': self.cursor_link(self.next_position, False) if self.next_position else None,
+            'previous': self.cursor_link(self.previous_position, True) if self.previous_position else None,
+            'results': data,
+        }
+        if self.total is not None:
+            body = {'approximate_count': self.total, **body}
+        return Response(body)
+
+
+class SmallResultsPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class LargeResultsPagination(PageNumberPagination):
+
+class LargeResultsPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 100
     page_size_query_param = 'page_size'
-    max_page_size = 500
\ No newline at end of file
+    max_page_size = 500
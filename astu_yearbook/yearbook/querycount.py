@@ -0,0 +1,113 @@
+# yearbook/querycount.py
+"""
+Per-request query accounting for development and tests.
+
+QueryCountMiddleware records every SQL statement a request executes (through
+a database execute wrapper, so it works with DEBUG off), groups them by
+shape - the SQL with literal values and IN-list lengths removed - and reports:
+
+    X-Query-Count     number of statements
+    X-Query-Budget    the viewset's budget for this action, if it declares one
+    X-Query-Repeated  number of shapes executed QUERY_REPEAT_THRESHOLD times or
+                      more, the signature of an N+1 query
+
+Over-budget requests and repeated shapes are logged to 'yearbook.queries'.
+A viewset declares its budget as `query_budget = 4` or per action, e.g.
+`query_budget = {'list': 4, 'retrieve': 3}`.
+"""
+
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('yearbook.queries')
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def sql_shape(sql):
+    """SQL with parameters, literals and IN-list lengths collapsed"""
+    shape = _NUMBER.sub('%s', _STRING.sub('%s', sql))
+    return _IN_LIST.sub('(...)', shape)
+
+
+class QueryRecorder:
+    """Context manager recording the SQL statements executed on every database connection"""
+
+    def __init__(self):
+        self.shapes = Counter()
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.shapes[sql_shape(sql)] += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    @property
+    def count(self):
+        return sum(self.shapes.values())
+
+    def repeated(self, threshold=None):
+        """{shape: executions} for shapes executed at least `threshold` times"""
+        if threshold is None:
+            threshold = getattr(settings, 'QUERY_REPEAT_THRESHOLD', 5)
+        return {shape: n for shape, n in self.shapes.items() if n >= threshold}
+
+
+def get_query_budget(view_class, action):
+    """Budget a viewset declares for `action`, None when it declares none"""
+    budget = getattr(view_class, 'query_budget', None)
+    if isinstance(budget, dict):
+        return budget.get(action)
+    return budget
+
+
+class QueryCountMiddleware:
+    """
+    Count the queries of each request; enabled by QUERY_COUNT_ENABLED
+    (defaults to DEBUG) and meant for development and the test suite
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_COUNT_ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        response['X-Query-Count'] = str(recorder.count)
+        repeated = recorder.repeated()
+        if repeated:
+            response['X-Query-Repeated'] = str(len(repeated))
+            for shape, n in repeated.items():
+                logger.warning(f'{request.method} {request.path}: same query executed {n} times: {shape[:300]}')
+
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None:
+            response['X-Query-Budget'] = str(budget)
+            if recorder.count > budget:
+                logger.warning(f'{request.method} {request.path}: {recorder.count} queries, budget is {budget}')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # DRF viewset views carry their class and the method -> action map
+        view_class = getattr(view_func, 'cls', None)
+        actions = getattr(view_func, 'actions', None) or {}
+        if view_class is not None:
+            request.query_budget = get_query_budget(view_class, actions.get(request.method.lower()))
+        return None
@@ -0,0 +1,207 @@
+# yearbook/response_cache.py
+"""
+Two-tier cache for the read-only API endpoints.
+
+L1 is a small LRU in each worker process, L2 is the shared Django cache
+(Redis when REDIS_URL is set). Entries are keyed on the full URL, the sorted
+query parameters, the renderer and a version token for every model the
+response is built from. Saving or deleting a model replaces its token (see
+signals.py), so stale entries are simply never looked up again and expire on
+their own.
+
+Checking the version tokens costs one L2 round trip per request; a hit skips
+the database queries and the serializers entirely.
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+VERSION_KEY_PREFIX = 'yearbook:version:'
+RESPONSE_KEY_PREFIX = 'yearbook:response:'
+
+
+class LRUCache:
+    """Thread-safe in-process LRU with a per-entry time to live"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_l1 = LRUCache(getattr(settings, 'RESPONSE_CACHE_L1_ENTRIES', 256))
+_stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def response_cache_stats():
+    """Hit and miss counts of this worker process"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+    stats['hit_ratio'] = round((stats['l1_hits'] + stats['l2_hits']) / lookups, 3) if lookups else None
+    stats['l1_entries'] = len(_l1)
+    return stats
+
+
+def tiered_get(key):
+    """Look `key` up in this worker's LRU, then in the shared cache; returns (value, tier)"""
+    value = _l1.get(key)
+    if value is not None:
+        return value, 'L1'
+    value = cache.get(key)
+    if value is not None:
+        _l1.set(key, value, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 600))
+        return value, 'L2'
+    return None, None
+
+
+def tiered_set(key, value, timeout):
+    cache.set(key, value, timeout)
+    _l1.set(key, value, timeout)
+
+
+def _new_token():
+    # The time of the change is part of the token, ConditionalGetMixin uses it for Last-Modified
+    return f'{time.time():.3f}-{uuid.uuid4().hex}'
+
+
+def token_timestamp(token):
+    """Time at which a version token was issued"""
+    return float(token.split('-', 1)[0])
+
+
+def get_versions(labels):
+    """
+    Current version token of each model label, creating missing tokens.
+    Returns None when the shared cache is unavailable.
+    """
+    keys = [f'{VERSION_KEY_PREFIX}{label}' for label in labels]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A missing token (first use or a flushed cache) must never match an older one
+            cache.add(key, _new_token(), None)
+            versions[key] = cache.get(key)
+            if versions[key] is None:
+                return None
+    return [versions[key] for key in keys]
+
+
+def bump_versions(labels):
+    """Invalidate every cached response built from any of these models"""
+    cache.set_many({f'{VERSION_KEY_PREFIX}{label}': _new_token() for label in labels}, None)
+
+
+class CachedResponseMixin:
+    """
+    Cache `list` and `retrieve` responses of a viewset.
+
+    `cache_models` lists the model labels (e.g. 'yearbook.Student') the response
+    is built from; a change to any of them invalidates the cached response.
+    """
+    cache_models = ()
+    cache_timeout = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_models(self):
+        return self.cache_models or (self.get_queryset().model._meta.label,)
+
+    def get_cache_key(self, request):
+        # Computed once per request, ConditionalGetMixin shares it
+        if not hasattr(request, '_response_cache_key'):
+            request._response_cache_key = self.build_cache_key(request)
+        return request._response_cache_key
+
+    def build_cache_key(self, request):
+        query = urlencode(sorted((k, v) for k, values in request.query_params.lists() for v in values))
+        versions = get_versions(self.get_cache_models())
+        request._response_cache_versions = versions
+        if versions is None:
+            return None
+        raw_key = '|'.join([
+            request.build_absolute_uri(request.path),
+            query,
+            request.accepted_renderer.format,
+            *versions,
+        ])
+        return RESPONSE_KEY_PREFIX + hashlib.sha256(raw_key.encode()).hexdigest()
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not getattr(settings, 'RESPONSE_CACHE_ENABLED', True):
+            return handler(request, *args, **kwargs)
+
+        timeout = self.cache_timeout or getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 600)
+        key = self.get_cache_key(request)
+        if key is None:
+            return handler(request, *args, **kwargs)
+
+        data, tier = tiered_get(key)
+        if data is not None:
+            _count('l1_hits' if tier == 'L1' else 'l2_hits')
+            return self._cached(data, f'HIT-{tier}')
+
+        _count('misses')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            # Plain containers pickle without the serializer references of ReturnDict/ReturnList
+            tiered_set(key, _plain(response.data), timeout)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    @staticmethod
+    def _cached(data, status):
+        response = Response(data)
+        response['X-Cache'] = status
+        return response
+
+
+def _plain(data):
+    if isinstance(data, dict):
+        return {key: _plain(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_plain(value) for value in data]
+    return data
@@ -0,0 +1,173 @@
+# yearbook/search.py
+"""
+Ranked full-text search for students and memories.
+
+The index lives in the database and is maintained by the database on every
+write, including bulk_create and QuerySet.update:
+
+    PostgreSQL  a generated `search_vector` tsvector column with a GIN index
+    SQLite      an external-content FTS5 table plus insert/update/delete triggers
+
+The model classes know nothing about either; FullTextSearchFilter adds the
+match condition and a `search_rank` column (higher is better) with raw SQL. On any other
+database it falls back to DRF's SearchFilter (`search_fields` on the view).
+
+Input is reduced to at most MAX_TERMS words, each matched as a prefix, so
+partial words typed in a search box already find results.
+"""
+
+import re
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+MAX_TERMS = 8
+
+# Model label -> (table, [(column, weight)]), highest weight first
+SEARCH_INDEXES = {
+    'yearbook.Student': ('yearbook_student', [
+        ('name', 'A'), ('student_id', 'A'), ('highlight_tagline', 'B'), ('quote', 'B'), ('last_words', 'C'),
+    ]),
+    'yearbook.MemoryBoard': ('yearbook_memoryboard', [
+        ('title', 'A'), ('author_name', 'A'), ('caption', 'B'), ('author_program', 'C'), ('author_year', 'C'),
+    ]),
+}
+
+# FTS5 bm25() weight per column, by tsvector weight class
+BM25_WEIGHTS = {'A': 10.0, 'B': 4.0, 'C': 1.0}
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+# --- Index installation ------------------------------------------------------
+
+def _postgres_statements(table, columns):
+    vector = ' || '.join(
+        f"setweight(to_tsvector('simple', coalesce({column}, '')), '{weight}')"
+        for column, weight in columns
+    )
+    return [
+        f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED',
+        f'CREATE INDEX IF NOT EXISTS {table}_search_gin ON {table} USING GIN (search_vector)',
+    ]
+
+
+def _sqlite_statements(table, columns):
+    fts = fts_table(table)
+    names = ', '.join(column for column, _ in columns)
+    new_values = ', '.join(f'new.{column}' for column, _ in columns)
+    old_values = ', '.join(f'old.{column}' for column, _ in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values}); END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values}); END",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values}); "
+        f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values}); END',
+    ]
+
+
+def _sqlite_index_complete(cursor, table):
+    fts = fts_table(table)
+    cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+        [fts, f'{fts}_ai', f'{fts}_ad', f'{fts}_au'],
+    )
+    return cursor.fetchone()[0] == 4
+
+
+def install_search_indexes(conn=None):
+    """
+    Create the search index objects that are missing and fill them; idempotent.
+    SQLite drops triggers when Django rebuilds a table during a migration, so
+    this also runs after every migrate (see signals.py).
+    """
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        for table, columns in SEARCH_INDEXES.values():
+            if conn.vendor == 'postgresql':
+                # The generated column is computed for existing rows when it is added
+                for statement in _postgres_statements(table, columns):
+                    cursor.execute(statement)
+            elif conn.vendor == 'sqlite':
+                if _sqlite_index_complete(cursor, table):
+                    continue
+                for statement in _sqlite_statements(table, columns):
+                    cursor.execute(statement)
+                fts = fts_table(table)
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def uninstall_search_indexes(conn=None):
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        for table, _ in SEARCH_INDEXES.values():
+            if conn.vendor == 'postgresql':
+                cursor.execute(f'DROP INDEX IF EXISTS {table}_search_gin')
+                cursor.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector')
+            elif conn.vendor == 'sqlite':
+                fts = fts_table(table)
+                for suffix in ('_ai', '_ad', '_au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {fts}{suffix}')
+                cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+# --- Querying -----------------------------------------------------------------
+
+def full_text_search(queryset, query):
+    """
+    Filter `queryset` to rows matching `query` and annotate `search_rank`
+    (higher is better). Returns None when the database has no search index.
+    """
+    label = queryset.model._meta.label
+    if label not in SEARCH_INDEXES or connection.vendor not in ('postgresql', 'sqlite'):
+        return None
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    table, columns = SEARCH_INDEXES[label]
+
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        matches = RawSQL(f"{table}.search_vector @@ to_tsquery('simple', %s)", (tsquery,), output_field=BooleanField())
+        rank = RawSQL(f"ts_rank({table}.search_vector, to_tsquery('simple', %s))", (tsquery,), output_field=FloatField())
+        return queryset.filter(matches).annotate(search_rank=rank)
+
+    fts = fts_table(table)
+    match = ' '.join(f'"{term}"*' for term in terms)
+    weights = ', '.join(str(BM25_WEIGHTS[weight]) for _, weight in columns)
+    # A join lets FTS5 drive the query from its index and compute bm25() (lower is better) once per match
+    return queryset.extra(
+        tables=[fts],
+        where=[f'{fts}.rowid = {table}.id', f'{fts} MATCH %s'],
+        params=[match],
+        select={'search_rank': f'-bm25({fts}, {weights})'},
+    )
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Drop-in replacement for SearchFilter: same `?search=` parameter, answered
+    from the full-text index and ordered by relevance
+    """
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        results = full_text_search(queryset, query)
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+        if results is queryset:
+            return results
+        ordering = ['-search_rank', *(queryset.query.order_by or queryset.model._meta.ordering), 'pk']
+        return results.order_by(*ordering)
@@ -253,19 +253,16 @@ def log_security_event(event_type, description, request=None, severity='WARNING'
         logger.warning(log_message)
 
 
-# Rate limiting decorator (requires django-ratelimit)
-from django_ratelimit.decorators import ratelimit
-
-def rate_limit_api(key='ip', rate='100/h', method='ALL'):
+# Rate limiting decorator (see yearbook/throttling.py)
+def rate_limit_api(scope):
     """
-    Decorator for rate limiting API endpoints.
+    Decorator for rate limiting plain Django views.
     
     Args:
-        key: What to rate limit on ('ip', 'user', etc.)
-        rate: Rate limit string (e.g., '100/h' for 100 requests per hour)
-        method: HTTP methods to apply rate limiting to
+        scope: Key of settings.THROTTLE_RATES holding the rate (e.g. '20/minute')
     """
-    return ratelimit(key=key, rate=rate, method=method)
+    from .throttling import throttle
+    return throttle(scope)
 
 
 # CSRF exemption wrapper with logging
@@ -1,36 +1,84 @@
 # yearbook/serializers.py
+from django.core.files.storage import default_storage
+from django.utils.text import Truncator
 from rest_framework import serializers
 from .models import *
+from .images import derivative_names
+from .fieldsets import DynamicFieldsMixin
 
-class ProfileImageSerializer(serializers.ModelSerializer):
+MESSAGE_EXCERPT_LENGTH = 200
+
+
+def absolute_uri(context, location):
+    """
+    request.build_absolute_uri(location), with the scheme and host resolved once
+    per serialization instead of once per URL of every row
+    """
+    request = context.get('request')
+    if request is None:
+        return location
+    if not location.startswith('/') or location.startswith('//'):
+        return request.build_absolute_uri(location)
+    if '_site_root' not in context:
+        context['_site_root'] = request.build_absolute_uri('/').rstrip('/')
+    return context['_site_root'] + location
+
+
+class SrcsetField(serializers.Field):
+    """
+    Read-only map of an image's responsive derivatives as srcset strings per format,
+    e.g. {"webp": "https://.../photo.jpg_320w.webp 320w, ..."}; None when there is no image
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value or not value.name:
+            return None
+        srcset = {}
+        for fmt, widths in derivative_names(value.name).items():
+            candidates = []
+            for width, name in widths.items():
+                url = absolute_uri(self.context, default_storage.url(name))
+                candidates.append(f"{url} {width}w")
+            srcset[fmt] = ', '.join(candidates)
+        return srcset
+
+class ProfileImageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_srcset = SrcsetField(source='image')
 
     class Meta:
         model = ProfileImage
-        fields = ['image_url', 'caption']
+        fields = ['image_url', 'image_srcset', 'caption']
+        method_field_sources = {'image_url': ['image']}
 
     def get_image_url(self, obj):
-        return obj.image.url if obj.image else None
+        if not obj.image:
+            return None
+        return absolute_uri(self.context, obj.image.url)
 
-class DepartmentSerializer(serializers.ModelSerializer):
-    student_count = serializers.SerializerMethodField()
+class DepartmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    cover_image_srcset = SrcsetField(source='cover_image')
+    group_photo_srcset = SrcsetField(source='group_photo')
     
     class Meta:
         model = Department
         fields = '__all__'
-        
-    def get_student_count(self, obj):
-        return obj.students.count()
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     department_name = serializers.CharField(source='department.name', read_only=True)
     photo_url = serializers.SerializerMethodField()
+    photo_srcset = SrcsetField(source='photo')
     certificate_url = serializers.SerializerMethodField()
     profile_images = ProfileImageSerializer(many=True, read_only=True)
     
     class Meta:
         model = Student
-        fields = ['id', 'student_id', 'name', 'department', 'department_name', 'photo_url', 'certificate_url', 'quote', 'last_words', 'highlight_tagline', 'description', 'is_featured', 'created_at', 'updated_at', 'my_story', 'profile_images']
+        fields = ['id', 'student_id', 'name', 'department', 'department_name', 'photo_url', 'photo_srcset', 'certificate_url', 'quote', 'last_words', 'highlight_tagline', 'description', 'is_featured', 'created_at', 'updated_at', 'my_story', 'profile_images']
+        expandable_fields = ['profile_images']
+        method_field_sources = {'photo_url': ['photo']}
         
     def get_photo_url(self, obj):
         try:
@@ -38,12 +86,8 @@ class StudentSerializer(serializers.ModelSerializer):
             if not obj.photo or not obj.photo.name:
                 return None
                 
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.photo.url)
-            else:
-                # Fallback: return relative URL if no request context
-                return obj.photo.url
+            # Relative URL without a request context
+            return absolute_uri(self.context, obj.photo.url)
         except Exception:
             # Handle media storage issues gracefully - return placeholder
             return "/placeholder-user.jpg"
@@ -56,7 +100,7 @@ class StudentSerializer(serializers.ModelSerializer):
             if request:
                 # Note: router registers viewsets under /yearbook/api/, so the certificate action is at
                 # /yearbook/api/students/{id}/certificate/
-                return request.build_absolute_uri(f'/yearbook/api/students/{obj.id}/certificate/')
+                return absolute_uri(self.context, f'/yearbook/api/students/{obj.id}/certificate/')
             # Fallback: try to use Django settings to construct a SITE_URL if provided
             from django.conf import settings
             site_url = getattr(settings, 'SITE_URL', None)
@@ -67,63 +111,56 @@ class StudentSerializer(serializers.ModelSerializer):
         except Exception:
             # Handle any errors gracefully
             return None
-    
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        request = self.context.get('request')
-        
-        # Fix profile_image URL
-        if representation.get('profile_image'):
-            representation['profile_image'] = request.build_absolute_uri(representation['profile_image'])
-        
-        # Fix profile_images URLs
-        if 'profile_images' in representation:
-            representation['profile_images'] = [
-                request.build_absolute_uri(img) 
-                for img in representation['profile_images']
-            ]
-        return representation
-
-class FacultyTributeSerializer(serializers.ModelSerializer):
+
+class StudentListSerializer(StudentSerializer):
+    """The student card of list pages; StudentSerializer has the full profile"""
+    class Meta(StudentSerializer.Meta):
+        fields = ['id', 'student_id', 'name', 'department', 'department_name', 'photo_url', 'photo_srcset', 'certificate_url', 'quote', 'last_words', 'highlight_tagline', 'is_featured', 'profile_images']
+        # Only the memory board and certificate pages need these: ?expand=last_words,certificate_url
+        expandable_fields = StudentSerializer.Meta.expandable_fields + ['certificate_url', 'last_words']
+
+class FacultyTributeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     photo_url = serializers.SerializerMethodField()
     
     class Meta:
         model = FacultyTribute
         fields = ['id', 'name', 'photo_url', 'message', 'position', 'order', 'department_name', 'years_of_service', 'specialization']
+        method_field_sources = {'photo_url': ['photo']}
         
     def get_photo_url(self, obj):
         return obj.photo.url if obj.photo else None
 
-class DirectorGeneralMessageSerializer(serializers.ModelSerializer):
+class DirectorGeneralMessageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     photo_url = serializers.SerializerMethodField()
     
     class Meta:
         model = DirectorGeneralMessage
         fields = '__all__'
+        method_field_sources = {'photo_url': ['photo']}
         
     def get_photo_url(self, obj):
         return obj.photo.url if obj.photo else None
 
-class CyberTalentDirectorMessageSerializer(serializers.ModelSerializer):
+class CyberTalentDirectorMessageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     photo_url = serializers.SerializerMethodField()
     
     class Meta:
         model = CyberTalentDirectorMessage
         fields = '__all__'
+        method_field_sources = {'photo_url': ['photo']}
         
     def get_photo_url(self, obj):
         return obj.photo.url if obj.photo else None
 
-class MemoryCategorySerializer(serializers.ModelSerializer):
-    memory_count = serializers.IntegerField(source='memories.count', read_only=True)
-    
+class MemoryCategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = MemoryCategory
         fields = ['id', 'name', 'icon', 'description', 'color', 'order', 'is_active', 'memory_count']
 
 
-class MemoryBoardSerializer(serializers.ModelSerializer):
+class MemoryBoardSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     photo_url = serializers.SerializerMethodField()
+    photo_srcset = SrcsetField(source='photo')
     department_name = serializers.CharField(
         source='department.name', 
         read_only=True,
@@ -147,38 +184,51 @@ class MemoryBoardSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = MemoryBoard
-        fields = ['id', 'title', 'photo_url', 'caption', 'department', 'department_name', 
+        fields = ['id', 'title', 'photo_url', 'photo_srcset', 'caption', 'department', 'department_name', 
                   'category', 'category_name', 'category_icon', 'category_color',
                   'memory_type', 'created_at', 'author_name', 'author_program', 'author_year']
+        method_field_sources = {'photo_url': ['photo']}
         
     def get_photo_url(self, obj):
         if obj.photo:
             # Return full URL with domain for frontend to access
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.photo.url)
-            return obj.photo.url
+            return absolute_uri(self.context, obj.photo.url)
         return None
 
-class TraineeSuccessStorySerializer(serializers.ModelSerializer):
+class MemoryBoardListSerializer(MemoryBoardSerializer):
+    class Meta(MemoryBoardSerializer.Meta):
+        # The gallery modal shows the category icon and author year, the color comes with /memory-categories/
+        fields = ['id', 'title', 'photo_url', 'photo_srcset', 'caption', 'department', 'department_name',
+                  'category', 'category_name', 'category_icon', 'memory_type', 'created_at',
+                  'author_name', 'author_program', 'author_year']
+
+class TraineeSuccessStorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     photo_url = serializers.SerializerMethodField()
+    photo_srcset = SrcsetField(source='photo')
     department_name = serializers.CharField(source='department.name', read_only=True)
-    profile_images = ProfileImageSerializer(many=True, read_only=True, source='profile_images')
+    profile_images = ProfileImageSerializer(many=True, read_only=True)
     
     class Meta:
         model = TraineeSuccessStory
-        fields = ['id', 'name', 'photo_url', 'bio', 'achievement', 'department', 'department_name', 'graduation_year', 'current_position', 'created_at', 'my_story', 'project_showcase', 'skills_acquired', 'profile_images']
+        fields = ['id', 'name', 'photo_url', 'photo_srcset', 'bio', 'achievement', 'department', 'department_name', 'graduation_year', 'current_position', 'created_at', 'my_story', 'project_showcase', 'skills_acquired', 'profile_images']
+        expandable_fields = ['profile_images']
+        method_field_sources = {'photo_url': ['photo']}
         
     def get_photo_url(self, obj):
         return obj.photo.url if obj.photo else None
 
-class AboutINSASerializer(serializers.ModelSerializer):
+class TraineeSuccessStoryListSerializer(TraineeSuccessStorySerializer):
+    class Meta(TraineeSuccessStorySerializer.Meta):
+        fields = ['id', 'name', 'photo_url', 'photo_srcset', 'achievement', 'department', 'department_name', 'graduation_year', 'current_position', 'profile_images']
+
+class AboutINSASerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     logo_url = serializers.SerializerMethodField()
     campus_photo_url = serializers.SerializerMethodField()
     
     class Meta:
         model = AboutINSA
         fields = '__all__'
+        method_field_sources = {'logo_url': ['logo'], 'campus_photo_url': ['campus_photo']}
         
     def get_logo_url(self, obj):
         return obj.logo.url if obj.logo else None
@@ -187,17 +237,27 @@ class AboutINSASerializer(serializers.ModelSerializer):
         return obj.campus_photo.url if obj.campus_photo else None
 
 
-class LeadershipSerializer(serializers.ModelSerializer):
+class LeadershipSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     photo_url = serializers.SerializerMethodField()
+    photo_srcset = SrcsetField(source='photo')
     
     class Meta:
         model = Leadership
-        fields = ['id', 'name', 'position', 'photo_url', 'message', 'leadership_type', 'order', 'is_active', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'position', 'photo_url', 'photo_srcset', 'message', 'leadership_type', 'order', 'is_active', 'created_at', 'updated_at']
+        method_field_sources = {'photo_url': ['photo']}
     
     def get_photo_url(self, obj):
         if obj.photo:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.photo.url)
-            return obj.photo.url
+            return absolute_uri(self.context, obj.photo.url)
         return None
+
+
+class LeadershipListSerializer(LeadershipSerializer):
+    message_excerpt = serializers.SerializerMethodField()
+
+    class Meta(LeadershipSerializer.Meta):
+        fields = ['id', 'name', 'position', 'photo_url', 'photo_srcset', 'message_excerpt', 'leadership_type', 'order']
+        method_field_sources = {**LeadershipSerializer.Meta.method_field_sources, 'message_excerpt': ['message']}
+
+    def get_message_excerpt(self, obj):
+        return Truncator(obj.message).chars(MESSAGE_EXCERPT_LENGTH)
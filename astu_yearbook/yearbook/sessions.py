@@ -0,0 +1,65 @@
+# yearbook/sessions.py
+"""
+Session expiry without a database write per request.
+
+With SESSION_SAVE_EVERY_REQUEST = False Django only saves a session when it
+changes, so an active user's session would expire SESSION_COOKIE_AGE after
+login. SessionRefreshMiddleware extends it at most once per
+SESSION_REFRESH_INTERVAL instead, and requests that carry a session remove
+expired sessions at most once per SESSION_SWEEP_INTERVAL across all workers.
+"""
+
+import logging
+import time
+from importlib import import_module
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('security')
+
+REFRESHED_AT_KEY = '_refreshed_at'
+SWEEP_LOCK_KEY = 'yearbook:session-sweep'
+
+
+def clear_expired_sessions():
+    """Delete expired sessions from the configured session store"""
+    engine = import_module(settings.SESSION_ENGINE)
+    engine.SessionStore.clear_expired()
+
+
+class SessionRefreshMiddleware:
+    """
+    Coarse-grained sliding session expiry; must come after SessionMiddleware
+    so it runs before the session is saved on the way out
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        session = getattr(request, 'session', None)
+        # Loading an unknown or expired session key resets it, never resurrect those
+        if session is not None and session.session_key and not session.is_empty():
+            now = int(time.time())
+            interval = getattr(settings, 'SESSION_REFRESH_INTERVAL', 300)
+            refreshed_at = session.get(REFRESHED_AT_KEY, 0)
+            if now - refreshed_at >= interval:
+                # Marks the session modified, SessionMiddleware saves it with a new expiry
+                session[REFRESHED_AT_KEY] = now
+            # Piggyback on session traffic, anonymous API requests never pay for the sweep
+            self.sweep_expired_sessions()
+
+        return response
+
+    @staticmethod
+    def sweep_expired_sessions():
+        sweep_interval = getattr(settings, 'SESSION_SWEEP_INTERVAL', 3600)
+        if not sweep_interval:
+            return
+        # Only the worker that wins the lock sweeps, the others skip until it expires
+        if cache.add(SWEEP_LOCK_KEY, 1, sweep_interval):
+            try:
+                clear_expired_sessions()
+            except Exception as e:
+                logger.error(f'Expired session sweep failed: {e}')
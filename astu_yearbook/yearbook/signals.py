@@ -1,59 +1,157 @@
 # yearbook/signals.py
-from django.db.models.signals import post_save, post_init
-from django.dispatch import receiver
-from django.conf import settings
 import os
-from .models import Student
-from .certificate_generator import CertificateGenerator
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+from .models import Department, Student
+from .certificate_service import get_certificate_service
+from .response_cache import bump_versions
+from .search import install_search_indexes
+from .autocomplete import get_name_index, record_deletion, record_department_rename
+from .counters import (
+    COUNTERS,
+    remember_counted_keys,
+    update_counters_on_delete,
+    update_counters_on_save,
+)
+from .images import (
+    DERIVATIVE_FORMATS,
+    DERIVATIVE_WIDTHS,
+    IMAGE_FIELDS,
+    derivative_name,
+    release_derivatives,
+    schedule_derivatives,
+)
 
 
 @receiver(post_save, sender=Student)
-def generate_student_certificate(sender, instance, created, **kwargs):
+def generate_student_certificate(sender, instance, created, raw=False, **kwargs):
     """
-    Automatically generate certificate when a student is created or updated
+    Queue a certificate render when a student is created or a field drawn on the certificate changes.
+    Rendering happens in `manage.py run_certificate_worker`, never inside the save.
     """
-    try:
-        generator = CertificateGenerator()
-        
-        # Generate certificate for the student
-        certificate_path = generator.generate_certificate(
-            student_id=instance.student_id,
-            student_name=instance.name,
-            department=instance.department.name if instance.department else "General",
-            graduation_year=2024
-        )
-        
-        if certificate_path:
-            print(f"✅ Certificate generated for {instance.name} (ID: {instance.student_id})")
-            print(f"📄 Certificate saved at: {certificate_path}")
-        else:
-            print(f"❌ Failed to generate certificate for {instance.name} (ID: {instance.student_id})")
-            
-    except Exception as e:
-        print(f"❌ Error generating certificate for {instance.name}: {str(e)}")
-        import traceback
-        traceback.print_exc()
-
-
-@receiver(post_init, sender=Student)
-def check_existing_certificate(sender, instance, **kwargs):
-    """
-    Check if certificate exists when student is loaded
-    """
-    try:
-        if instance.student_id:  # Only check if student_id exists
-            generator = CertificateGenerator()
-            filename = f"{instance.student_id}_{instance.name.replace(' ', '_')}_certificate.png"
-            file_path = os.path.join(generator.output_dir, filename)
-            
-            # Store certificate status as instance attribute
-            instance._certificate_exists = os.path.exists(file_path)
-            instance._certificate_path = f"certificates/generated/{filename}" if instance._certificate_exists else None
-            
-    except Exception as e:
-        # If there's an error, assume certificate doesn't exist
-        instance._certificate_exists = False
-        instance._certificate_path = None
+    if raw:
+        return
+    if not created and not instance.certificate_fields_changed():
+        # e.g. toggling is_featured from the admin list page
+        return
+    
+    student_pk = instance.pk
+    transaction.on_commit(lambda: get_certificate_service().request_renders([student_pk]))
+
+
+def queue_image_derivatives(sender, instance, raw=False, **kwargs):
+    """Generate responsive derivatives for newly uploaded images once the upload is committed"""
+    if raw:
+        return
+    names = [
+        getattr(instance, field).name
+        for field in IMAGE_FIELDS[sender._meta.label]
+        if getattr(instance, field)
+    ]
+    # Derivative names are derived from the upload name, a missing first derivative means a new upload
+    names = [
+        name for name in names
+        if not os.path.exists(os.path.join(settings.MEDIA_ROOT, derivative_name(name, DERIVATIVE_WIDTHS[0], DERIVATIVE_FORMATS[-1])))
+    ]
+    if names:
+        transaction.on_commit(lambda: schedule_derivatives(names))
+
+
+def remember_stored_images(sender, instance, raw=False, update_fields=None, **kwargs):
+    """pre_save: record the stored image names before an upload replaces them"""
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    fields = [field for field in IMAGE_FIELDS[sender._meta.label] if update_fields is None or field in update_fields]
+    if fields:
+        instance._stored_images = sender._base_manager.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+def release_replaced_images(sender, instance, raw=False, **kwargs):
+    """Delete the derivatives of replaced images once the new ones are committed"""
+    previous = instance.__dict__.pop('_stored_images', None)
+    if raw or not previous:
+        return
+    replaced = [name for field, name in previous.items() if name and name != getattr(instance, field).name]
+    if replaced:
+        transaction.on_commit(lambda: release_derivatives(replaced))
+
+
+def release_deleted_images(sender, instance, **kwargs):
+    names = [getattr(instance, field).name for field in IMAGE_FIELDS[sender._meta.label] if getattr(instance, field)]
+    if names:
+        transaction.on_commit(lambda: release_derivatives(names))
+
+
+for label in IMAGE_FIELDS:
+    model = apps.get_model(label)
+    post_save.connect(queue_image_derivatives, sender=model, dispatch_uid=f'image_derivatives_{label}')
+    pre_save.connect(remember_stored_images, sender=model, dispatch_uid=f'image_derivatives_pre_save_{label}')
+    post_save.connect(release_replaced_images, sender=model, dispatch_uid=f'image_derivatives_release_{label}')
+    post_delete.connect(release_deleted_images, sender=model, dispatch_uid=f'image_derivatives_delete_{label}')
+
+
+def invalidate_response_cache(sender, **kwargs):
+    """Replace the cache version of a changed yearbook model once the change is visible to readers"""
+    label = sender._meta.label
+    transaction.on_commit(lambda: bump_versions([label]))
+
+
+# Connected per model: a receiver without a sender would disable fast deletes for every model
+for model in apps.get_app_config('yearbook').get_models():
+    post_save.connect(invalidate_response_cache, sender=model, dispatch_uid=f'response_cache_{model._meta.label}')
+    post_delete.connect(invalidate_response_cache, sender=model, dispatch_uid=f'response_cache_delete_{model._meta.label}')
+
+
+for label in {counter[0] for counter in COUNTERS}:
+    model = apps.get_model(label)
+    pre_save.connect(remember_counted_keys, sender=model, dispatch_uid=f'counters_pre_save_{label}')
+    post_save.connect(update_counters_on_save, sender=model, dispatch_uid=f'counters_{label}')
+    post_delete.connect(update_counters_on_delete, sender=model, dispatch_uid=f'counters_delete_{label}')
+
+
+@receiver(post_save, sender=Student, dispatch_uid='autocomplete_index_save')
+def update_name_index(sender, instance, raw=False, **kwargs):
+    """Keep this process's autocomplete index current without waiting for the next sync"""
+    if not raw:
+        transaction.on_commit(lambda: get_name_index().update(instance))
+
+
+@receiver(post_delete, sender=Student, dispatch_uid='autocomplete_index_delete')
+def remove_from_name_index(sender, instance, **kwargs):
+    pk = instance.pk
+
+    def forget():
+        get_name_index().remove(pk)
+        record_deletion(pk)
+    transaction.on_commit(forget)
+
+
+@receiver(pre_save, sender=Department, dispatch_uid='autocomplete_department_pre_save')
+def remember_department_name(sender, instance, raw=False, update_fields=None, **kwargs):
+    """pre_save: record the name the autocomplete indexes show before it changes"""
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and 'name' not in update_fields:
+        return
+    instance._indexed_name = sender._base_manager.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Department, dispatch_uid='autocomplete_department_rename')
+def reindex_renamed_department(sender, instance, created, raw=False, **kwargs):
+    """Every index shows department names, a rename rebuilds them on their next lookup"""
+    previous = instance.__dict__.pop('_indexed_name', None)
+    if not raw and not created and previous is not None and previous != instance.name:
+        transaction.on_commit(record_department_rename)
+
 
+def reinstall_search_indexes(sender, using, plan=None, **kwargs):
+    """SQLite drops the FTS triggers when a migration rebuilds a table, put them back"""
+    if plan and any(migration.app_label == 'yearbook' and not backwards for migration, backwards in plan):
+        if 'yearbook_student' in connections[using].introspection.table_names():
+            install_search_indexes(connections[using])
 
 
+post_migrate.connect(reinstall_search_indexes, sender=apps.get_app_config('yearbook'), dispatch_uid='reinstall_search_indexes')
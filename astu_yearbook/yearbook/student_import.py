@@ -0,0 +1,284 @@
+# yearbook/student_import.py
+"""
+Bulk import of a student cohort from a CSV/XLSX sheet and a ZIP of photos.
+
+Rows are read and validated one at a time; valid rows are collected into
+batches that are written with one bulk_create each. Departments are resolved
+from a dictionary loaded once, IDs for rows without one are reserved as a
+block from the student ID sequence, and the photos of a batch are validated,
+stored and given their responsive derivatives in a thread pool (Pillow
+releases the GIL while decoding and encoding).
+
+bulk_create sends no post_save signals, so what the signals would have done
+per row happens once at the end: one certificate job per student, a recount
+of the department counters and a response cache invalidation. A batch that
+cannot be written stops the import; the batches before it stay imported and
+are finished the same way, and the failure is reported in the result.
+
+Columns: name, department, photo (file name inside the ZIP), quote,
+last_words, highlight_tagline, description, and optionally student_id,
+is_featured, my_story.
+"""
+
+import csv
+import io
+import logging
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from .certificate_queue import enqueue_certificates
+from .counters import recount
+from .images import delete_derivatives, generate_derivatives, schedule_derivatives
+from .models import STUDENT_ID_PATTERN, STUDENT_ID_SEQUENCE, Department, IdSequence, Student
+from .response_cache import bump_versions
+from .security import sanitize_filename, validate_image_file
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ('name', 'department', 'photo', 'quote', 'last_words', 'highlight_tagline', 'description')
+OPTIONAL_COLUMNS = ('student_id', 'is_featured', 'my_story')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'x'}
+
+
+class ImportFileError(Exception):
+    """The sheet or the photo archive cannot be read at all"""
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = []
+        self.errors = []
+        self.rows = 0
+        # (first line, last line, error) of the batch that stopped the import
+        self.failed_batch = None
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+def iter_sheet(file, filename):
+    """Yield (line number, {column: value}) from a CSV or XLSX file without loading it whole"""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.xlsx':
+        yield from _iter_xlsx(file)
+    elif ext == '.csv':
+        yield from _iter_csv(file)
+    else:
+        raise ImportFileError(f'Unsupported sheet type "{ext}", use .csv or .xlsx')
+
+
+def _iter_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    _check_columns(reader.fieldnames or [])
+    for row in reader:
+        yield reader.line_num, {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+
+
+def _iter_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError('Reading .xlsx files requires openpyxl (pip install openpyxl), or upload a .csv')
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell or '').strip().lower() for cell in next(rows, ())]
+        _check_columns(header)
+        for line, values in enumerate(rows, start=2):
+            if not any(values):
+                continue
+            yield line, {key: str(value if value is not None else '').strip() for key, value in zip(header, values) if key}
+    finally:
+        workbook.close()
+
+
+def _check_columns(header):
+    missing = [column for column in REQUIRED_COLUMNS if column not in {h.strip().lower() for h in header if h}]
+    if missing:
+        raise ImportFileError(f'Missing column(s): {", ".join(missing)}')
+
+
+class StudentImporter:
+    """
+    Import students from `sheet` (an open binary file) and the `photos` ZIP
+    (path or binary file). With dry_run=True rows are only validated; with
+    background_derivatives=True image derivatives are generated after the
+    import by the background executor instead of inside the worker pool.
+    """
+    def __init__(self, sheet, sheet_name, photos, batch_size=500, workers=4, dry_run=False, background_derivatives=False):
+        self.background_derivatives = background_derivatives
+        self.sheet = sheet
+        self.sheet_name = sheet_name
+        self.batch_size = batch_size
+        self.workers = workers
+        self.dry_run = dry_run
+        try:
+            self.archive = zipfile.ZipFile(photos)
+        except zipfile.BadZipFile:
+            raise ImportFileError('The photo archive is not a valid ZIP file')
+        # Rows refer to photos by file name, wherever they sit in the archive
+        self.photo_members = {
+            os.path.basename(info.filename).lower(): info
+            for info in self.archive.infolist()
+            if not info.is_dir() and not os.path.basename(info.filename).startswith('.')
+        }
+        self.departments = {name.lower(): pk for pk, name in Department.objects.values_list('pk', 'name')}
+        self.result = ImportResult()
+
+    def run(self):
+        batch = []
+        seen_ids = set()
+        try:
+            for line, row in iter_sheet(self.sheet, self.sheet_name):
+                self.result.rows += 1
+                student = self.build_student(line, row, seen_ids)
+                if student is None:
+                    continue
+                batch.append((line, student, row['photo']))
+                if len(batch) >= self.batch_size:
+                    if not self.try_write_batch(batch):
+                        break
+                    batch = []
+            else:
+                if batch:
+                    self.try_write_batch(batch)
+        finally:
+            self.archive.close()
+        if self.result.created and not self.dry_run:
+            self.finish()
+        return self.result
+
+    def build_student(self, line, row, seen_ids):
+        """Validate one row; returns an unsaved Student or None after recording the errors"""
+        department_pk = self.departments.get(row.get('department', '').lower())
+        if department_pk is None:
+            self.result.error(line, f'Unknown department "{row.get("department", "")}"')
+            return None
+        if row['photo'].lower() not in self.photo_members:
+            self.result.error(line, f'Photo "{row["photo"]}" not found in the archive')
+            return None
+
+        student_id = row.get('student_id', '')
+        if student_id:
+            if student_id in seen_ids:
+                self.result.error(line, f'Student ID {student_id} appears twice in the sheet')
+                return None
+            seen_ids.add(student_id)
+
+        student = Student(
+            student_id=student_id,
+            name=row['name'],
+            department_id=department_pk,
+            quote=row['quote'],
+            last_words=row['last_words'],
+            highlight_tagline=row['highlight_tagline'],
+            description=row['description'],
+            is_featured=row.get('is_featured', '').lower() in TRUE_VALUES,
+            my_story=row.get('my_story') or None,
+        )
+        try:
+            # The department was resolved above, the photo is checked when it is read
+            student.clean_fields(exclude=['department', 'photo'])
+        except ValidationError as e:
+            for field, messages in e.message_dict.items():
+                self.result.error(line, f'{field}: {" ".join(messages)}')
+            return None
+        return student
+
+    def try_write_batch(self, batch):
+        """Write one batch; on failure record it in the result and return False"""
+        try:
+            self.write_batch(batch)
+        except Exception as e:
+            logger.exception('Student import stopped at lines %s-%s', batch[0][0], batch[-1][0])
+            self.result.failed_batch = (batch[0][0], batch[-1][0], str(e))
+            for line, _, _ in batch:
+                self.result.error(line, f'Not imported, the batch failed: {e}')
+            return False
+        return True
+
+    def write_batch(self, batch):
+        explicit_ids = [student.student_id for _, student, _ in batch if student.student_id]
+        taken = set(Student.objects.filter(student_id__in=explicit_ids).values_list('student_id', flat=True))
+        pending = []
+        for line, student, photo in batch:
+            if student.student_id in taken:
+                self.result.error(line, f'Student ID {student.student_id} already exists')
+            else:
+                pending.append((line, student, photo))
+        if not pending:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            stored = list(pool.map(self.store_photo, [photo for _, _, photo in pending]))
+        students = []
+        for (line, student, _), (name, error) in zip(pending, stored):
+            if error:
+                self.result.error(line, error)
+            else:
+                student.photo = name
+                students.append(student)
+        if self.dry_run or not students:
+            self.result.created.extend(students)
+            return
+
+        try:
+            with transaction.atomic():
+                # One block of IDs for the batch instead of one sequence update per row
+                missing = [student for student in students if not student.student_id]
+                if missing:
+                    for student, student_id in zip(missing, Student.allocate_student_ids(len(missing))):
+                        student.student_id = student_id
+                numbers = [int(m.group(1)) for m in (STUDENT_ID_PATTERN.fullmatch(s.student_id) for s in students) if m]
+                if numbers:
+                    IdSequence.advance_past(STUDENT_ID_SEQUENCE, max(numbers))
+                self.result.created.extend(Student.objects.bulk_create(students))
+        except Exception:
+            # Nothing references the stored photos of a failed batch
+            for student in students:
+                default_storage.delete(student.photo.name)
+                delete_derivatives(student.photo.name)
+            raise
+
+    def store_photo(self, photo):
+        """Validate and store one photo from the archive; returns (stored name, error)"""
+        info = self.photo_members[photo.lower()]
+        # Checked before decompressing, a small archive can expand to gigabytes
+        if info.file_size > settings.MAX_UPLOAD_SIZE:
+            return None, f'Photo "{photo}": larger than the {settings.MAX_UPLOAD_SIZE // (1024 * 1024)}MB upload limit'
+        try:
+            with self.archive.open(info) as member:
+                # zipfile stops at the size the entry declares
+                content = ContentFile(member.read(settings.MAX_UPLOAD_SIZE + 1), name=sanitize_filename(os.path.basename(info.filename)))
+            validate_image_file(content)
+            if self.dry_run:
+                return content.name, None
+            upload_name = Student._meta.get_field('photo').generate_filename(None, content.name)
+            name = default_storage.save(upload_name, content)
+        except ValidationError as e:
+            return None, f'Photo "{photo}": {" ".join(e.messages)}'
+        except Exception as e:
+            return None, f'Photo "{photo}": {e}'
+        if self.background_derivatives:
+            return name, None
+        try:
+            generate_derivatives(name)
+        except Exception:
+            # Derivatives can be regenerated with manage.py generate_image_derivatives
+            logger.exception('Generating derivatives for %s failed', name)
+        return name, None
+
+    def finish(self):
+        """What the skipped post_save signals would have done, once for the whole import"""
+        enqueue_certificates([student.pk for student in self.result.created])
+        recount(['yearbook.Department'])
+        transaction.on_commit(lambda: bump_versions(['yearbook.Student']))
+        if self.background_derivatives:
+            names = [student.photo.name for student in self.result.created]
+            transaction.on_commit(lambda: schedule_derivatives(names))
@@ -1,3 +1,1064 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import tempfile
+import time
+import zipfile
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+from .models import (
+    AboutINSA,
+    CertificateJob,
+    CyberTalentDirectorMessage,
+    Department,
+    DirectorGeneralMessage,
+    IdSequence,
+    FacultyTribute,
+    Leadership,
+    MemoryBoard,
+    MemoryCategory,
+    ProfileImage,
+    Student,
+    TraineeSuccessStory,
+)
+from .autocomplete import StudentNameIndex, autocomplete, record_deletion
+from .certificate_generator import EAGER_RENDITIONS, CertificateGenerator, CertificateRenderer
+from .certificate_queue import claim_jobs, enqueue_certificates, fail_job, requeue_stale_jobs
+from .certificate_service import CertificateService, get_certificate_service
+from .images import DERIVATIVE_FORMATS, DERIVATIVE_WIDTHS, derivative_names, generate_derivatives
+from .media_transform import LOW_WATERMARK, TransformCache, transform_url
+from .querycount import QueryRecorder
+from .response_cache import bump_versions
+from .student_import import StudentImporter
+from .throttling import LocalWindowStore
+from .urls import router
 
-# Create your tests here.
+
+class StudentListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(
+            name="Cyber Security",
+            cover_image="departments/default.jpg",
+            intro_message="Welcome",
+        )
+        for i in range(50):
+            Student.objects.create(
+                name=f"Student {i}",
+                department=department,
+                photo="students/default.jpg",
+                quote="Quote",
+                last_words="Last words",
+                highlight_tagline="Tagline",
+                description="Description",
+            )
+
+    def setUp(self):
+        # Start every test with an empty response cache
+        cache.clear()
+
+    def test_list_does_no_filesystem_io(self):
+        """Loading a page of students must not stat certificate files"""
+        with mock.patch('os.path.exists', wraps=os.path.exists) as exists, \
+                mock.patch('os.makedirs', wraps=os.makedirs) as makedirs:
+            response = self.client.get('/yearbook/api/students/?page_size=50')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 50)
+        self.assertEqual(exists.call_count, 0)
+        self.assertEqual(makedirs.call_count, 0)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False, REDIS_URL='')
+    def test_list_query_count_is_constant(self):
+        # count + students with departments (no ETag aggregate without a shared cache)
+        with self.assertNumQueries(2):
+            response = self.client.get('/yearbook/api/students/?page_size=50')
+        self.assertEqual(response.status_code, 200)
+        # + prefetched profile images
+        with self.assertNumQueries(3):
+            response = self.client.get('/yearbook/api/students/?page_size=50&expand=profile_images')
+        self.assertEqual(response.status_code, 200)
+
+
+class StudentIdAllocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Networks", cover_image="departments/default.jpg", intro_message="Welcome")
+
+    def create_student(self, **kwargs):
+        return Student.objects.create(
+            department=self.department,
+            photo="students/default.jpg",
+            quote="Quote",
+            last_words="Last words",
+            highlight_tagline="Tagline",
+            description="Description",
+            **{'name': "Student", **kwargs},
+        )
+
+    def test_ids_are_sequential_without_scanning_students(self):
+        first = self.create_student()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(Student.allocate_student_ids(), [f"INSA{int(first.student_id[4:]) + 1:03d}"])
+        self.assertFalse([q for q in queries if 'yearbook_student' in q['sql']])
+
+    def test_block_reservation_is_not_reused(self):
+        block = Student.allocate_student_ids(3)
+        self.assertEqual(len(set(block)), 3)
+        self.assertNotIn(self.create_student().student_id, block)
+
+    def test_hand_entered_id_advances_the_sequence(self):
+        self.create_student(student_id="INSA500")
+        self.assertEqual(self.create_student().student_id, "INSA501")
+
+    def test_missing_sequence_continues_after_existing_ids(self):
+        self.create_student(student_id="INSA041")
+        IdSequence.objects.all().delete()
+        self.assertEqual(Student.allocate_student_ids(2), ["INSA042", "INSA043"])
+
+
+class ImageDerivativeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Development", cover_image="departments/default.jpg", intro_message="Welcome")
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.media_root = media_root.name
+        # Generated explicitly below, and the cover image is not on disk
+        self.enterContext(mock.patch('yearbook.signals.schedule_derivatives'))
+
+    def upload(self, name):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new('RGB', (800, 600)).save(path)
+        generate_derivatives(name)
+        return name
+
+    def derivatives_on_disk(self, name):
+        return [
+            derivative for widths in derivative_names(name).values() for derivative in widths.values()
+            if os.path.exists(os.path.join(self.media_root, derivative))
+        ]
+
+    def create_student(self, photo):
+        return Student.objects.create(
+            name="Sara Teshome", department=self.department, photo=photo,
+            quote="Quote", last_words="Last words", highlight_tagline="Tagline", description="Description",
+        )
+
+    def test_srcset_matches_the_files_on_disk(self):
+        # Same stem, different extension: each keeps its own derivatives
+        jpeg, png = self.upload('students/sara.jpg'), self.upload('students/sara.png')
+        self.assertFalse(set(self.derivatives_on_disk(jpeg)) & set(self.derivatives_on_disk(png)))
+        student = self.create_student(jpeg)
+        srcset = self.client.get(f'/yearbook/api/students/{student.pk}/').json()['photo_srcset']
+        self.assertEqual(set(srcset), set(DERIVATIVE_FORMATS))
+        for candidates in srcset.values():
+            for candidate in candidates.split(', '):
+                url, width = candidate.split(' ')
+                relative = url.split(settings.MEDIA_URL, 1)[1]
+                self.assertTrue(os.path.exists(os.path.join(self.media_root, relative)), relative)
+                self.assertEqual(width, f"{relative.rsplit('_', 1)[1].split('w.')[0]}w")
+
+    def test_replaced_and_deleted_photos_lose_their_derivatives(self):
+        old, new, shared = (self.upload(name) for name in ('students/old.jpg', 'students/new.jpg', 'students/shared.jpg'))
+        student = self.create_student(old)
+        self.create_student(shared)
+        other = self.create_student(shared)
+        with self.captureOnCommitCallbacks(execute=True):
+            student.photo = new
+            student.save()
+            # Still the photo of another student
+            other.delete()
+        self.assertEqual(self.derivatives_on_disk(old), [])
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, old)))
+        self.assertEqual(len(self.derivatives_on_disk(shared)), len(DERIVATIVE_WIDTHS) * len(DERIVATIVE_FORMATS))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            student.delete()
+        self.assertEqual(self.derivatives_on_disk(new), [])
+
+
+class MediaTransformTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.media_root = media_root.name
+        os.makedirs(os.path.join(media_root.name, 'students'))
+        Image.new('RGB', (800, 600), 'white').save(os.path.join(media_root.name, 'students', 'sara.jpg'))
+        # The process-wide cache is rooted in the real MEDIA_ROOT otherwise
+        self.cache = TransformCache()
+        self.enterContext(mock.patch('yearbook.media_transform._cache', self.cache))
+
+    def test_unsigned_tampered_and_escaping_urls_are_rejected(self):
+        url = transform_url('students/sara.jpg', width=320)
+        with self.assertLogs('django.security', 'WARNING') as logs:
+            for tampered in (
+                url.replace('w=320', 'w=640'),
+                url.replace('students%2Fsara.jpg', 'students%2Fother.jpg'),
+                url.split('&sig=')[0],
+            ):
+                self.assertEqual(self.client.get(tampered).status_code, 403, tampered)
+            self.assertEqual(self.client.get(transform_url('../settings.py', width=320)).status_code, 404)
+        self.assertEqual(sum('invalid_transform_signature' in line for line in logs.output), 3)
+        self.assertEqual(self.client.get(transform_url('students/missing.jpg', width=320)).status_code, 404)
+        self.assertFalse(os.path.isdir(self.cache.root))
+
+    def test_second_request_is_served_from_the_cache(self):
+        url = transform_url('students/sara.jpg', width=320, fmt='png')
+        with mock.patch.object(TransformCache, '_render', autospec=True, side_effect=TransformCache._render) as render:
+            first = self.client.get(url)
+            second = self.client.get(url)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(first['Content-Type'], 'image/png')
+        with Image.open(io.BytesIO(b''.join(second.streaming_content))) as variant:
+            self.assertEqual(variant.size, (320, 240))
+
+    def test_least_recently_used_variants_are_evicted_to_the_watermark(self):
+        widths = (100, 200, 300, 400, 500)
+        paths = []
+        for age, width in enumerate(reversed(widths)):
+            path = os.path.join(self.media_root, self.cache.get('students/sara.jpg', width, None, 'contain', 'png'))
+            # Oldest first: the widest variant was used longest ago
+            os.utime(path, (time.time() - 1000 + age, time.time() - 1000 + age))
+            paths.append(path)
+        sizes = [os.path.getsize(path) for path in paths]
+        # Room for all but the two oldest once down to the watermark
+        self.cache.max_bytes = int(sum(sizes[1:]) / LOW_WATERMARK)
+
+        removed, freed = self.cache.evict()
+        self.assertEqual((removed, freed), (2, sizes[0] + sizes[1]))
+        self.assertEqual([os.path.exists(path) for path in paths], [False, False, True, True, True])
+        self.assertLessEqual(self.cache.usage(), self.cache.max_bytes * LOW_WATERMARK)
+
+
+class CertificateMediaMixin:
+    """A temporary MEDIA_ROOT holding a small certificate template"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.media_root = media_root.name
+        os.makedirs(os.path.join(media_root.name, 'certificates'))
+        Image.new('RGB', (1200, 850), 'white').save(os.path.join(media_root.name, 'certificates', 'insa_summercamp_certeficate.png'))
+        # The service and the renderer keep the template of the real MEDIA_ROOT otherwise
+        self.enterContext(mock.patch('yearbook.certificate_service._service', None))
+        self.addCleanup(CertificateRenderer.clear_cache)
+
+    def media_path(self, name):
+        return os.path.join(self.media_root, name)
+
+
+class CertificateKeyTests(CertificateMediaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Development", cover_image="departments/default.jpg", intro_message="Welcome")
+        cls.student = Student.objects.create(
+            name="Sara Teshome", department=department, photo="students/default.jpg",
+            quote="Quote", last_words="Last words", highlight_tagline="Tagline", description="Description",
+        )
+
+    def test_key_changes_with_the_drawn_fields_only(self):
+        generator = CertificateGenerator()
+        key = generator.certificate_key("INSA001", "Sara Teshome")
+        self.assertEqual(generator.certificate_key("INSA001", "Sara Teshome"), key)
+        for student_id, name in (("INSA002", "Sara Teshome"), ("INSA001", "Sara T. Alemu")):
+            other = generator.certificate_key(student_id, name)
+            self.assertNotEqual(other, key)
+            self.assertNotEqual(generator.certificate_path(student_id, other), generator.certificate_path("INSA001", key))
+
+    def test_only_a_drawn_field_change_makes_the_certificate_stale(self):
+        service = get_certificate_service()
+        path = service.render(self.student)
+        self.student.quote = "A new quote"
+        self.student.save()
+        student = Student.objects.get(pk=self.student.pk)
+        self.assertEqual(student.certificate_path, path)
+        self.assertTrue(service.is_current(student))
+
+        student.name = "Sara T. Alemu"
+        student.save()
+        student.refresh_from_db()
+        self.assertEqual(student.certificate_path, "")
+        self.assertNotEqual(service.render(student), path)
+
+    def test_gc_deletes_only_old_orphans(self):
+        service = get_certificate_service()
+        old_path = service.render(self.student)
+        self.student.name = "Sara T. Alemu"
+        self.student.save()
+        current_path = service.render(self.student)
+        generated = self.media_path('certificates/generated')
+        old_stem = os.path.splitext(os.path.basename(old_path))[0]
+        # The superseded certificate and its renditions, plus an orphan still inside the grace period
+        open(os.path.join(generated, 'INSA999_0123456789abcdef.png'), 'wb').close()
+        an_hour_ago = time.time() - 7200
+        for name in os.listdir(generated):
+            if name.startswith(old_stem):
+                os.utime(os.path.join(generated, name), (an_hour_ago, an_hour_ago))
+        old_files = sorted(name for name in os.listdir(generated) if name.startswith(old_stem))
+        self.assertEqual(len(old_files), 1 + len(EAGER_RENDITIONS))
+
+        out = io.StringIO()
+        call_command('gc_certificates', '--dry-run', stdout=out)
+        *listed, summary = out.getvalue().splitlines()
+        self.assertEqual(sorted(line.removeprefix('Would delete ') for line in listed), old_files)
+        self.assertTrue(summary.startswith(f'Would delete {len(old_files)} orphaned'))
+        self.assertTrue(all(os.path.exists(os.path.join(generated, name)) for name in old_files))
+
+        call_command('gc_certificates', stdout=io.StringIO())
+        remaining = os.listdir(generated)
+        self.assertFalse(any(name.startswith(old_stem) for name in remaining))
+        self.assertIn('INSA999_0123456789abcdef.png', remaining)
+        self.assertTrue(os.path.exists(self.media_path(current_path)))
+
+
+class CertificateDeliveryTests(CertificateMediaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Development", cover_image="departments/default.jpg", intro_message="Welcome")
+        cls.student = Student.objects.create(
+            name="Sara Teshome", department=department, photo="students/default.jpg",
+            quote="Quote", last_words="Last words", highlight_tagline="Tagline", description="Description",
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.url = f'/yearbook/api/students/{self.student.pk}/certificate/'
+
+    def test_conditional_requests_get_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/png'))
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'\x89PNG'))
+        self.student.refresh_from_db()
+        self.assertEqual(response['ETag'], f'"{self.student.certificate_key}-full-png"')
+        self.assertEqual(response['Last-Modified'], http_date(self.student.certificate_generated_at.timestamp()))
+
+        for header, value in (('HTTP_IF_NONE_MATCH', response['ETag']), ('HTTP_IF_MODIFIED_SINCE', response['Last-Modified'])):
+            not_modified = self.client.get(self.url, **{header: value})
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_renditions_have_their_content_type(self):
+        for params, content_type in (
+            ({'size': 'preview', 'format': 'webp'}, 'image/webp'),
+            ({'size': 'thumbnail', 'format': 'jpeg'}, 'image/jpeg'),
+            ({'size': 'full', 'format': 'pdf'}, 'application/pdf'),
+            ({'size': 'preview'}, 'image/jpeg'),
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual((response.status_code, response['Content-Type']), (200, content_type), params)
+
+    def test_unsupported_rendition_is_rejected(self):
+        for params in ({'size': 'full', 'format': 'webp'}, {'size': 'poster'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('renditions', response.json())
+
+    def test_eager_renditions_are_written_atomically_next_to_the_certificate(self):
+        with mock.patch('os.replace', wraps=os.replace) as replace:
+            path = get_certificate_service().render(self.student)
+        generator = CertificateGenerator()
+        expected = [
+            self.media_path(generator.rendition_path(self.student.student_id, self.student.certificate_key, size, fmt))
+            for size, fmt in EAGER_RENDITIONS
+        ] + [self.media_path(path)]
+        # Each file appears under its final name only once complete, the full-size PNG last
+        self.assertEqual([call.args[1] for call in replace.call_args_list], expected)
+        self.assertTrue(all(call.args[0].endswith('.tmp') for call in replace.call_args_list))
+        self.assertEqual({os.path.dirname(name) for name in expected}, {self.media_path('certificates/generated')})
+        self.assertTrue(all(os.path.exists(name) for name in expected))
+
+    @override_settings(MEDIA_DELIVERY='nginx')
+    def test_nginx_streams_the_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.student.refresh_from_db()
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.student.certificate_path}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+
+class CertificateExportTests(CertificateMediaMixin, TestCase):
+    url = '/yearbook/api/students/certificates/export/'
+
+    @classmethod
+    def setUpTestData(cls):
+        common = dict(photo="students/default.jpg", quote="Quote", last_words="Last words", highlight_tagline="Tagline", description="Description")
+        development, networks = (
+            Department.objects.create(name=name, cover_image="departments/default.jpg", intro_message="Welcome")
+            for name in ("Development", "Networks")
+        )
+        cls.sara = Student.objects.create(name="Sara Teshome", department=development, **common)
+        cls.abel = Student.objects.create(name="Abel Tesfaye", department=networks, **common)
+        cls.michael = Student.objects.create(name="Michael Abebe", department=networks, **common)
+        cls.staff = User.objects.create_user(username="staff", password=None, is_staff=True)
+        cls.user = User.objects.create_user(username="visitor", password=None)
+
+    def test_streams_a_zip_per_department_with_an_error_list(self):
+        render = CertificateService.get_rendition_path
+
+        def fail_for_michael(service, student, size='full', fmt='png'):
+            return None if student.pk == self.michael.pk else render(service, student, size, fmt)
+
+        self.client.force_login(self.staff)
+        with mock.patch.object(CertificateService, 'get_rendition_path', autospec=True, side_effect=fail_for_michael):
+            response = self.client.get(self.url)
+            data = b''.join(response.streaming_content)
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'application/zip'))
+
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), [
+                f'Development/{self.sara.student_id}_certificate.png',
+                f'Networks/{self.abel.student_id}_certificate.png',
+                'errors.txt',
+            ])
+            errors = archive.read('errors.txt').decode()
+        self.assertIn(f'{self.michael.student_id}\tMichael Abebe', errors)
+        self.assertNotIn(self.abel.student_id, errors)
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class CertificateQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Development", cover_image="departments/default.jpg", intro_message="Welcome")
+        common = dict(department=department, photo="students/default.jpg", quote="Quote", last_words="Last words", highlight_tagline="Tagline", description="Description")
+        cls.students = [Student.objects.create(name=f"Student {i}", **common) for i in range(2)]
+
+    def test_enqueue_keeps_one_pending_job_per_student(self):
+        pks = [student.pk for student in self.students]
+        enqueue_certificates(pks)
+        enqueue_certificates(pks)
+        self.assertEqual(CertificateJob.objects.filter(status='PENDING').count(), 2)
+        # A running render does not hold back a request made after it started
+        claim_jobs(1)
+        enqueue_certificates(pks)
+        self.assertEqual(CertificateJob.objects.filter(status='PENDING').count(), 2)
+        self.assertEqual(CertificateJob.objects.count(), 3)
+
+    def test_claimed_job_is_not_handed_out_twice(self):
+        enqueue_certificates([student.pk for student in self.students])
+        jobs = list(CertificateJob.objects.values_list('pk', flat=True))
+        filter_jobs = CertificateJob.objects.filter
+
+        def rival_claims_first_candidate(*args, **kwargs):
+            if kwargs == {'status': 'PENDING'}:
+                # Another worker claims a job between reading the candidates and claiming them
+                filter_jobs(pk=jobs[0]).update(status='RUNNING')
+                return filter_jobs(pk__in=jobs)
+            return filter_jobs(*args, **kwargs)
+
+        with mock.patch.object(CertificateJob.objects, 'filter', side_effect=rival_claims_first_candidate):
+            claimed = claim_jobs(10)
+        self.assertEqual([job.pk for job in claimed], jobs[1:])
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_failed_job_is_retried_until_max_attempts(self):
+        enqueue_certificates([self.students[0].pk])
+        for attempt, status in ((1, 'PENDING'), (2, 'FAILED')):
+            job, = claim_jobs(10)
+            self.assertEqual(job.attempts, attempt)
+            fail_job(job, "Font missing", max_attempts=2)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.last_error), (status, "Font missing"))
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_retry_yields_to_a_newer_pending_request(self):
+        enqueue_certificates([self.students[0].pk])
+        job, = claim_jobs(10)
+        enqueue_certificates([self.students[0].pk])
+        fail_job(job, "Font missing", max_attempts=3)
+        self.assertFalse(CertificateJob.objects.filter(pk=job.pk).exists())
+        self.assertEqual(CertificateJob.objects.get().status, 'PENDING')
+
+    def test_stale_running_jobs_are_requeued(self):
+        enqueue_certificates([student.pk for student in self.students])
+        stale, fresh = claim_jobs(10)
+        CertificateJob.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale_jobs(older_than=1800), 1)
+        self.assertEqual(CertificateJob.objects.get(pk=stale.pk).status, 'PENDING')
+        self.assertEqual(CertificateJob.objects.get(pk=fresh.pk).status, 'RUNNING')
+
+
+class StudentImportTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        Department.objects.create(name="Cyber Security", cover_image="departments/default.jpg", intro_message="Welcome")
+
+    def build_files(self, rows):
+        from PIL import Image
+        photos = io.BytesIO()
+        with zipfile.ZipFile(photos, 'w') as archive:
+            for name in {row[2] for row in rows}:
+                image = io.BytesIO()
+                Image.new('RGB', (40, 50)).save(image, 'JPEG')
+                archive.writestr(f'cohort/{name}', image.getvalue())
+        sheet = io.StringIO()
+        writer = csv.writer(sheet)
+        writer.writerow(['name', 'department', 'photo', 'quote', 'last_words', 'highlight_tagline', 'description'])
+        for row in rows:
+            writer.writerow([*row, 'Quote', 'Last words', 'Tagline', 'Description'])
+        return io.BytesIO(sheet.getvalue().encode()), photos
+
+    def test_import_creates_students_in_batches_and_reports_bad_rows(self):
+        rows = [(f"Student {i}", "Cyber Security", f"{i}.jpg") for i in range(5)]
+        rows.append(("Lost", "Unknown", "0.jpg"))
+        sheet, photos = self.build_files(rows)
+        result = StudentImporter(sheet, 'cohort.csv', photos, batch_size=2, background_derivatives=True).run()
+
+        self.assertEqual((result.rows, len(result.created)), (6, 5))
+        self.assertEqual(result.errors, [(7, 'Unknown department "Unknown"')])
+        self.assertEqual(len({student.student_id for student in result.created}), 5)
+        self.assertEqual(Department.objects.get().student_count, 5)
+        self.assertEqual(CertificateJob.objects.count(), 5)
+        self.assertTrue(all(os.path.exists(student.photo.path) for student in result.created))
+
+    def test_oversized_archive_member_is_rejected_before_decompressing(self):
+        sheet, _ = self.build_files([("Bomb", "Cyber Security", "bomb.jpg")])
+        photos = io.BytesIO()
+        with zipfile.ZipFile(photos, 'w', zipfile.ZIP_DEFLATED) as archive:
+            # A few KB compressed
+            archive.writestr('bomb.jpg', bytes(6 * 1024 * 1024))
+        with mock.patch.object(zipfile.ZipFile, 'open') as open_member:
+            result = StudentImporter(sheet, 'cohort.csv', photos).run()
+        open_member.assert_not_called()
+        self.assertEqual(result.errors, [(2, 'Photo "bomb.jpg": larger than the 5MB upload limit')])
+
+    def test_failed_batch_stops_the_import_and_finishes_the_written_ones(self):
+        sheet, photos = self.build_files([(f"Student {i}", "Cyber Security", f"{i}.jpg") for i in range(5)])
+        bulk_create = Student.objects.bulk_create
+        calls = []
+
+        def fail_second_batch(students):
+            calls.append(students)
+            if len(calls) == 2:
+                raise OSError("disk full")
+            return bulk_create(students)
+
+        with mock.patch.object(Student.objects, 'bulk_create', side_effect=fail_second_batch), \
+                self.assertLogs('yearbook.student_import', 'ERROR'):
+            result = StudentImporter(sheet, 'cohort.csv', photos, batch_size=2, background_derivatives=True).run()
+
+        self.assertEqual(result.failed_batch, (4, 5, "disk full"))
+        self.assertEqual([line for line, _ in result.errors], [4, 5])
+        # The last row was never read
+        self.assertEqual((result.rows, len(result.created)), (4, 2))
+        self.assertEqual(Department.objects.get().student_count, 2)
+        self.assertEqual(CertificateJob.objects.count(), 2)
+        self.assertFalse(any(default_storage.exists(student.photo.name) for student in calls[1]))
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.development = Department.objects.create(name="Development", cover_image="departments/default.jpg", intro_message="Welcome")
+        cls.cyber = Department.objects.create(name="Cyber Security", cover_image="departments/default.jpg", intro_message="Welcome")
+        cls.gaming = MemoryCategory.objects.create(name="Gaming", icon="🎮")
+        cls.sports = MemoryCategory.objects.create(name="Sports", icon="⚽")
+
+    def create_student(self, department):
+        return Student.objects.create(
+            name="Sara Teshome", department=department, photo="students/default.jpg",
+            quote="Quote", last_words="Last words", highlight_tagline="Tagline", description="Description",
+        )
+
+    def assertCounts(self, students, memories):
+        self.assertEqual([d.student_count for d in Department.objects.order_by('pk')], students)
+        self.assertEqual([c.memory_count for c in MemoryCategory.objects.order_by('pk')], memories)
+
+    def test_counters_follow_create_reassign_and_delete(self):
+        first, second = self.create_student(self.development), self.create_student(self.development)
+        memory = MemoryBoard.objects.create(title="Memory", photo="memories/default.jpg", caption="Caption", category=self.gaming)
+        self.assertCounts([2, 0], [1, 0])
+
+        second.department = self.cyber
+        second.save()
+        memory.category = self.sports
+        memory.save(update_fields=['category'])
+        self.assertCounts([1, 1], [0, 1])
+
+        # Saves that leave the foreign key alone do not move the row
+        first.quote = "Another quote"
+        first.save(update_fields=['quote'])
+        memory.category = None
+        memory.save()
+        self.assertCounts([1, 1], [0, 0])
+
+        first.delete()
+        second.delete()
+        memory.delete()
+        self.assertCounts([0, 0], [0, 0])
+
+    def test_counters_never_go_negative(self):
+        student = self.create_student(self.development)
+        Department.objects.update(student_count=0)
+        student.delete()
+        self.assertCounts([0, 0], [0, 0])
+
+    def test_recount_repairs_drift(self):
+        self.create_student(self.development)
+        self.create_student(self.cyber)
+        MemoryBoard.objects.create(title="Memory", photo="memories/default.jpg", caption="Caption", category=self.gaming)
+        # Bulk writes send no signals
+        Department.objects.filter(pk=self.development.pk).update(student_count=7)
+        MemoryCategory.objects.update(memory_count=3)
+
+        out = io.StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn('yearbook.Department: 1 counter(s) corrected', out.getvalue())
+        self.assertIn('yearbook.MemoryCategory: 2 counter(s) corrected', out.getvalue())
+        self.assertCounts([1, 1], [1, 0])
+
+        out = io.StringIO()
+        call_command('recount', '--model', 'yearbook.Department', stdout=out)
+        self.assertIn('yearbook.Department: 0 counter(s) corrected', out.getvalue())
+        self.assertNotIn('MemoryCategory', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('recount', '--model', 'yearbook.Student')
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Development", cover_image="departments/default.jpg", intro_message="Welcome")
+        cls.student = Student.objects.create(
+            name="Sara Teshome", department=department, photo="students/default.jpg",
+            quote="Quote", last_words="Last words", highlight_tagline="Tagline", description="Description",
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_second_request_is_a_hit(self):
+        self.assertEqual(self.get('/yearbook/api/students/')['X-Cache'], 'MISS')
+        self.assertTrue(self.get('/yearbook/api/students/')['X-Cache'].startswith('HIT'))
+
+    def test_save_invalidates_list_and_detail(self):
+        detail = f'/yearbook/api/students/{self.student.pk}/'
+        for url in ('/yearbook/api/students/', detail):
+            self.get(url)
+        self.student.quote = "New quote"
+        # The photo is not on disk, no derivatives
+        with mock.patch('yearbook.signals.schedule_derivatives'), self.captureOnCommitCallbacks(execute=True):
+            self.student.save()
+        response = self.get(detail)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['quote'], "New quote")
+        self.assertEqual(self.get('/yearbook/api/students/')['X-Cache'], 'MISS')
+
+    def test_bulk_update_with_bump_invalidates(self):
+        self.get('/yearbook/api/students/')
+        # QuerySet.update() sends no signals, the writer bumps the version itself
+        Student.objects.filter(pk=self.student.pk).update(is_featured=True)
+        bump_versions(['yearbook.Student'])
+        response = self.get('/yearbook/api/students/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertTrue(response.json()['results'][0]['is_featured'])
+
+
+# A fixed clock, 10s into a minute, so no request falls into the next window
+@override_settings(THROTTLE_RATES={'anon': '100/hour', 'user': '1000/hour', 'student-list': '2/minute', 'verify_certificate': '2/minute'})
+@mock.patch('yearbook.throttling.time', mock.Mock(time=lambda: 1_000_000_030.0))
+class ThrottlingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Development", cover_image="departments/default.jpg", intro_message="Welcome")
+        cls.student = Student.objects.create(
+            name="Sara Teshome", department=department, photo="students/default.jpg",
+            quote="Quote", last_words="Last words", highlight_tagline="Tagline", description="Description",
+        )
+
+    def setUp(self):
+        # Fresh counters per test
+        patcher = mock.patch('yearbook.throttling._store', LocalWindowStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertExhausts(self, url):
+        for remaining in ('1', '0'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual((response['X-RateLimit-Limit'], response['X-RateLimit-Remaining']), ('2', remaining))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '50')
+        self.assertEqual(response['X-RateLimit-Remaining'], '0')
+
+    def test_api_scope_is_limited(self):
+        self.assertExhausts('/yearbook/api/students/')
+        # Every other endpoint counts against its own scope
+        response = self.client.get('/yearbook/api/departments/')
+        self.assertEqual((response.status_code, response['X-RateLimit-Limit']), (200, '100'))
+
+    def test_plain_view_is_limited(self):
+        self.assertExhausts(f'/yearbook/verify/{self.student.student_id}/')
+
+
+# Validators without the response cache, from version tokens in Redis (locmem stands in for it here)
+@override_settings(RESPONSE_CACHE_ENABLED=False, REDIS_URL='redis://localhost:6379/0')
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Development", cover_image="departments/default.jpg", intro_message="Welcome")
+        cls.student = Student.objects.create(
+            name="Sara Teshome", department=cls.department, photo="students/default.jpg",
+            quote="Quote", last_words="Last words", highlight_tagline="Tagline", description="Description",
+        )
+
+    def test_malformed_id_is_not_found(self):
+        self.assertEqual(self.client.get('/yearbook/api/students/abc/').status_code, 404)
+
+    def test_related_change_invalidates_validators(self):
+        url = f'/yearbook/api/students/{self.student.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.department.name = "Software Development"
+        # The cover image is not on disk, no derivatives
+        with mock.patch('yearbook.signals.schedule_derivatives'), self.captureOnCommitCallbacks(execute=True):
+            self.department.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['department_name'], "Software Development")
+
+    def test_no_validators_without_version_tokens(self):
+        with mock.patch('yearbook.conditional.get_versions', return_value=None):
+            response = self.client.get(f'/yearbook/api/students/{self.student.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    @override_settings(REDIS_URL='')
+    def test_no_validators_without_shared_cache(self):
+        response = self.client.get(f'/yearbook/api/students/{self.student.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+
+class FullTextSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Development", cover_image="departments/default.jpg", intro_message="Welcome")
+        common = dict(department=department, photo="students/default.jpg", last_words="Last words", highlight_tagline="Tagline", description="Description")
+        cls.named = Student.objects.create(name="Alemayehu Kebede", quote="Secure code", **common)
+        cls.quoted = Student.objects.create(name="Sara Teshome", quote="Alemayehu taught me forensics", **common)
+        Student.objects.create(name="Michael Abebe", quote="Embedded systems", **common)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query):
+        response = self.client.get('/yearbook/api/students/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [student['name'] for student in response.json()['results']]
+
+    def test_matches_prefixes_ranked_by_field_weight(self):
+        self.assertEqual(self.search("alemay"), ["Alemayehu Kebede", "Sara Teshome"])
+
+    def test_index_follows_updates_that_bypass_signals(self):
+        Student.objects.filter(pk=self.quoted.pk).update(quote="Malware analysis")
+        self.assertEqual(self.search("alemayehu"), ["Alemayehu Kebede"])
+        self.assertEqual(self.search("malware"), ["Sara Teshome"])
+
+    def test_query_syntax_characters_are_ignored(self):
+        self.assertEqual(self.search('kebede*)'), ["Alemayehu Kebede"])
+        self.assertEqual(self.search('"forensics'), ["Sara Teshome"])
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Development", cover_image="departments/default.jpg", intro_message="Welcome")
+        common = dict(department=department, photo="students/default.jpg", quote="Quote", last_words="Last words", highlight_tagline="Tagline", description="Description")
+        cls.alemayehu = Student.objects.create(name="Alemayehu Kebede", student_id="INSA042", **common)
+        cls.tigist = Student.objects.create(name="Tigist Haile", **common)
+        cls.michael = Student.objects.create(name="Michael Abebe", **common)
+
+    def setUp(self):
+        cache.clear()
+        # A fresh index per test, the module-level one would outlive the test transaction
+        patcher = mock.patch('yearbook.autocomplete._index', StudentNameIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def lookup(self, query):
+        response = self.client.get('/yearbook/api/students/autocomplete/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [student['name'] for student in response.json()['results']]
+
+    def test_tolerates_transliterations_and_typos(self):
+        self.assertEqual(self.lookup("Alemayehou")[0], "Alemayehu Kebede")
+        self.assertEqual(self.lookup("tigiest hail")[0], "Tigist Haile")
+        self.assertEqual(self.lookup("kebde")[0], "Alemayehu Kebede")
+
+    def test_matches_student_id_prefix(self):
+        self.assertEqual(self.lookup("INSA04")[0], "Alemayehu Kebede")
+
+    def test_warm_lookup_runs_no_queries(self):
+        autocomplete("mich")
+        with self.assertNumQueries(0):
+            self.assertEqual(autocomplete("mich")[0]['name'], "Michael Abebe")
+
+    def test_picks_up_changes_from_other_processes(self):
+        autocomplete("tigist")
+        # A QuerySet.update() sends no signals and on_commit callbacks never run in a TestCase,
+        # as if another worker had saved and deleted the rows
+        Student.objects.filter(pk=self.tigist.pk).update(name="Tsion Haile", updated_at=timezone.now())
+        michael_pk = self.michael.pk
+        self.michael.delete()
+        record_deletion(michael_pk)
+        # Creates and deletes bump the Department token too (its counters)
+        bump_versions(['yearbook.Student', 'yearbook.Department'])
+        # Only the changed rows are read, no rebuild and no scan for deleted rows
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(autocomplete("tsion")[0]['name'], "Tsion Haile")
+        self.assertEqual(len(queries), 1)
+        self.assertIn('updated_at', queries[0]['sql'])
+        self.assertNotIn("Tigist Haile", [student['name'] for student in autocomplete("tigist")])
+        self.assertEqual(autocomplete("michael"), [])
+
+    def test_department_rename_rebuilds(self):
+        autocomplete("tigist")
+        department = self.tigist.department
+        department.name = "Software Development"
+        # The cover image is not on disk, no derivatives
+        with mock.patch('yearbook.signals.schedule_derivatives'), self.captureOnCommitCallbacks(execute=True):
+            department.save()
+        self.assertEqual(autocomplete("tigist")[0]['department_name'], "Software Development")
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        created = timezone.now()
+        for i in range(7):
+            MemoryBoard.objects.create(title=f"Memory {i}", photo="memories/default.jpg", caption="Caption")
+        # Ties on created_at are broken by id
+        MemoryBoard.objects.filter(title__in=["Memory 2", "Memory 3", "Memory 4"]).update(created_at=created)
+        cls.expected = [m.title for m in MemoryBoard.objects.order_by('-created_at', 'id')]
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_forward_and_back_without_gaps(self):
+        page = self.get('/yearbook/api/memories/', {'cursor': '', 'page_size': 3})
+        self.assertIsNone(page['previous'])
+        self.assertNotIn('count', page)
+        titles, pages = [], []
+        while True:
+            pages.append(page)
+            titles += [memory['title'] for memory in page['results']]
+            if not page['next']:
+                break
+            page = self.get(page['next'])
+        self.assertEqual(titles, self.expected)
+
+        back = self.get(pages[-1]['previous'])
+        self.assertEqual(back['results'], pages[-2]['results'])
+        self.assertEqual(back['next'], pages[-2]['next'])
+
+    def test_approximate_count_and_invalid_cursor(self):
+        page = self.get('/yearbook/api/memories/', {'cursor': '', 'total': 'approx'})
+        self.assertEqual(page['approximate_count'], 7)
+        self.assertEqual(self.client.get('/yearbook/api/memories/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+    def test_page_numbers_stay_the_default(self):
+        page = self.get('/yearbook/api/memories/', {'page_size': 3, 'page': 2})
+        self.assertEqual(page['count'], 7)
+        self.assertEqual([memory['title'] for memory in page['results']], self.expected[3:6])
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Development", cover_image="departments/default.jpg", intro_message="Welcome")
+        cls.student = Student.objects.create(
+            name="Sara Teshome", department=department, photo="students/default.jpg", quote="Quote",
+            last_words="Last words", highlight_tagline="Tagline", description="Description",
+        )
+        ProfileImage.objects.create(image="profile_images/a.jpg", caption="Lab", student=cls.student)
+
+    def get(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/yearbook/api/students/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'][0], [q['sql'] for q in queries]
+
+    def test_fields_selects_only_the_columns_it_needs(self):
+        student, queries = self.get({'fields': 'id,name,department_name'})
+        self.assertEqual(student, {'id': self.student.pk, 'name': "Sara Teshome", 'department_name': "Development"})
+        page_query = queries[-1]
+        self.assertIn('"yearbook_department"."name"', page_query)
+        self.assertNotIn('last_words', page_query)
+        self.assertNotIn('intro_message', page_query)
+
+    def test_omit_and_expand(self):
+        student, queries = self.get({'omit': 'last_words,description'})
+        self.assertNotIn('last_words', student)
+        self.assertNotIn('profile_images', student)
+        self.assertFalse(any('yearbook_profileimage' in sql for sql in queries))
+
+        student, _ = self.get({'fields': 'name,profile_images', 'expand': 'profile_images'})
+        self.assertEqual(set(student), {'name', 'profile_images'})
+        # ?fields= applies to the top-level resource only
+        self.assertEqual(student['profile_images'][0]['caption'], "Lab")
+        self.assertIn('image_url', student['profile_images'][0])
+
+    def test_writes_use_every_field(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        response = self.client.patch(
+            f'/yearbook/api/students/{self.student.pk}/?fields=name',
+            {'quote': "New quote"}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['quote'], "New quote")
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class ListRepresentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Development", cover_image="departments/default.jpg", intro_message="Welcome")
+        cls.student = Student.objects.create(
+            name="Sara Teshome", department=department, photo="students/default.jpg", quote="Quote",
+            last_words="Last words", highlight_tagline="Tagline", description="Description", my_story="Story",
+        )
+        cls.leader = Leadership.objects.create(name="Leader", position="Director", photo="leadership/a.jpg", message="Word " * 100)
+        category = MemoryCategory.objects.create(name="Gaming", icon="🎮")
+        MemoryBoard.objects.create(
+            title="Finals", photo="memories/a.jpg", caption="Caption", department=department, category=category, author_year="2024",
+        )
+
+    def test_lists_are_compact_and_details_complete(self):
+        listed = self.client.get('/yearbook/api/students/').json()['results'][0]
+        self.assertNotIn('my_story', listed)
+        self.assertNotIn('description', listed)
+        self.assertIn('photo_url', listed)
+        # Only the pages showing them ask for these
+        for field in ('certificate_url', 'last_words'):
+            self.assertNotIn(field, listed)
+        expanded = self.client.get('/yearbook/api/students/?expand=last_words,certificate_url').json()['results'][0]
+        self.assertEqual(expanded['last_words'], self.student.last_words)
+        self.assertTrue(expanded['certificate_url'].endswith(f'/yearbook/api/students/{self.student.pk}/certificate/'))
+        detail = self.client.get(f'/yearbook/api/students/{self.student.pk}/').json()
+        self.assertEqual(detail['my_story'], "Story")
+
+        leader = self.client.get('/yearbook/api/leadership/').json()['results'][0]
+        self.assertNotIn('message', leader)
+        self.assertLessEqual(len(leader['message_excerpt']), 200)
+        self.assertEqual(self.client.get(f'/yearbook/api/leadership/{self.leader.pk}/').json()['message'], self.leader.message)
+
+        # The gallery modal shows these
+        memory = self.client.get('/yearbook/api/memories/').json()['results'][0]
+        self.assertEqual((memory['category_icon'], memory['author_year']), ("🎮", "2024"))
+
+
+@override_settings(QUERY_COUNT_ENABLED=True, RESPONSE_CACHE_ENABLED=False)
+class QueryBudgetTests(TestCase):
+    """Every API endpoint stays within the query budget its viewset declares"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = [MemoryCategory.objects.create(name=f"Category {i}", order=i) for i in range(3)]
+        for d in range(3):
+            department = Department.objects.create(
+                name=f"Department {d}",
+                cover_image="departments/default.jpg",
+                intro_message="Welcome",
+            )
+            for i in range(8):
+                student = Student.objects.create(
+                    name=f"Student {d}-{i}",
+                    department=department,
+                    photo="students/default.jpg",
+                    quote="Quote",
+                    last_words="Last words",
+                    highlight_tagline="Tagline",
+                    description="Description",
+                )
+                trainee = TraineeSuccessStory.objects.create(
+                    name=f"Trainee {d}-{i}",
+                    photo="trainees/default.jpg",
+                    bio="Bio",
+                    achievement="Achievement",
+                    department=department,
+                    current_position="Analyst",
+                )
+                ProfileImage.objects.create(image="profile_images/a.jpg", student=student)
+                ProfileImage.objects.create(image="profile_images/b.jpg", trainee=trainee)
+                MemoryBoard.objects.create(
+                    title=f"Memory {d}-{i}",
+                    photo="memories/default.jpg",
+                    caption="Caption",
+                    department=department,
+                    category=categories[i % len(categories)],
+                )
+        for i in range(6):
+            FacultyTribute.objects.create(name=f"Faculty {i}", photo="faculty/default.jpg", message="Message", position="Lecturer")
+        for i in range(2):
+            DirectorGeneralMessage.objects.create(photo="leadership/dg.jpg", speech="Speech")
+            CyberTalentDirectorMessage.objects.create(photo="leadership/ctd.jpg", speech="Speech")
+        Leadership.objects.create(name="Leader", position="Director", photo="leadership/leader.jpg", message="Message")
+        AboutINSA.objects.create(pk=1, logo="about/logo.png", vision_statement="Vision", history_summary="History", campus_photo="about/campus.jpg")
+
+    def setUp(self):
+        cache.clear()
+
+    def assertWithinBudget(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertIn('X-Query-Budget', response, f'{url} has no query budget')
+        count, budget = int(response['X-Query-Count']), int(response['X-Query-Budget'])
+        self.assertLessEqual(count, budget, f'{url} ran {count} queries, budget is {budget}')
+        self.assertNotIn('X-Query-Repeated', response, f'{url} repeats a query per row (N+1)')
+        return response
+
+    def test_endpoints_stay_within_budget(self):
+        for prefix, viewset, basename in router.registry:
+            with self.subTest(endpoint=prefix):
+                data = self.assertWithinBudget(f'/yearbook/api/{prefix}/?page_size=100').json()
+                results = data['results'] if isinstance(data, dict) else data
+                self.assertTrue(results, f'{prefix} has no seeded rows')
+                self.assertWithinBudget(f'/yearbook/api/{prefix}/{results[0]["id"]}/')
+
+    def test_repeated_queries_are_reported(self):
+        with QueryRecorder() as recorder:
+            for student in Student.objects.all()[:6]:
+                list(student.profile_images.all())
+        self.assertEqual(len(recorder.repeated()), 1)
@@ -0,0 +1,203 @@
+# yearbook/throttling.py
+"""
+Rate limiting shared by every gunicorn worker.
+
+Each request costs exactly one atomic operation on the shared store: a Lua
+script on Redis implementing a sliding window counter (the current fixed
+window plus the previous one weighted by how much of it still overlaps the
+sliding window). Without Redis the same algorithm runs in process memory
+under a lock, which is exact for a single process only: every worker then
+allows the full rate, and a warning is logged when the worker starts counting.
+
+All limits live in settings.THROTTLE_RATES. A DRF view is limited by the
+'<basename>-<action>' scope when one is configured (e.g. 'student-list'),
+otherwise by 'anon' or 'user'. Plain Django views use the @throttle(scope)
+decorator. The outcome is exposed as X-RateLimit-* headers by
+RateLimitHeadersMiddleware.
+"""
+
+import functools
+import logging
+import threading
+import time
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.throttling import BaseThrottle
+from .security import SecurityMiddleware
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'yearbook:throttle:'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# KEYS[1] current window, KEYS[2] previous window
+# ARGV[1] limit, ARGV[2] window length, ARGV[3] elapsed fraction of the current window
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+local estimate = previous * (1 - tonumber(ARGV[3])) + current
+if estimate >= limit then
+    return {0, math.floor(estimate)}
+end
+current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]) * 2)
+end
+return {1, math.floor(estimate) + 1}
+"""
+
+
+def parse_rate(rate):
+    """'100/hour' or '20/m' -> (100, 3600) / (20, 60)"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0].lower()]
+
+
+class RateLimitResult:
+    def __init__(self, allowed, limit, used, reset):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = max(0, limit - used)
+        self.reset = reset
+
+    def headers(self):
+        return {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(self.remaining),
+            'X-RateLimit-Reset': str(self.reset),
+        }
+
+
+class RedisWindowStore:
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.script = get_redis_connection('default').register_script(SLIDING_WINDOW_SCRIPT)
+
+    def hit(self, current_key, previous_key, limit, window, elapsed):
+        allowed, used = self.script(keys=[current_key, previous_key], args=[limit, window, elapsed])
+        return bool(allowed), int(used)
+
+
+class LocalWindowStore:
+    """Per-process fallback when no Redis cache is configured"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.next_cleanup = 0
+
+    def hit(self, current_key, previous_key, limit, window, elapsed):
+        now = time.time()
+        with self.lock:
+            if now >= self.next_cleanup:
+                self.counters = {k: v for k, v in self.counters.items() if v[1] > now}
+                self.next_cleanup = now + 60
+            current = self.counters.get(current_key, (0, 0))[0]
+            previous = self.counters.get(previous_key, (0, 0))[0]
+            estimate = previous * (1 - elapsed) + current
+            if estimate >= limit:
+                return False, int(estimate)
+            self.counters[current_key] = (current + 1, now + window * 2)
+            return True, int(estimate) + 1
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        if 'django_redis' in settings.CACHES['default']['BACKEND']:
+            _store = RedisWindowStore()
+        else:
+            logger.warning(
+                'Rate limits are counted per process without REDIS_URL: each worker allows the full rate'
+            )
+            _store = LocalWindowStore()
+    return _store
+
+
+def check_rate(scope, ident, rate):
+    """Count one request of `ident` against `scope` and return a RateLimitResult"""
+    limit, window = parse_rate(rate)
+    now = time.time()
+    window_index = int(now // window)
+    elapsed = (now % window) / window
+    key = f'{KEY_PREFIX}{scope}:{ident}:'
+    try:
+        allowed, used = get_store().hit(f'{key}{window_index}', f'{key}{window_index - 1}', limit, window, elapsed)
+    except Exception:
+        # Never turn a store outage into an outage of the site
+        return RateLimitResult(True, limit, 0, (window_index + 1) * window)
+    return RateLimitResult(allowed, limit, used, (window_index + 1) * window)
+
+
+def get_ident(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f'ip:{SecurityMiddleware.get_client_ip(request)}'
+
+
+def _remember(request, result):
+    # Stored on the Django request so the middleware sees it for DRF and plain views alike
+    request = getattr(request, '_request', request)
+    request.rate_limit = result
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """The only DRF throttle: one scope, one store operation per request"""
+
+    def get_scope(self, request, view):
+        rates = settings.THROTTLE_RATES
+        basename = getattr(view, 'basename', None)
+        action = getattr(view, 'action', None)
+        if basename and action and f'{basename}-{action}' in rates:
+            return f'{basename}-{action}'
+        if getattr(view, 'throttle_scope', None) in rates:
+            return view.throttle_scope
+        return 'user' if request.user and request.user.is_authenticated else 'anon'
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = settings.THROTTLE_RATES.get(scope)
+        if not rate:
+            return True
+        self.result = check_rate(scope, get_ident(request), rate)
+        _remember(request, self.result)
+        return self.result.allowed
+
+    def wait(self):
+        return max(0, self.result.reset - time.time())
+
+
+def throttle(scope):
+    """Rate limit a plain Django view with the THROTTLE_RATES entry for `scope`"""
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            result = check_rate(scope, get_ident(request), settings.THROTTLE_RATES[scope])
+            _remember(request, result)
+            if not result.allowed:
+                response = HttpResponse('Too many requests', status=429, content_type='text/plain')
+                response['Retry-After'] = str(max(0, int(result.reset - time.time())))
+                return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RateLimitHeadersMiddleware:
+    """Expose the remaining quota of throttled requests as X-RateLimit-* headers"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        result = getattr(request, 'rate_limit', None)
+        if result is not None:
+            for header, value in result.headers().items():
+                response[header] = value
+        return response
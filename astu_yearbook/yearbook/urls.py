@@ -20,4 +20,5 @@ urlpatterns = [
     path('api/health/', views.health_check, name='health_check'),
     path('api/test/', views.test_endpoint, name='test_endpoint'),
     path('verify/<str:student_id>/', views.verify_certificate_view, name='verify_certificate'),
+    path('media-transform/', views.media_transform_view, name='media_transform'),
 ]
\ No newline at end of file
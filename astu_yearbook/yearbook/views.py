@@ -1,15 +1,34 @@
 # yearbook/views.py (updated with security enhancements)
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action, api_view
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from django.http import FileResponse, JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import connection
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+import logging
 import os
 from .models import *
 from .serializers import *
 from .pagination import SmallResultsPagination, LargeResultsPagination
+from .certificate_generator import (
+    CERTIFICATE_RENDITIONS,
+    DEFAULT_RENDITION_FORMATS,
+    RENDITION_CONTENT_TYPES,
+)
+from .certificate_export import iter_certificate_zip
+from .certificate_service import get_certificate_service
+from .delivery import file_response
+from .conditional import ConditionalGetMixin
+from .response_cache import CachedResponseMixin, response_cache_stats
+from .search import FullTextSearchFilter
+from .fieldsets import SparseFieldsetMixin
+from .autocomplete import autocomplete
+from .media_transform import FORMATS, TransformError, get_transform_cache, parse_transform, transform_url
 from django_filters.rest_framework import DjangoFilterBackend
 from .security import (
     sanitize_html_input, 
@@ -18,8 +37,8 @@ from .security import (
     log_security_event,
     rate_limit_api
 )
-from django_ratelimit.decorators import ratelimit
-from django.utils.decorators import method_decorator
+
+logger = logging.getLogger(__name__)
 
 # Health check endpoint for monitoring
 @api_view(['GET'])
@@ -32,6 +51,7 @@ def health_check(request):
         'status': 'healthy',
         'database': 'unknown',
         'media_storage': 'unknown',
+        'cache': 'unknown',
     }
     status_code = 200
     
@@ -56,6 +76,16 @@ def health_check(request):
         if health_status['status'] == 'healthy':
             health_status['status'] = 'degraded'
     
+    # Check the shared cache and report this worker's response cache hit rate
+    try:
+        cache.set('yearbook:health_check', 'ok', 10)
+        health_status['cache'] = 'connected' if cache.get('yearbook:health_check') == 'ok' else 'unavailable'
+        health_status['response_cache'] = response_cache_stats()
+    except Exception as e:
+        health_status['cache'] = f'error: {str(e)}'
+        if health_status['status'] == 'healthy':
+            health_status['status'] = 'degraded'
+    
     return JsonResponse(health_status, status=status_code)
 
 # Simple test endpoint to check database
@@ -82,25 +112,39 @@ def test_endpoint(request):
             'message': 'Database query failed'
         }, status=500)
 
-class DepartmentViewSet(viewsets.ModelViewSet):
-    queryset = Department.objects.all().prefetch_related('students')
+class CertificateContentNegotiation(DefaultContentNegotiation):
+    """
+    On the certificate action `?format=` selects a certificate rendition rather than
+    a DRF renderer, so always answer (errors) with the first configured renderer
+    """
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+class DepartmentViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    # student_count is stored on the department, its counter updates bump the Department version
+    cache_models = ('yearbook.Department',)
+    query_budget = {'list': 3, 'retrieve': 2}
+    queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     pagination_class = SmallResultsPagination
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
-@method_decorator(ratelimit(key='ip', rate='200/h', method='GET'), name='list')
-@method_decorator(ratelimit(key='ip', rate='50/h', method='POST'), name='create')
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    cache_models = ('yearbook.Student', 'yearbook.Department', 'yearbook.ProfileImage')
+    query_budget = {'list': 4, 'retrieve': 3, 'autocomplete': 1}
     serializer_class = StudentSerializer
+    list_serializer_class = StudentListSerializer
     pagination_class = LargeResultsPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    cursor_ordering = ('name', 'id')
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
     filterset_fields = ['department', 'is_featured']
+    # Fallback for databases without a full-text index (see yearbook/search.py)
     search_fields = ['name', 'quote', 'last_words']
     queryset = Student.objects.all()
 
     def get_queryset(self):
-        queryset = super().get_queryset().select_related('department')
+        queryset = super().get_queryset().select_related('department').prefetch_related('profile_images')
         
         # Custom filtering for featured students with validation
         is_featured = self.request.query_params.get('is_featured')
@@ -156,21 +200,38 @@ class StudentViewSet(viewsets.ModelViewSet):
         
         serializer.save()
     
-    @action(detail=True, methods=['get'])
+    def get_certificate_rendition(self):
+        """(size, format) requested with `?size=` / `?format=`, defaulting to the full-size PNG"""
+        size = self.request.query_params.get('size', 'full')
+        fmt = self.request.query_params.get('format') or DEFAULT_RENDITION_FORMATS.get(size)
+        return size, fmt
+
+    @action(detail=True, methods=['get'], content_negotiation_class=CertificateContentNegotiation)
     def certificate(self, request, pk=None):
         """
-        Generate and return certificate for a student
+        Generate and return certificate for a student.
+
+        `?size=thumbnail|preview|full` and `?format=webp|jpeg|png|pdf` select a rendition;
+        the default is the full-size PNG.
         """
+        size, fmt = self.get_certificate_rendition()
+        if (size, fmt) not in CERTIFICATE_RENDITIONS:
+            return Response(
+                {'error': 'Unsupported certificate rendition',
+                 'renditions': [f'size={s}&format={f}' for s, f in CERTIFICATE_RENDITIONS]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         student = self.get_object()
+        service = get_certificate_service()
         try:
-            certificate_path = student.get_certificate_url()
+            certificate_path = service.get_rendition_path(student, size, fmt)
             if certificate_path:
                 # Security: Validate path to prevent directory traversal
-                full_path = os.path.join(settings.MEDIA_ROOT, certificate_path)
-                full_path = os.path.abspath(full_path)
+                full_path = service.absolute_path(certificate_path)
                 
                 # Ensure the file is within MEDIA_ROOT
-                if not full_path.startswith(os.path.abspath(settings.MEDIA_ROOT)):
+                if full_path is None:
                     log_security_event('path_traversal_attempt', 
                                      f'Attempted access to: {certificate_path}', 
                                      request, 'ERROR')
@@ -180,21 +241,16 @@ class StudentViewSet(viewsets.ModelViewSet):
                     )
                 
                 if os.path.exists(full_path):
-                    # Sanitize filename
-                    safe_filename = sanitize_filename(f'{student.student_id}_certificate.png')
-                    
-                    # Open file and create proper FileResponse
-                    file_handle = open(full_path, 'rb')
-                    response = FileResponse(
-                        file_handle,
-                        content_type='image/png',
-                        filename=safe_filename
+                    # The content key changes whenever the certificate does, so it is a strong ETag
+                    suffix = '' if size == 'full' else f'_{size}'
+                    return file_response(
+                        request,
+                        certificate_path,
+                        content_type=RENDITION_CONTENT_TYPES[fmt],
+                        filename=f'{student.student_id}_certificate{suffix}{os.path.splitext(certificate_path)[1]}',
+                        etag=f'"{student.certificate_key}-{size}-{fmt}"',
+                        last_modified=student.certificate_generated_at,
                     )
-                    response['Content-Disposition'] = f'inline; filename="{safe_filename}"'
-                    response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-                    response['Pragma'] = 'no-cache'
-                    response['Expires'] = '0'
-                    return response
                 else:
                     return Response(
                         {'error': 'Certificate not found'}, 
@@ -211,25 +267,82 @@ class StudentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class FacultyTributeViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'], url_path='certificates/export',
+            permission_classes=[IsAdminUser], content_negotiation_class=CertificateContentNegotiation)
+    def export_certificates(self, request):
+        """
+        Staff only: stream a ZIP of the certificates of every student matching the
+        list filters (`?department=`, `?is_featured=`, `?search=`), rendering missing
+        ones on the fly. `?size=` / `?format=` select the rendition as on `certificate`.
+        """
+        size, fmt = self.get_certificate_rendition()
+        if (size, fmt) not in CERTIFICATE_RENDITIONS:
+            return Response(
+                {'error': 'Unsupported certificate rendition',
+                 'renditions': [f'size={s}&format={f}' for s, f in CERTIFICATE_RENDITIONS]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        students = (
+            self.filter_queryset(self.get_queryset())
+            .exclude(student_id='')
+            .prefetch_related(None)
+            .order_by('department__name', 'student_id')
+        )
+        department = request.query_params.get('department')
+        filename = f'certificates_department_{department}.zip' if department else 'certificates.zip'
+
+        response = StreamingHttpResponse(
+            iter_certificate_zip(students.iterator(chunk_size=200), size, fmt),
+            content_type='application/zip'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{sanitize_filename(filename)}"'
+        # Let nginx pass chunks through as they are produced
+        response['X-Accel-Buffering'] = 'no'
+        log_security_event('certificate_export', f'Exported certificates ({request.query_params.urlencode()})', request, 'INFO')
+        return response
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Students whose name or ID resembles `?q=` (at least 2 characters), best
+        match first; tolerates typos and transliteration variants. `?limit=`
+        caps the results (default 10, at most 25).
+        """
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 25)
+        except ValueError:
+            limit = 10
+        if len(query) < 2:
+            return Response({'results': []})
+        return Response({'results': autocomplete(query, limit)})
+
+class FacultyTributeViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    cache_models = ('yearbook.FacultyTribute',)
+    query_budget = {'list': 3, 'retrieve': 2}
     queryset = FacultyTribute.objects.all().order_by('order')
     serializer_class = FacultyTributeSerializer
     pagination_class = SmallResultsPagination
 
 
-class MemoryCategoryViewSet(viewsets.ModelViewSet):
+class MemoryCategoryViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    cache_models = ('yearbook.MemoryCategory',)
+    query_budget = {'list': 3, 'retrieve': 2}
     queryset = MemoryCategory.objects.filter(is_active=True).all()
     serializer_class = MemoryCategorySerializer
     pagination_class = SmallResultsPagination
 
 
-@method_decorator(ratelimit(key='ip', rate='100/h', method='GET'), name='list')
-@method_decorator(ratelimit(key='ip', rate='30/h', method='POST'), name='create')
-class MemoryBoardViewSet(viewsets.ModelViewSet):
+class MemoryBoardViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    cache_models = ('yearbook.MemoryBoard', 'yearbook.MemoryCategory', 'yearbook.Department')
+    query_budget = {'list': 3, 'retrieve': 2}
     queryset = MemoryBoard.objects.select_related('department', 'category').all()
     serializer_class = MemoryBoardSerializer
+    list_serializer_class = MemoryBoardListSerializer
     pagination_class = SmallResultsPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    cursor_ordering = ('-created_at', 'id')
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
     filterset_fields = ['department', 'category', 'memory_type']
     search_fields = ['title', 'caption', 'author_name', 'author_program', 'author_year']
     
@@ -281,55 +394,79 @@ class MemoryBoardViewSet(viewsets.ModelViewSet):
         
         serializer.save()
 
-class TraineeSuccessStoryViewSet(viewsets.ModelViewSet):
-    queryset = TraineeSuccessStory.objects.select_related('department').all()
+class TraineeSuccessStoryViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    cache_models = ('yearbook.TraineeSuccessStory', 'yearbook.Department', 'yearbook.ProfileImage')
+    query_budget = {'list': 4, 'retrieve': 3}
+    queryset = TraineeSuccessStory.objects.select_related('department').prefetch_related('profile_images')
     serializer_class = TraineeSuccessStorySerializer
+    list_serializer_class = TraineeSuccessStoryListSerializer
     pagination_class = SmallResultsPagination
+    cursor_ordering = ('-graduation_year', 'id')
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['department', 'graduation_year']
     search_fields = ['name', 'current_position']
 
-class DirectorGeneralMessageViewSet(viewsets.ModelViewSet):
+class DirectorGeneralMessageViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    cache_models = ('yearbook.DirectorGeneralMessage',)
+    query_budget = {'list': 3, 'retrieve': 2}
     serializer_class = DirectorGeneralMessageSerializer
     queryset = DirectorGeneralMessage.objects.all()
 
     def get_queryset(self):
-        # Return only the latest message
-        return super().get_queryset().order_by('-id')[:1]
+        queryset = super().get_queryset().order_by('-id')
+        if self.action == 'list':
+            # Return only the latest message; a sliced queryset cannot be filtered for retrieve
+            return queryset[:1]
+        return queryset
 
-class CyberTalentDirectorMessageViewSet(viewsets.ModelViewSet):
+class CyberTalentDirectorMessageViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    cache_models = ('yearbook.CyberTalentDirectorMessage',)
+    query_budget = {'list': 3, 'retrieve': 2}
     serializer_class = CyberTalentDirectorMessageSerializer
     queryset = CyberTalentDirectorMessage.objects.all()
 
     def get_queryset(self):
-        # Return only the latest message
-        return super().get_queryset().order_by('-id')[:1]
+        queryset = super().get_queryset().order_by('-id')
+        if self.action == 'list':
+            # Return only the latest message; a sliced queryset cannot be filtered for retrieve
+            return queryset[:1]
+        return queryset
 
-class AboutINSAViewSet(viewsets.ModelViewSet):
+class AboutINSAViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    cache_models = ('yearbook.AboutINSA',)
+    query_budget = {'list': 4, 'retrieve': 3}
     serializer_class = AboutINSASerializer
     queryset = AboutINSA.objects.all()
 
     def get_queryset(self):
-        # Ensure we always have an AboutINSA instance
-        about, _ = AboutINSA.objects.get_or_create(pk=1)
+        # Ensure we always have an AboutINSA instance, once per request (the validators query it too)
+        if not getattr(self, '_about_ensured', False):
+            AboutINSA.objects.get_or_create(pk=1)
+            self._about_ensured = True
         return super().get_queryset().filter(pk=1)
 
 
-class LeadershipViewSet(viewsets.ModelViewSet):
+class LeadershipViewSet(ConditionalGetMixin, CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    cache_models = ('yearbook.Leadership',)
+    query_budget = {'list': 3, 'retrieve': 2}
     queryset = Leadership.objects.filter(is_active=True).all()
     serializer_class = LeadershipSerializer
+    list_serializer_class = LeadershipListSerializer
     pagination_class = SmallResultsPagination
 
 
 # Certificate Verification View
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseForbidden
+from django.core import signing
+from datetime import datetime, timezone as dt_timezone
+from PIL import Image
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.cache import cache_page
 import re
 
 @require_http_methods(["GET"])
-@ratelimit(key='ip', rate='20/m', method='GET')
+@rate_limit_api('verify_certificate')
 @cache_page(60 * 5)  # Cache for 5 minutes
 def verify_certificate_view(request, student_id):
     """
@@ -349,16 +486,16 @@ def verify_certificate_view(request, student_id):
         return HttpResponseBadRequest('Student ID too long')
     
     try:
-        student = get_object_or_404(Student, student_id=student_id)
-        certificate_path = student.get_certificate_url()
+        student = get_object_or_404(Student.objects.select_related('department'), student_id=student_id)
+        service = get_certificate_service()
+        certificate_path = service.get_certificate_path(student)
         
         if certificate_path:
             # Security: Validate path to prevent directory traversal
-            full_path = os.path.join(settings.MEDIA_ROOT, certificate_path)
-            full_path = os.path.abspath(full_path)
+            full_path = service.absolute_path(certificate_path)
             
             # Ensure the file is within MEDIA_ROOT
-            if not full_path.startswith(os.path.abspath(settings.MEDIA_ROOT)):
+            if full_path is None:
                 log_security_event('path_traversal_attempt', 
                                  f'Certificate verification path traversal: {certificate_path}', 
                                  request, 'ERROR')
@@ -376,7 +513,9 @@ def verify_certificate_view(request, student_id):
                     'student_id': sanitize_html_input(student.student_id, allowed_tags=[]),
                     'student_name': sanitize_html_input(student.name, allowed_tags=[]),
                     'department': sanitize_html_input(student.department.name, allowed_tags=[]),
-                    'certificate_url': f'/media/{certificate_path}',
+                    # Resized for the on-page preview only; download and full size get the original file
+                    'certificate_preview_url': transform_url(certificate_path, width=1200, fmt='webp'),
+                    'certificate_url': default_storage.url(certificate_path),
                     'issue_date': student.created_at.strftime('%B %d, %Y'),
                     'quote': sanitize_html_input(student.quote if student.quote else '', allowed_tags=[]),
                 }
@@ -414,4 +553,41 @@ def verify_certificate_view(request, student_id):
             'error': 'An error occurred during verification',
             'student_id': sanitize_html_input(student_id, allowed_tags=[])
         }
-        return render(request, 'verify_certificate.html', context)
\ No newline at end of file
+        return render(request, 'verify_certificate.html', context)
+
+
+@require_http_methods(["GET", "HEAD"])
+def media_transform_view(request):
+    """
+    Serve a resized variant of an uploaded image from a signed URL built with
+    `media_transform.transform_url()`; variants are rendered once and cached on disk
+    """
+    try:
+        name, width, height, fit, fmt = parse_transform(request.GET)
+    except signing.BadSignature:
+        log_security_event('invalid_transform_signature', f'Transform of: {request.GET.get("path", "")}', request)
+        return HttpResponseForbidden('Invalid signature')
+    except TransformError as e:
+        return HttpResponseBadRequest(str(e))
+
+    try:
+        variant_path = get_transform_cache().get(name, width, height, fit, fmt)
+    except TransformError as e:
+        return HttpResponseBadRequest(str(e))
+    except (OSError, Image.UnidentifiedImageError):
+        logger.exception('Transforming %s failed', name)
+        return HttpResponseBadRequest('Image could not be transformed')
+
+    # Cache hits refresh the variant's mtime for LRU, so validators come from the key and the source
+    variant_key = os.path.splitext(os.path.basename(variant_path))[0]
+    source_mtime = os.stat(os.path.join(settings.MEDIA_ROOT, name)).st_mtime
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return file_response(
+        request,
+        variant_path,
+        content_type=FORMATS[fmt][1],
+        filename=f'{stem}_{width or "auto"}x{height or "auto"}.{fmt}',
+        etag=f'"{variant_key}"',
+        last_modified=datetime.fromtimestamp(source_mtime, tz=dt_timezone.utc),
+    )
+